@@ -0,0 +1,236 @@
+import gzip
+from datetime import datetime
+
+from flask import Blueprint, abort, current_app, jsonify, request, url_for
+from flask_login import current_user, login_required, login_user, logout_user
+from sqlalchemy.orm import contains_eager, load_only
+from werkzeug.exceptions import HTTPException
+
+import bookings
+from booking_stats import HISTORY_STATUSES, OPEN_STATUSES
+from database import listing_session
+from instrumentation import query_budget
+from listing import finite_float, listing_order, listing_page
+from models import db, User, SitterProfile, ParentProfile, Booking
+from queries import BOOKING_HISTORY_ORDERING, BOOKING_ORDERING, bookings_page
+from search_index import search_terms
+from security import VerifierBusy, login_retry_after, needs_rehash, record_failed_login
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+# Only the columns the sitter list serializes (plus what distance and best-match sorting
+# read) are loaded; the bio, phone and address stay in the database.
+SITTER_COLUMNS = (
+    load_only(SitterProfile.id, SitterProfile.user_id, SitterProfile.name, SitterProfile.hourly_rate,
+              SitterProfile.experience_years, SitterProfile.rating, SitterProfile.reviews_count),
+    contains_eager(SitterProfile.user).load_only(User.id, User.city, User.neighborhood, User.lat, User.lng,
+                                                 User.geocode_status),
+)
+
+
+def sitter_json(sitter: SitterProfile) -> dict:
+    """Serialize a sitter for list responses; `id` is the user id bookings refer to."""
+    item = {'id': sitter.user_id, 'name': sitter.name, 'city': sitter.user.city,
+            'neighborhood': sitter.user.neighborhood or None, 'hourly_rate': sitter.hourly_rate,
+            'experience_years': sitter.experience_years or 0, 'rating': round(sitter.rating or 0.0, 2),
+            'reviews_count': sitter.reviews_count or 0}
+    if getattr(sitter, 'distance', None) is not None:
+        item['distance_km'] = sitter.distance
+    return item
+
+
+def booking_rows(user: User):
+    """Query the user's bookings as plain rows with the other party's id and name, one join and no ORM objects."""
+    if user.user_type == 'parent':
+        own, other, profile = Booking.parent_id, Booking.sitter_id, SitterProfile
+    else:
+        own, other, profile = Booking.sitter_id, Booking.parent_id, ParentProfile
+    return (db.session.query(Booking.id, Booking.status, Booking.start_time, Booking.end_time,
+                             other.label('other_id'), profile.name.label('other_name'))
+            .outerjoin(profile, profile.user_id == other)
+            .filter(own == user.id))
+
+
+def booking_json(row, user: User) -> dict:
+    other = 'sitter' if user.user_type == 'parent' else 'parent'
+    return {'id': row.id, 'status': row.status, 'start_time': row.start_time.isoformat(),
+            'end_time': row.end_time.isoformat(), other: {'id': row.other_id, 'name': row.other_name}}
+
+
+def own_booking_json(booking_id: int) -> dict:
+    row = booking_rows(current_user).filter(Booking.id == booking_id).first()
+    if row is None:
+        abort(404)
+    return booking_json(row, current_user)
+
+
+def per_page_arg() -> int:
+    per_page = request.args.get('per_page', type=int) or current_app.config['API_PER_PAGE']
+    return max(1, min(per_page, current_app.config['API_MAX_PER_PAGE']))
+
+
+def parse_time(value) -> datetime:
+    """Parse an ISO 8601 time; times with an offset are converted to the server's local time."""
+    if not isinstance(value, str):
+        abort(400, "start_time and end_time must be ISO 8601 strings.")
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        abort(400, f"Invalid time: {value}")
+    return parsed.astimezone().replace(tzinfo=None) if parsed.tzinfo else parsed
+
+
+def json_body() -> dict:
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        abort(400, "Expected a JSON object.")
+    return body
+
+
+@api.errorhandler(HTTPException)
+def http_error(e: HTTPException):
+    """Answer API errors with JSON instead of the HTML error pages."""
+    return jsonify(error=e.description), e.code
+
+
+@api.errorhandler(bookings.BookingError)
+def booking_error(e: bookings.BookingError):
+    return jsonify(error=e.message), e.status
+
+
+@api.after_request
+def finish_response(response):
+    """Add a weak ETag to successful reads, answer a matching If-None-Match with 304, then gzip large bodies.
+
+    The ETag is computed before compression and is weak, so it matches either encoding.
+    """
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    response.vary.add('Accept-Encoding')
+    if request.method in ('GET', 'HEAD') and response.status_code == 200:
+        response.add_etag(weak=True)
+        response.make_conditional(request)
+    if (response.status_code == 200 and not response.direct_passthrough
+            and 'Content-Encoding' not in response.headers and 'gzip' in request.accept_encodings
+            and (response.content_length or 0) >= current_app.config['API_GZIP_MIN_BYTES']):
+        response.set_data(gzip.compress(response.get_data(), current_app.config['API_GZIP_LEVEL']))
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+
+@api.route('/session', methods=['POST'])
+def create_session():
+    """Log in with a JSON {email, password}; the session cookie authenticates later calls."""
+    body = json_body()
+    email, password = body.get('email'), body.get('password')
+    if not isinstance(email, str):
+        email = None
+    retry_after = login_retry_after(request.remote_addr, email)
+    if retry_after:
+        return jsonify(error="Too many login attempts."), 429, {'Retry-After': str(int(retry_after) + 1)}
+
+    user = User.query.filter_by(email=email).first()
+    try:
+        valid = bool(user) and isinstance(password, str) and user.check_password(password)
+    except VerifierBusy:
+        return jsonify(error="The server is busy."), 503, {'Retry-After': '1'}
+    if not valid:
+        record_failed_login(email)
+        return jsonify(error="Invalid email or password."), 401
+
+    if needs_rehash(user.password_hash):
+        user.set_password(password)
+        db.session.commit()
+    login_user(user)
+    return jsonify(id=user.id, user_type=user.user_type)
+
+
+@api.route('/session', methods=['DELETE'])
+@login_required
+def delete_session():
+    logout_user()
+    return '', 204
+
+
+@api.route('/sitters')
+@query_budget(6)
+def list_sitters():
+    """Search sitters with the home page's filters and orders, one keyset page at a time.
+
+    `lat` and `lng` sort by distance from that point; otherwise a logged-in parent's
+    address is used, as on the home page.
+    """
+    lat = request.args.get('lat', type=finite_float)
+    lng = request.args.get('lng', type=finite_float)
+    if lat is not None and lng is not None and -90 <= lat <= 90 and -180 <= lng <= 180:
+        origin = (lat, lng)
+    elif (current_user.is_authenticated and current_user.user_type == 'parent'
+            and current_user.lat is not None):
+        origin = (current_user.lat, current_user.lng)
+    else:
+        origin = None
+
+    terms = search_terms(request.args.get('q'))
+    order = listing_order(request.args.get('sort'), origin, terms)
+    max_price = request.args.get('max_price', type=finite_float)
+    page = listing_page(listing_session(), order, request.args.get('cursor'), per_page_arg(),
+                        request.args.get('city', '').strip(), max_price,
+                        request.args.get('min_experience', type=int, default=0), terms=terms, origin=origin,
+                        options=SITTER_COLUMNS)
+    return jsonify(items=[sitter_json(sitter) for sitter in page.items], next_cursor=page.next_cursor)
+
+
+@api.route('/bookings')
+@login_required
+@query_budget(3)
+def list_bookings():
+    """List the current user's upcoming bookings, or with `view=history` their archive."""
+    query = booking_rows(current_user)
+    if request.args.get('view') == 'history':
+        query, ordering = query.filter(Booking.status.in_(HISTORY_STATUSES)), BOOKING_HISTORY_ORDERING
+    else:
+        query, ordering = query.filter(Booking.status.in_(OPEN_STATUSES)), BOOKING_ORDERING
+    page = bookings_page(query, request.args.get('cursor'), per_page_arg(), ordering)
+    return jsonify(items=[booking_json(row, current_user) for row in page.items], next_cursor=page.next_cursor)
+
+
+@api.route('/bookings/<int:booking_id>')
+@login_required
+@query_budget(2)
+def get_booking(booking_id: int):
+    return jsonify(own_booking_json(booking_id))
+
+
+@api.route('/bookings', methods=['POST'])
+@login_required
+def create_booking():
+    """Request a booking with a JSON {sitter_id, start_time, end_time}; 409 when the slot is taken."""
+    if current_user.user_type != 'parent':
+        abort(403, "Only parents can book sitters.")
+    body = json_body()
+    sitter_id = body.get('sitter_id')
+    if not isinstance(sitter_id, int):
+        abort(400, "sitter_id must be an integer.")
+    booking = bookings.request_booking(current_user.id, sitter_id, parse_time(body.get('start_time')),
+                                       parse_time(body.get('end_time')))
+    return jsonify(own_booking_json(booking.id)), 201, {
+        'Location': url_for('api.get_booking', booking_id=booking.id)}
+
+
+@api.route('/bookings/<int:booking_id>', methods=['PATCH'])
+@login_required
+def answer_booking(booking_id: int):
+    """Confirm or decline a request as its sitter with a JSON {action: "confirm" | "decline"}."""
+    action = json_body().get('action')
+    if not isinstance(action, str):
+        abort(400, "action must be \"confirm\" or \"decline\".")
+    bookings.answer_booking(db.get_or_404(Booking, booking_id), current_user.id, action)
+    return jsonify(own_booking_json(booking_id))
+
+
+@api.route('/bookings/<int:booking_id>', methods=['DELETE'])
+@login_required
+def cancel_booking(booking_id: int):
+    """Cancel a booking as its parent before it starts."""
+    bookings.cancel_booking(db.get_or_404(Booking, booking_id), current_user.id)
+    return jsonify(own_booking_json(booking_id))
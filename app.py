@@ -1,414 +1,187 @@
+import os
+
+from flask import Flask
+from flask_login import LoginManager
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+from models import db, User
+import search_stats
+import sitter_cache
+import database
+import geocoding
+from geocode_worker import GeocodeWorkerPool
+from instrumentation import init_metrics, init_query_counter
+from booking_stats import init_booking_counters
+from catalog import init_catalog
+from cli import data_cli, rebuild_search_stats_command, recompute_ratings_command
+from migrations import db_cli, init_auto_migrate
+from scoring import parse_weights
+from outbox import init_outbox
+from scheduler import init_scheduler
+from search_index import init_search_index
+from security import init_security
+
+# Applied to test applications unless the test sets them: a cheap hash keeps the suite fast,
+# and tests log in far more often than the limiter allows.
+TESTING_CONFIG = {
+    'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:1000',
+    'LOGIN_RATE_LIMIT_ENABLED': False,
+}
 
-from flask import Flask, render_template, request, redirect, url_for, flash
-from flask_login import LoginManager, login_user, logout_user, login_required, current_user
-
-from models import db, User, SitterProfile, ParentProfile, Booking
-from logic import (get_coords_from_address, 
-                   has_affordable_sitter, 
-                   sort_sitters_by_distance, 
-                   sort_sitters_by_experience, 
-                   calculate_average_price, 
-                   search_sitters)
-from datetime import datetime
-
-app = Flask(__name__)
-
-app.config['SECRET_KEY'] = 'university-project-secret-key'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///babysitter_hub.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-db.init_app(app)
 login_manager = LoginManager()
-login_manager.init_app(app)
-login_manager.login_view = 'login'
+login_manager.login_view = 'main.login'
+# API clients get a 401 instead of a redirect to the login page.
+login_manager.blueprint_login_views['api'] = None
+
 
 @login_manager.user_loader
 def load_user(user_id: str) -> User:
     return db.session.get(User, int(user_id))
 
-with app.app_context():
-    db.create_all()
-
-
-@app.route('/')
-def index() -> str:
-    """Main page displaying sitters with filtering and sorting options."""
-    city_query = request.args.get('city', '').strip()
-    max_price = request.args.get('max_price', type=float)
-    min_exp = request.args.get('min_experience', type=int, default=0)
-    sort_option = request.args.get('sort')
-
-    all_sitters = SitterProfile.query.all()
-
-    sitters = search_sitters(all_sitters, city_query, max_price, min_exp)
-    
-    if sort_option == 'experience':
-        sitters = sort_sitters_by_experience(sitters)
-    elif sort_option == 'rating':
-        sitters = sorted(sitters, key=lambda x: x.rating, reverse=True)
-    elif current_user.is_authenticated and current_user.user_type == 'parent':
-        print(f"DEBUG: Parent Coords -> {current_user.lat}, {current_user.lng}")
-        sitters = sort_sitters_by_distance(current_user.lat, current_user.lng, sitters)
-        if sitters:
-            print(f"DEBUG: First Sitter Coords -> {sitters[0].user.lat}, {sitters[0].user.lng}")
-    else:
-        sitters = sorted(sitters, key=lambda x: x.rating, reverse=True)[:6]
-
-    avg_p = calculate_average_price(sitters)
-    
-    affordable = has_affordable_sitter(sitters, 15.0)
-
-    return render_template('index.html', 
-                           sitters=sitters, 
-                           avg_price=avg_p, 
-                           has_affordable=affordable)
-
-@app.route('/login', methods=['GET', 'POST'])
-def login() -> str:
-    """Handle user login by verifying credentials and starting a session."""
-    if request.method == 'POST':
-        email = request.form.get('email')
-        password = request.form.get('password')
-        user = User.query.filter_by(email=email).first()
-
-        if user and user.check_password(password):
-            login_user(user)
-            flash('Logged in successfully!', 'success')
-            return redirect(url_for('index'))
-        
-        flash('Invalid email or password.', 'danger')
-    return render_template('login.html')
-
-@app.route('/logout')
-@login_required
-def logout() -> str:
-    """Log out the current user and end their session."""
-    logout_user()
-    flash('You have been logged out.', 'info')
-    return redirect(url_for('index'))
-
-@app.route('/register/sitter', methods=['GET', 'POST'])
-def register_sitter() -> str:
-    """Handle sitter registration by collecting user details and creating a new sitter profile."""
-    if request.method == 'POST':
-        email = request.form.get('email')
-        
-        
-        if User.query.filter_by(email=email).first():
-            flash('Email already registered.', 'warning')
-            return redirect(url_for('register_sitter'))
-
-        city = request.form.get('city')
-        neighborhood = request.form.get('neighborhood', '').strip()
-        street = request.form.get('street', '').strip()
-        street_number = request.form.get('street_number', '').strip()
-        block = request.form.get('block', '').strip()
-        entrance = request.form.get('entrance', '').strip()
-        
-        errors = []
-        if not city:
-            errors.append("City is mandatory.")
-        
-        if not neighborhood and not street:
-            errors.append("Please provide either a Neighborhood or a Street name.")
-        
-        if not street_number and not block:
-            errors.append("Please provide either a Street Number or a Block number.")
-
-        if errors:
-            for error in errors:
-                flash(error, 'danger')
-            return render_template('register_sitter.html')
-        
-        address_parts = []
-        if street:
-            st_line = street.strip()
-            if street_number:
-                st_line += f" {street_number.strip()}"
-            address_parts.append(st_line)
-        if neighborhood:
-            address_parts.append(neighborhood.strip())
-        if block:
-            address_parts.append(f"блок {block.strip()}")
-            if entrance: 
-                address_parts.append(entrance.strip())
-        if city:
-            address_parts.append(city.strip())
-
-        full_address = ", ".join(address_parts)
-        
-        lat, lng = get_coords_from_address(full_address)
-
-        if lat is None:
-            flash('Could not verify address. Please check your city and street.', 'danger')
-            return render_template('register_sitter.html')
-
-        new_user = User(
-            email=email, 
-            user_type='sitter', 
-            lat=lat, 
-            lng=lng,
-            address = full_address,
-            city=city,
-            neighborhood=neighborhood,
-            street=street,
-            street_number=street_number,
-            block=block,
-            entrance=entrance
-        )
-        new_user.set_password(request.form.get('password'))
-        
-        new_profile = SitterProfile(
-            user=new_user,
-            name=request.form.get('name'),
-            phone_number=request.form.get('phone'),
-            hourly_rate=max(0, float(request.form.get('hourly_rate'))),
-            experience_years=max(0, int(request.form.get('experience'))),
-            bio=request.form.get('bio')
-        )
-
-        try:
-            db.session.add(new_user)
-            db.session.add(new_profile)
-            db.session.commit()
-            flash('Sitter account created! Please log in.', 'success')
-            return redirect(url_for('login'))
-        except Exception as e:
-            db.session.rollback()
-            flash(f'An error occurred: {str(e)}', 'danger')
-
-    return render_template('register_sitter.html')
-
-@app.route('/register/parent', methods=['GET', 'POST'])
-def register_parent() -> str:
-    """Handle parent registration by collecting user details and creating a new parent profile."""
-    if request.method == 'POST':
-        email = request.form.get('email')
-        
-        if User.query.filter_by(email=email).first():
-            flash('Email already registered.', 'warning')
-            return redirect(url_for('register_parent'))
-
-        city = request.form.get('city')
-        neighborhood = request.form.get('neighborhood', '').strip()
-        street = request.form.get('street', '').strip()
-        street_number = request.form.get('street_number', '').strip()
-        block = request.form.get('block', '').strip()
-        entrance = request.form.get('entrance', '').strip()
-        
-        errors = []
-        if not city:
-            errors.append("City is mandatory.")
-        
-        if not neighborhood and not street:
-            errors.append("Please provide either a Neighborhood or a Street name.")
-        
-        if not street_number and not block:
-            errors.append("Please provide either a Street Number or a Block number.")
-
-        if errors:
-            for error in errors:
-                flash(error, 'danger')
-            return render_template('register_parent.html')
-        
-        address_parts = []
-        if street:
-            st_line = street.strip()
-            if street_number:
-                st_line += f" {street_number.strip()}"
-            address_parts.append(st_line)
-        if neighborhood:
-            address_parts.append(neighborhood.strip())
-        if block:
-            address_parts.append(f"block {block.strip()}")
-            if entrance: 
-                address_parts.append(entrance.strip())
-        if city:
-            address_parts.append(city.strip())
-
-        
-        full_address = ", ".join(address_parts)
-        
-        lat, lng = get_coords_from_address(full_address)
-
-        if lat is None:
-            flash('Could not verify address. Please check your city and street.', 'danger')
-            return render_template('register_parent.html')
-
-        new_user = User(
-            email=email, 
-            user_type='parent', 
-            lat=lat, 
-            lng=lng,
-            address = full_address,
-            city=city,
-            neighborhood=neighborhood,
-            street=street,
-            street_number=street_number,
-            block=block,
-            entrance=entrance
-        )
-        new_user.set_password(request.form.get('password'))
-        
-        new_profile = ParentProfile(
-            user=new_user,
-            name=request.form.get('name'),
-            phone_number=request.form.get('phone'),
-            children_count=max(1, int(request.form.get('children_count'))), 
-            bio=request.form.get('bio')
-        )
-
-        try:
-            db.session.add(new_user)
-            db.session.add(new_profile)
-            db.session.commit()
-            flash('Parent account created! Please log in to find a sitter.', 'success')
-            return redirect(url_for('login'))
-        except Exception as e:
-            db.session.rollback()
-            flash(f'An error occurred: {str(e)}', 'danger')
-
-    return render_template('register_parent.html')
-
-@app.route('/book/<int:sitter_user_id>', methods=['GET', 'POST'])
-@login_required
-def book_sitter(sitter_user_id: int) -> str:
-    """Allow a parent to book a sitter for a specified time period."""
-    if current_user.user_type != 'parent':
-        flash('Only parents can book sitters.', 'warning')
-        return redirect(url_for('index'))
-
-    if request.method == 'POST':
-        start_str = request.form.get('start_time')
-        end_str = request.form.get('end_time')
-        
-        try:
-            start_dt = datetime.strptime(start_str, '%Y-%m-%dT%H:%M')
-            end_dt = datetime.strptime(end_str, '%Y-%m-%dT%H:%M')
-            
-            if start_dt < datetime.now():
-                flash("You cannot book a sitter for a past date or time!", "danger")
-                return render_template('book_form.html', sitter_id=sitter_user_id)
-            
-            if start_dt >= end_dt:
-                flash("End time must be after start time.", "danger")
-                return render_template('book_form.html', sitter_id=sitter_user_id)
-
-            new_booking = Booking(
-                parent_id=current_user.id, 
-                sitter_id=sitter_user_id,
-                start_time=start_dt,
-                end_time=end_dt
-            )
-            db.session.add(new_booking)
-            db.session.commit()
-            flash('Booking request sent!', 'success')
-            return redirect(url_for('my_bookings'))
-        except ValueError:
-            flash("Invalid date format.", "danger")
-
-    return render_template('book_form.html', sitter_id=sitter_user_id)
-
-@app.route('/my-bookings')
-@login_required
-def my_bookings() -> str:
-    """Display all bookings for the current user, whether parent or sitter."""
-    if current_user.user_type == 'parent':
-        bookings = Booking.query.filter_by(parent_id=current_user.id).all()
-    else:
-        bookings = Booking.query.filter_by(sitter_id=current_user.id).all()
-    
-    return render_template('bookings.html', bookings=bookings, now=datetime.now())
-
-@app.route('/profile')
-@login_required
-def profile() -> str:
-    """Display the profile of the currently logged-in user."""
-    if current_user.user_type == 'sitter':
-        profile_data = current_user.sitter_profile
-    else:
-        profile_data = current_user.parent_profile
-    
-    return render_template('profile.html', profile=profile_data)
-
-@app.route('/booking/action/<int:booking_id>/<string:action>')
-@login_required
-def booking_action(booking_id: int, action: str) -> str:
-    """Allow sitters to confirm or decline booking requests."""
-    booking = Booking.query.get_or_404(booking_id)
-    
-    if current_user.id != booking.sitter_id:
-        flash("Unauthorized action.", "danger")
-        return redirect(url_for('my_bookings'))
-
-    if action == 'confirm':
-        booking.status = 'Confirmed'
-        flash("Booking confirmed!", "success")
-    elif action == 'decline':
-        booking.status = 'Cancelled'
-        flash("Booking declined.", "info")
-    
-    db.session.commit()
-    return redirect(url_for('my_bookings'))
-
-@app.route('/user/<int:user_id>')
-@login_required
-def view_public_profile(user_id: int) -> str:
-    """View the public profile of another user (sitter or parent)."""
-    target_user = User.query.get_or_404(user_id)
-    if target_user.user_type == 'sitter':
-        return render_template('public_profile.html', profile=target_user.sitter_profile, user=target_user)
-    else:
-        return render_template('public_profile.html', profile=target_user.parent_profile, user=target_user)
-
-@app.route('/booking/cancel/<int:booking_id>')
-@login_required
-def cancel_booking(booking_id: int) -> str:
-    """Allow parents to cancel their bookings if they haven't started yet."""
-    booking = Booking.query.get_or_404(booking_id)
-    
-    if current_user.id != booking.parent_id:
-        flash("Unauthorized action.", "danger")
-        return redirect(url_for('my_bookings'))
-
-    if booking.start_time > datetime.now():
-        booking.status = 'Cancelled'
-        db.session.commit()
-        flash("Booking cancelled successfully.", "info")
-    else:
-        flash("You cannot cancel a booking that has already started.", "warning")
-        
-    return redirect(url_for('my_bookings'))
-
-@app.route('/rate-sitter/<int:booking_id>', methods=['POST'])
-@login_required
-def rate_sitter(booking_id: int) -> str:
-    """Allow parents to rate sitters after a completed booking."""
-    booking = Booking.query.get_or_404(booking_id)
-    new_rating = float(request.form.get('rating'))
-    
-    if current_user.id == booking.parent_id and booking.end_time < datetime.now():
-        sitter = booking.sitter.sitter_profile
-        
-        total_rating = (sitter.rating * sitter.reviews_count) + new_rating
-        sitter.reviews_count += 1
-        sitter.rating = round(total_rating / sitter.reviews_count, 1)
-        
-        booking.status = 'Completed'
-        db.session.commit()
-        flash(f"Thank you! You rated {sitter.name} with {new_rating} stars.", "success")
-        
-    return redirect(url_for('my_bookings'))
 
-@app.errorhandler(404)
-def page_not_found(e) -> str:
-    """Render a custom 404 error page when a page is not found."""
-    return render_template('404.html'), 404
+def default_config(app: Flask) -> dict:
+    """Settings used unless overridden by create_app(config); several can be set from the environment."""
+    return {
+        'SECRET_KEY': 'university-project-secret-key',
+        'SQLALCHEMY_DATABASE_URI': os.environ.get('DATABASE_URL', 'sqlite:///babysitter_hub.db'),
+        'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+        'AUTO_MIGRATE': os.environ.get('AUTO_MIGRATE', '1') == '1',
+        'DATABASE_REPLICA_URL': os.environ.get('DATABASE_REPLICA_URL'),
+        'DB_POOL_SIZE': int(os.environ.get('DB_POOL_SIZE', 5)),
+        'DB_MAX_OVERFLOW': int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+        'DB_POOL_TIMEOUT': 30,
+        'DB_POOL_RECYCLE': 1800,
+        'SQLITE_BUSY_TIMEOUT': 5.0,
+        'SQLITE_JOURNAL_MODE': 'WAL',
+        'SQLITE_SYNCHRONOUS': 'NORMAL',
+        'SQLITE_CACHE_SIZE_KB': 20000,
+        'GEOCODE_CACHE_PATH': os.path.join(app.instance_path, 'geocode_cache.db'),
+        'GEOCODE_CACHE_TTL': 30 * 24 * 3600,
+        'GEOCODE_NEGATIVE_TTL': 24 * 3600,
+        'GEOCODE_OFFLINE': os.environ.get('GEOCODE_OFFLINE') == '1',
+        'GEOCODE_ASYNC': True,
+        'GEOCODE_MIN_INTERVAL': 1.0,
+        'GEOCODE_WORKERS': 2,
+        'PAGE_CACHE_SIZE': 512,
+        'PAGE_CACHE_TTL': 60,
+        'FRAGMENT_CACHE_SIZE': 4096,
+        # Commits only invalidate the committing process's caches, so other workers may show a
+        # card this many seconds old, as they may a cached page.
+        'FRAGMENT_CACHE_TTL': 60,
+        'PAGE_CACHE_DIR': os.environ.get('PAGE_CACHE_DIR'),
+        'METRICS_ENABLED': os.environ.get('METRICS_ENABLED') == '1',
+        # /metrics and /internal/cache-stats answer these addresses, or any client sending the token.
+        'METRICS_ALLOWED_IPS': os.environ.get('METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(','),
+        'METRICS_TOKEN': os.environ.get('METRICS_TOKEN'),
+        'PROFILE_SAMPLE_RATE': float(os.environ.get('PROFILE_SAMPLE_RATE', 0)),
+        'PROFILE_SLOW_MS': 500,
+        'PROFILE_DIR': os.path.join(app.instance_path, 'profiles'),
+        'CATALOG_ENABLED': os.environ.get('CATALOG_ENABLED', '1') == '1',
+        'CATALOG_MAX_PATCH': 500,
+        'SCORING_WEIGHTS': parse_weights(os.environ.get('SCORING_WEIGHTS')),
+        'SCORING_DISTANCE_HALF_LIFE_KM': 5.0,
+        'SCORING_RATING_PRIOR': 4.0,
+        'SCORING_RATING_PRIOR_COUNT': 5,
+        'SCORING_PRICE_REFERENCE': 15.0,
+        'SCORING_EXPERIENCE_HALF_YEARS': 3.0,
+        'PASSWORD_HASH_METHOD': os.environ.get('PASSWORD_HASH_METHOD', 'scrypt'),
+        'PASSWORD_VERIFY_WORKERS': int(os.environ.get('PASSWORD_VERIFY_WORKERS', 2)),
+        'PASSWORD_VERIFY_MAX_PENDING': 32,
+        'LOGIN_RATE_LIMIT_ENABLED': True,
+        'LOGIN_IP_BURST': 20,
+        'LOGIN_IP_PER_MINUTE': 10,
+        'LOGIN_EMAIL_BURST': 5,
+        'LOGIN_EMAIL_PER_MINUTE': 3,
+        # Reverse proxies in front of the app whose X-Forwarded-* headers are trusted; 0 trusts none.
+        'PROXY_FIX_HOPS': int(os.environ.get('PROXY_FIX_HOPS', 0)),
+        'BOOKING_SCHEDULER_ENABLED': os.environ.get('BOOKING_SCHEDULER_ENABLED', '1') == '1',
+        'BOOKING_SWEEP_INTERVAL': float(os.environ.get('BOOKING_SWEEP_INTERVAL', 60)),
+        'BOOKING_SWEEP_BATCH': 500,
+        'OUTBOX_DISPATCHER_ENABLED': os.environ.get('OUTBOX_DISPATCHER_ENABLED', '1') == '1',
+        'OUTBOX_SINKS': os.environ.get('OUTBOX_SINKS', 'log'),
+        'OUTBOX_SMTP_HOST': os.environ.get('OUTBOX_SMTP_HOST', 'localhost'),
+        'OUTBOX_SMTP_PORT': int(os.environ.get('OUTBOX_SMTP_PORT', 1025)),
+        'OUTBOX_SMTP_SENDER': 'noreply@babysitter-hub.local',
+        'OUTBOX_WEBHOOK_URL': os.environ.get('OUTBOX_WEBHOOK_URL'),
+        'OUTBOX_WEBHOOK_TIMEOUT': 5.0,
+        'OUTBOX_BATCH': 100,
+        'OUTBOX_MAX_ATTEMPTS': 8,
+        'OUTBOX_RETRY_BACKOFF': 5.0,
+        'OUTBOX_SSE_MAX_STREAMS': 50,
+        'OUTBOX_SSE_MAX_SECONDS': 300,
+        'OUTBOX_SSE_KEEPALIVE': 15.0,
+        'OUTBOX_SSE_POLL': 2.0,
+        'API_PER_PAGE': 20,
+        'API_MAX_PER_PAGE': 100,
+        'API_GZIP_MIN_BYTES': 500,
+        'API_GZIP_LEVEL': 5,
+    }
+
+
+def create_app(config: dict | None = None) -> Flask:
+    """Create and configure an application instance.
+
+    Nothing touches the database here: the schema is brought up to date by `flask db upgrade`,
+    or before the first request when AUTO_MIGRATE is on (test apps create their own tables).
+    Geocoding workers, the booking scheduler and the outbox dispatcher start on first use.
+    """
+    app = Flask(__name__)
+    app.config.from_mapping(default_config(app))
+    app.config.update(config or {})
+    if app.testing:
+        for key, value in TESTING_CONFIG.items():
+            app.config[key] = (config or {}).get(key, value)
+    if app.config['PROXY_FIX_HOPS']:
+        # Behind a proxy remote_addr is the proxy's, and every client would share one login bucket.
+        hops = app.config['PROXY_FIX_HOPS']
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=hops, x_proto=hops, x_host=hops)
+
+    geocoding.init_geocoding(app)
+    app.extensions['geocode_worker'] = GeocodeWorkerPool(app, workers=app.config['GEOCODE_WORKERS'])
+    sitter_cache.init_sitter_cache(app)
+
+    database.configure(app)
+    db.init_app(app)
+    database.init_database(app)
+    login_manager.init_app(app)
+    init_security(app)
+
+    if app.config['AUTO_MIGRATE'] and not app.testing:
+        init_auto_migrate(app)
+    init_query_counter(app)
+    init_metrics(app)
+    sitter_cache.init_cache_invalidation()
+    search_stats.init_rollup_tracking()
+    init_booking_counters()
+    init_scheduler(app)
+    init_outbox(app)
+    init_catalog(app)
+    init_search_index()
+
+    from views import main
+    from api import api
+    app.register_blueprint(main)
+    app.register_blueprint(api)
+
+    app.cli.add_command(db_cli)
+    app.cli.add_command(data_cli)
+    app.cli.add_command(rebuild_search_stats_command)
+    app.cli.add_command(recompute_ratings_command)
+    return app
+
+
+_app = None
+
+
+def __getattr__(name: str):
+    """Build the default application on first access to `app.app` (e.g. `gunicorn app:app`)."""
+    global _app
+    if name == 'app':
+        if _app is None:
+            _app = create_app()
+        return _app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-@app.errorhandler(500)
-def internal_server_error(e) -> str:
-    """Handle internal server errors with a generic message."""
-    return "Error occurred. Please try again later.", 500
 
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    create_app().run(debug=True)
@@ -0,0 +1,127 @@
+import asyncio
+import time
+
+from asgiref.wsgi import WsgiToAsgi
+from flask import request
+from flask_login import current_user
+
+from app import create_app
+from outbox import STREAM_BATCH, latest_event_id, recipient_events
+
+STREAM_PATH = '/events'
+
+
+def _open_stream(app, scope) -> tuple[int | None, int]:
+    """Authenticate an /events request from its session cookie; returns (user id, last event id)."""
+    headers = [(name.decode('latin-1'), value.decode('latin-1')) for name, value in scope['headers']]
+    with app.app_context(), app.test_request_context(STREAM_PATH, headers=headers):
+        if not current_user.is_authenticated:
+            return None, 0
+        last_id = request.headers.get('Last-Event-ID', type=int)
+        if last_id is None:
+            last_id = latest_event_id(current_user.id)
+        return current_user.id, last_id
+
+
+def _read_events(app, user_id: int, last_id: int) -> list[tuple[int, str]]:
+    with app.app_context():
+        return recipient_events(user_id, last_id)
+
+
+async def _respond(send, status: int, body: bytes, headers: list | None = None) -> None:
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', b'text/plain; charset=utf-8'), *(headers or [])]})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def event_stream(app, scope, receive, send) -> None:
+    """Serve /events as a coroutine, the asynchronous twin of outbox.event_stream.
+
+    Only the short queries run in worker threads; between them the stream waits on the
+    event loop, so an idle connection holds a socket but no thread.
+    """
+    user_id, last_id = await asyncio.to_thread(_open_stream, app, scope)
+    if user_id is None:
+        await _respond(send, 401, b"Login required.")
+        return
+    streams = app.extensions['event_streams']
+    if not streams.acquire(blocking=False):
+        await _respond(send, 503, b"Too many open event streams.", [(b'retry-after', b'5')])
+        return
+
+    config = app.config
+    try:
+        await send({'type': 'http.response.start', 'status': 200,
+                    'headers': [(b'content-type', b'text/event-stream; charset=utf-8'),
+                                (b'cache-control', b'no-cache'), (b'x-accel-buffering', b'no')]})
+        await send({'type': 'http.response.body', 'body': b'retry: 3000\n\n', 'more_body': True})
+        deadline = time.monotonic() + config['OUTBOX_SSE_MAX_SECONDS']
+        last_sent = time.monotonic()
+        while True:
+            events = await asyncio.to_thread(_read_events, app, user_id, last_id)
+            chunk = ''.join(f'id: {event_id}\ndata: {payload}\n\n' for event_id, payload in events)
+            if events:
+                last_id = events[-1][0]
+
+            now = time.monotonic()
+            if events:
+                last_sent = now
+            elif now - last_sent >= config['OUTBOX_SSE_KEEPALIVE']:
+                chunk = ': keepalive\n\n'
+                last_sent = now
+            if chunk:
+                await send({'type': 'http.response.body', 'body': chunk.encode(), 'more_body': True})
+            if now >= deadline:
+                break
+            if len(events) < STREAM_BATCH:
+                try:
+                    message = await asyncio.wait_for(receive(), min(config['OUTBOX_SSE_POLL'], deadline - now))
+                except asyncio.TimeoutError:
+                    continue
+                if message['type'] == 'http.disconnect':
+                    return
+        await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        streams.release()
+
+
+async def _lifespan(receive, send) -> None:
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+def make_application(app):
+    """Wrap a Flask app for an ASGI server such as uvicorn.
+
+    Ordinary requests, including the JSON API, run through asgiref's WsgiToAsgi in its
+    thread pool; the long-lived /events streams are served natively by event_stream.
+    """
+    wsgi = WsgiToAsgi(app)
+
+    async def application(scope, receive, send) -> None:
+        if scope['type'] == 'lifespan':
+            await _lifespan(receive, send)
+        elif scope['type'] == 'http' and scope['path'] == STREAM_PATH and scope['method'] == 'GET':
+            await event_stream(app, scope, receive, send)
+        else:
+            await wsgi(scope, receive, send)
+
+    return application
+
+
+_application = None
+
+
+def __getattr__(name: str):
+    """Build the default application on first access, e.g. `uvicorn asgi:application`."""
+    global _application
+    if name == 'application':
+        if _application is None:
+            _application = make_application(create_app())
+        return _application
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
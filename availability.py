@@ -0,0 +1,57 @@
+from datetime import datetime
+
+from models import db, User, Booking
+
+# Bookings in these states hold the sitter's time.
+ACTIVE_STATUSES = ('Pending', 'Confirmed')
+
+
+def overlap_criteria(start: datetime, end: datetime, statuses=ACTIVE_STATUSES) -> list:
+    """Return the SQL criteria for bookings in `statuses` that intersect [start, end)."""
+    return [
+        Booking.status.in_(statuses),
+        Booking.start_time < end,
+        Booking.end_time > start,
+    ]
+
+
+def lock_sitter(sitter_id: int) -> None:
+    """Serialize booking changes for one sitter until the current transaction ends.
+
+    A no-op UPDATE takes a row lock on PostgreSQL and the write lock on SQLite, so two
+    requests cannot both pass the overlap check and insert conflicting bookings.
+    """
+    db.session.execute(db.update(User).where(User.id == sitter_id).values(id=User.id))
+
+
+def find_conflicts(sitter_id: int, start: datetime, end: datetime,
+                   exclude_id: int | None = None, statuses=ACTIVE_STATUSES) -> list[Booking]:
+    """Return the sitter's bookings that overlap [start, end), using the (sitter_id, start_time) index."""
+    query = Booking.query.filter(Booking.sitter_id == sitter_id, *overlap_criteria(start, end, statuses))
+    if exclude_id is not None:
+        query = query.filter(Booking.id != exclude_id)
+    return query.order_by(Booking.start_time).all()
+
+
+def is_sitter_free(sitter_id: int, start: datetime, end: datetime, exclude_id: int | None = None) -> bool:
+    """Check whether the sitter has no active booking overlapping [start, end)."""
+    query = db.select(Booking.id).where(Booking.sitter_id == sitter_id, *overlap_criteria(start, end))
+    if exclude_id is not None:
+        query = query.where(Booking.id != exclude_id)
+    return db.session.execute(query.limit(1)).first() is None
+
+
+def free_sitter_ids(sitter_ids: list[int], start: datetime, end: datetime) -> set[int]:
+    """Return which of the given sitters are free for the whole window, in one query."""
+    if not sitter_ids:
+        return set()
+    busy = db.session.scalars(
+        db.select(Booking.sitter_id).distinct()
+        .where(Booking.sitter_id.in_(sitter_ids), *overlap_criteria(start, end))
+    ).all()
+    return set(sitter_ids) - set(busy)
+
+
+def available_clause(start: datetime, end: datetime):
+    """Return a criterion on User that keeps only sitters free for [start, end)."""
+    return ~db.select(Booking.id).where(Booking.sitter_id == User.id, *overlap_criteria(start, end)).exists()
@@ -0,0 +1,120 @@
+import random
+from datetime import datetime, timedelta
+
+from booking_stats import rebuild_booking_counters
+from catalog import bump_version
+from geo import grid_index
+from geocoding import GAZETTEER
+from models import db, User, SitterProfile, ParentProfile, Booking, normalize_city
+from security import hash_password
+import search_stats
+
+# Share of the population per city, roughly following the real city sizes.
+CITY_WEIGHTS = {
+    'София': 40, 'Пловдив': 12, 'Варна': 10, 'Бургас': 7, 'Русе': 4, 'Стара Загора': 4,
+    'Плевен': 3, 'Сливен': 2, 'Добрич': 2, 'Шумен': 2, 'Перник': 2, 'Хасково': 2,
+    'Ямбол': 2, 'Пазарджик': 2, 'Благоевград': 2, 'Велико Търново': 2, 'Враца': 1, 'Габрово': 1,
+}
+CITY_CENTERS = {names[0]: coords for names, coords in GAZETTEER.items()}
+NEIGHBORHOODS = ['Център', 'Младост', 'Лозенец', 'Изток', 'Запад', 'Възраждане', 'Тракия', 'Чайка']
+STREETS = ['Витоша', 'Раковски', 'Шипка', 'Христо Ботев', 'Васил Левски', 'Цар Симеон', 'Освобождение']
+FIRST_NAMES = ['Мария', 'Иван', 'Елена', 'Георги', 'Николета', 'Петя', 'Димитър', 'Ива', 'Стефан', 'Ани']
+# Spread of coordinates around the city center, in degrees (about 4-5 km).
+CITY_SPREAD_DEG = 0.04
+# Every status the app uses, Confirmed weighted double; declined requests are stored as Cancelled.
+BOOKING_STATUSES = ['Pending', 'Confirmed', 'Confirmed', 'Cancelled', 'Expired', 'AwaitingRating', 'Completed']
+BENCHMARK_PASSWORD = 'benchmark'
+INSERT_CHUNK = 5000
+
+
+def _chunks(rows: list, size: int = INSERT_CHUNK):
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
+
+
+def _user_row(rng: random.Random, user_id: int, user_type: str, password_hash: str) -> dict:
+    city = rng.choices(list(CITY_WEIGHTS), weights=list(CITY_WEIGHTS.values()))[0]
+    center_lat, center_lng = CITY_CENTERS[city]
+    lat = round(center_lat + rng.gauss(0, CITY_SPREAD_DEG), 6)
+    lng = round(center_lng + rng.gauss(0, CITY_SPREAD_DEG), 6)
+    neighborhood = rng.choice(NEIGHBORHOODS)
+    street, number = rng.choice(STREETS), str(rng.randint(1, 120))
+    return {
+        'id': user_id,
+        'email': f'{user_type}{user_id}@bench.test',
+        'password_hash': password_hash,
+        'user_type': user_type,
+        'city': city,
+        'city_normalized': normalize_city(city),
+        'neighborhood': neighborhood,
+        'street': street,
+        'street_number': number,
+        'address': f"{street} {number}, {neighborhood}, {city}",
+        'lat': lat,
+        'lng': lng,
+        'grid_lat': grid_index(lat),
+        'grid_lng': grid_index(lng),
+        'geocode_status': 'resolved',
+    }
+
+
+def generate(sitters: int, parents: int, bookings: int, seed: int = 42) -> dict:
+    """Fill the current database with a reproducible synthetic population.
+
+    Rows are written with bulk INSERTs, bypassing the ORM validators, so the derived
+    columns (normalized city, grid cells) are computed here. Every user has the password
+    BENCHMARK_PASSWORD. Returns the ids of the generated sitters and parents.
+    """
+    rng = random.Random(seed)
+    password_hash = hash_password(BENCHMARK_PASSWORD)
+
+    users, sitter_profiles, parent_profiles = [], [], []
+    for user_id in range(1, sitters + 1):
+        users.append(_user_row(rng, user_id, 'sitter', password_hash))
+        sitter_profiles.append({
+            'user_id': user_id,
+            'name': f"{rng.choice(FIRST_NAMES)} {user_id}",
+            'phone_number': f"08{rng.randint(10000000, 99999999)}",
+            'hourly_rate': round(min(max(rng.gauss(15, 5), 5), 60), 1),
+            'experience_years': min(int(rng.expovariate(1 / 4)), 40),
+            'bio': "Обичам децата и имам опит с бебета и ученици.",
+            'rating': 0.0,
+            'rating_sum': 0.0,
+            'reviews_count': 0,
+        })
+    for user_id in range(sitters + 1, sitters + parents + 1):
+        users.append(_user_row(rng, user_id, 'parent', password_hash))
+        parent_profiles.append({
+            'user_id': user_id,
+            'name': f"{rng.choice(FIRST_NAMES)} {user_id}",
+            'phone_number': f"08{rng.randint(10000000, 99999999)}",
+            'children_count': rng.randint(1, 4),
+        })
+
+    sitter_ids = list(range(1, sitters + 1))
+    parent_ids = list(range(sitters + 1, sitters + parents + 1))
+
+    # One booking per sitter-slot so that generated bookings never overlap for a sitter.
+    start = datetime(2030, 1, 1, 9)
+    booking_rows = []
+    for i in range(bookings if sitter_ids and parent_ids else 0):
+        slot = start + timedelta(hours=4 * (i // len(sitter_ids)))
+        booking_rows.append({
+            'parent_id': rng.choice(parent_ids),
+            'sitter_id': sitter_ids[i % len(sitter_ids)],
+            'start_time': slot,
+            'end_time': slot + timedelta(hours=rng.randint(1, 3)),
+            'status': rng.choice(BOOKING_STATUSES),
+            'date_created': start,
+        })
+
+    for table, rows in ((User, users), (SitterProfile, sitter_profiles),
+                        (ParentProfile, parent_profiles), (Booking, booking_rows)):
+        for chunk in _chunks(rows):
+            db.session.execute(db.insert(table), chunk)
+
+    search_stats.rebuild_rollups()
+    rebuild_booking_counters()
+    bump_version(db.session.connection())
+    db.session.commit()
+    return {'sitter_ids': sitter_ids, 'parent_ids': parent_ids}
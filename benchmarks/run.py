@@ -0,0 +1,250 @@
+"""Time the search, ranking and booking paths against a synthetic database.
+
+Usage (from the project root):
+
+    python -m benchmarks.run --sizes 1000 10000 100000 --output bench.json
+    python -m benchmarks.run --sizes 1000 --baseline bench.json
+
+The benchmark uses its own SQLite file, never the application database.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+_tmpdir = tempfile.TemporaryDirectory(prefix='babysitter-bench-')
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(_tmpdir.name, 'bench.db')}")
+os.environ.setdefault('GEOCODE_OFFLINE', '1')
+
+from sqlalchemy.orm import joinedload  # noqa: E402
+
+from app import create_app, db  # noqa: E402
+from catalog import SitterCatalog  # noqa: E402
+from scoring import Scorer  # noqa: E402
+from benchmarks.datagen import BENCHMARK_PASSWORD, generate  # noqa: E402
+import geo  # noqa: E402
+from logic import calculate_distance, search_sitters, sort_sitters_by_distance  # noqa: E402
+from models import User, SitterProfile  # noqa: E402
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+# Parents and bookings generated per sitter.
+PARENTS_PER_SITTER = 1
+BOOKINGS_PER_SITTER = 2
+BOOKING_INSERTS = 100
+# Parallel clients in the login burst.
+LOGIN_BURST = 16
+SEARCH_FILTERS = {'city': 'София', 'max_price': 20, 'min_experience': 2}
+
+app = create_app({'AUTO_MIGRATE': False, 'CACHE_ENABLED': False, 'PROPAGATE_EXCEPTIONS': True,
+                  'LOGIN_RATE_LIMIT_ENABLED': False})
+
+
+def measure(func, repeat: int) -> dict:
+    """Run func `repeat` times and summarize the wall-clock timings in milliseconds."""
+    func()  # warm-up: imports, statement caches, page cache of the database file
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return {
+        'min_ms': round(min(timings), 3),
+        'median_ms': round(statistics.median(timings), 3),
+        'mean_ms': round(statistics.fmean(timings), 3),
+        'repeat': repeat,
+    }
+
+
+def _login(client, email: str) -> None:
+    response = client.post('/login', data={'email': email, 'password': BENCHMARK_PASSWORD})
+    if response.status_code != 302:
+        raise RuntimeError(f"login as {email} returned {response.status_code}")
+
+
+def _get(client, url: str) -> None:
+    response = client.get(url)
+    if response.status_code != 200:
+        raise RuntimeError(f"GET {url} returned {response.status_code}")
+
+
+def retained_bytes(load) -> int:
+    """Return how many bytes the object built by `load` keeps allocated."""
+    tracemalloc.start()
+    try:
+        kept = load()
+        size = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del kept
+    return size
+
+
+def login_burst(emails: list[str]) -> dict:
+    """Log in with every email at once and summarize the per-login latency in milliseconds."""
+    barrier = threading.Barrier(len(emails))
+    timings = []
+
+    def worker(email: str) -> None:
+        with app.test_client() as client:
+            barrier.wait()
+            start = time.perf_counter()
+            _login(client, email)
+            timings.append((time.perf_counter() - start) * 1000)
+
+    threads = [threading.Thread(target=worker, args=(email,)) for email in emails]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    timings.sort()
+    return {
+        'median_ms': round(statistics.median(timings), 3),
+        'p99_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.99))], 3),
+        'max_ms': round(timings[-1], 3),
+        'logins': len(timings),
+    }
+
+
+def run_size(size: int, repeat: int, seed: int) -> dict:
+    """Generate `size` sitters and time every benchmarked path against them."""
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        start = time.perf_counter()
+        ids = generate(size, size * PARENTS_PER_SITTER, size * BOOKINGS_PER_SITTER, seed=seed)
+        generate_seconds = time.perf_counter() - start
+        db.session.remove()
+
+        sitters = SitterProfile.query.options(joinedload(SitterProfile.user)).all()
+        parent = db.session.get(User, ids['parent_ids'][0])
+        parent_email, parent_lat, parent_lng = parent.email, parent.lat, parent.lng
+        burst_emails = [db.session.get(User, user_id).email for user_id in ids['parent_ids'][:LOGIN_BURST]]
+        points = [(s.user.lat, s.user.lng) for s in sitters]
+
+        results = {'generate_s': round(generate_seconds, 3)}
+        results['search_sitters'] = measure(lambda: search_sitters(sitters, **SEARCH_FILTERS), repeat)
+        results['sort_sitters_by_distance'] = measure(
+            lambda: sort_sitters_by_distance(parent_lat, parent_lng, sitters), repeat)
+        results['sort_sitters_by_distance_top12'] = measure(
+            lambda: sort_sitters_by_distance(parent_lat, parent_lng, sitters, limit=12), repeat)
+        results['calculate_distance_all'] = measure(
+            lambda: [calculate_distance(parent_lat, parent_lng, lat, lng) for lat, lng in points], repeat)
+
+        catalog = SitterCatalog()
+        catalog.refresh(db.session)
+        results['catalog_load'] = measure(lambda: SitterCatalog().refresh(db.session), repeat)
+        results['catalog_search_rating_page'] = measure(
+            lambda: catalog.ranked('rating', 13, **SEARCH_FILTERS), repeat)
+        results['catalog_nearest_top12'] = measure(lambda: catalog.nearest(parent_lat, parent_lng, 13), repeat)
+        scorer = Scorer()
+        origin = (parent_lat, parent_lng)
+        results['best_match_top12'] = measure(lambda: catalog.best(scorer, 13, origin=origin), repeat)
+        results['best_match_top12_python'] = measure(
+            lambda: catalog.best(scorer, 13, origin=origin, use_numpy=False), repeat)
+
+        def load_catalog() -> SitterCatalog:
+            loaded = SitterCatalog()
+            loaded.refresh(db.session)
+            return loaded
+
+        db.session.remove()
+        results['orm_bytes_per_sitter'] = retained_bytes(
+            lambda: SitterProfile.query.options(joinedload(SitterProfile.user)).all()) // size
+        db.session.remove()
+        results['catalog_bytes_per_sitter'] = retained_bytes(load_catalog) // size
+        if geo.np is not None:
+            lats, lngs = zip(*points)
+            results['batch_distances_python'] = measure(
+                lambda: geo.batch_distances(parent_lat, parent_lng, lats, lngs, use_numpy=False), repeat)
+        db.session.remove()
+
+    with app.test_client() as client:
+        results['route_index_anonymous'] = measure(lambda: _get(client, '/'), repeat)
+        results['route_index_filtered'] = measure(
+            lambda: _get(client, '/?city=София&max_price=20&min_experience=2'), repeat)
+        results['route_index_text_search'] = measure(lambda: _get(client, '/?q=Lozenets&city=София'), repeat)
+        results['route_api_sitters'] = measure(lambda: _get(client, '/api/v1/sitters?city=София'), repeat)
+        _login(client, parent_email)
+        results['route_index_parent_by_distance'] = measure(lambda: _get(client, '/'), repeat)
+        results['route_my_bookings'] = measure(lambda: _get(client, '/my-bookings'), repeat)
+        results['route_api_bookings'] = measure(lambda: _get(client, '/api/v1/bookings'), repeat)
+
+        slots = iter(range(10 ** 6))
+        sitter_ids = ids['sitter_ids']
+
+        def book() -> None:
+            i = next(slots)
+            slot = datetime(2031, 1, 1, 9) + timedelta(hours=3 * (i // len(sitter_ids)))
+            response = client.post(f'/book/{sitter_ids[i % len(sitter_ids)]}', data={
+                'start_time': slot.strftime('%Y-%m-%dT%H:%M'),
+                'end_time': (slot + timedelta(hours=2)).strftime('%Y-%m-%dT%H:%M'),
+            })
+            if response.status_code != 302:
+                raise RuntimeError(f"booking insert returned {response.status_code}")
+
+        results['booking_insert'] = measure(book, min(repeat * 10, BOOKING_INSERTS))
+
+    results['login_burst'] = login_burst(burst_emails)
+
+    return results
+
+
+def compare(current: dict, baseline: dict) -> list[str]:
+    """Describe the median change of every benchmark present in both runs."""
+    lines = []
+    for size, results in current['results'].items():
+        previous = baseline.get('results', {}).get(size, {})
+        for name, stats in results.items():
+            before = previous.get(name)
+            if not isinstance(stats, dict) or not isinstance(before, dict) or not before['median_ms']:
+                continue
+            change = (stats['median_ms'] - before['median_ms']) / before['median_ms'] * 100
+            lines.append(f"{size:>7} {name:<34} {before['median_ms']:>10.3f} -> {stats['median_ms']:>10.3f} ms"
+                         f" ({change:+.1f}%)")
+    return lines
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES),
+                        help="Numbers of sitters to benchmark with.")
+    parser.add_argument('--repeat', type=int, default=5, help="Timed runs per benchmark.")
+    parser.add_argument('--seed', type=int, default=42, help="Seed of the data generator.")
+    parser.add_argument('--output', help="Write the results to this JSON file.")
+    parser.add_argument('--baseline', help="Compare against the JSON results of an earlier run.")
+    args = parser.parse_args(argv)
+
+    report = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'numpy': geo.np is not None,
+        'seed': args.seed,
+        'results': {},
+    }
+    for size in args.sizes:
+        print(f"Benchmarking {size} sitters...", file=sys.stderr)
+        report['results'][str(size)] = run_size(size, args.repeat, args.seed)
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            print('\n'.join(compare(report, json.load(f))), file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
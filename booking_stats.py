@@ -0,0 +1,126 @@
+from collections import Counter
+
+from sqlalchemy import event, func, inspect
+
+from availability import ACTIVE_STATUSES
+from models import db, Booking, BookingCounter
+
+# Booking status -> the BookingCounter column counting it.
+COUNTED_STATUSES = {
+    'Pending': 'pending',
+    'Confirmed': 'confirmed',
+    'AwaitingRating': 'awaiting_rating',
+    'Completed': 'completed',
+    'Cancelled': 'cancelled',
+    'Expired': 'expired',
+}
+# Bookings that still need something to happen: listed first on the dashboard.
+OPEN_STATUSES = ACTIVE_STATUSES + ('AwaitingRating',)
+# Bookings in these states are only shown when the user opens their history.
+HISTORY_STATUSES = ('Completed', 'Cancelled', 'Expired')
+
+
+class BookingCounts:
+    """One user's booking counts by status, answered from their counter row."""
+
+    def __init__(self, row: BookingCounter | None) -> None:
+        for column in COUNTED_STATUSES.values():
+            setattr(self, column, (getattr(row, column) or 0) if row is not None else 0)
+
+    @property
+    def upcoming(self) -> int:
+        return sum(getattr(self, COUNTED_STATUSES[status]) for status in OPEN_STATUSES)
+
+    @property
+    def history(self) -> int:
+        return sum(getattr(self, COUNTED_STATUSES[status]) for status in HISTORY_STATUSES)
+
+
+def booking_counts(user_id: int) -> BookingCounts:
+    """Return the user's booking counts with one primary key lookup."""
+    return BookingCounts(db.session.get(BookingCounter, user_id))
+
+
+def _apply(connection, user_id: int, status: str | None, delta: int) -> None:
+    column = COUNTED_STATUSES.get(status)
+    if column is None or user_id is None:
+        return
+    counter = BookingCounter.__table__.c[column]
+    updated = connection.execute(
+        db.update(BookingCounter).where(BookingCounter.user_id == user_id).values({column: counter + delta}))
+    if updated.rowcount == 0 and delta > 0:
+        connection.execute(db.insert(BookingCounter).values({'user_id': user_id, column: delta}))
+
+
+def move_counts(connection, rows, old_status: str, new_status: str) -> None:
+    """Move bookings changed by a bulk UPDATE between counters; `rows` are (parent_id, sitter_id) pairs."""
+    moved = Counter()
+    for parent_id, sitter_id in rows:
+        moved[parent_id] += 1
+        moved[sitter_id] += 1
+    for user_id, n in moved.items():
+        _apply(connection, user_id, old_status, -n)
+        _apply(connection, user_id, new_status, n)
+
+
+def _old_value(state, attr: str):
+    history = state.attrs[attr].history
+    if history.deleted:
+        return history.deleted[0]
+    return getattr(state.obj(), attr)
+
+
+def _track_changes(session, flush_context) -> None:
+    if session.info.get('skip_rollups'):
+        return
+
+    changes = []
+    for obj in session.new:
+        if isinstance(obj, Booking):
+            changes.append((obj, obj.status, 1))
+
+    for obj in session.deleted:
+        if isinstance(obj, Booking):
+            changes.append((obj, _old_value(inspect(obj), 'status'), -1))
+
+    for obj in session.dirty:
+        if isinstance(obj, Booking) and obj not in session.deleted:
+            history = inspect(obj).attrs.status.history
+            if history.deleted and history.added and history.deleted[0] != history.added[0]:
+                changes.append((obj, history.deleted[0], -1))
+                changes.append((obj, history.added[0], 1))
+
+    if changes:
+        connection = session.connection()
+        for booking, status, sign in changes:
+            _apply(connection, booking.parent_id, status, sign)
+            _apply(connection, booking.sitter_id, status, sign)
+
+
+def rebuild_booking_counters() -> int:
+    """Recompute every counter row from the booking table; returns the number of users counted."""
+    db.session.execute(db.delete(BookingCounter))
+    totals = {}
+    for user_column in (Booking.parent_id, Booking.sitter_id):
+        rows = db.session.execute(
+            db.select(user_column, Booking.status, func.count()).group_by(user_column, Booking.status))
+        for user_id, status, n in rows:
+            if status in COUNTED_STATUSES:
+                counts = totals.setdefault(user_id, dict.fromkeys(COUNTED_STATUSES.values(), 0))
+                counts[COUNTED_STATUSES[status]] += n
+
+    db.session.add_all(BookingCounter(user_id=user_id, **counts) for user_id, counts in totals.items())
+    return len(totals)
+
+
+def _load_old_status(target, value, oldvalue, initiator) -> None:
+    pass
+
+
+def init_booking_counters() -> None:
+    """Keep the counters in step with every flush that inserts, updates or deletes bookings."""
+    if not event.contains(db.session, 'after_flush', _track_changes):
+        # active_history loads the previous status before it is overwritten, even on an
+        # expired instance, so the flush can move the booking out of its old counter.
+        event.listen(Booking.status, 'set', _load_old_status, active_history=True)
+        event.listen(db.session, 'after_flush', _track_changes)
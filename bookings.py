@@ -0,0 +1,100 @@
+from datetime import datetime
+
+from availability import ACTIVE_STATUSES, find_conflicts, lock_sitter
+from booking_stats import move_counts
+from models import db, User, Booking
+from outbox import publish
+
+ANSWERS = {'confirm': ('Confirmed', 'booking_confirmed'), 'decline': ('Cancelled', 'booking_declined')}
+
+
+class BookingError(Exception):
+    """A refused booking change; `status` is the HTTP status the API answers with and
+    `category` the flash category the pages show the message with."""
+
+    def __init__(self, message: str, status: int = 409, category: str = 'danger') -> None:
+        super().__init__(message)
+        self.message = message
+        self.status = status
+        self.category = category
+
+
+def move_booking(booking: Booking, old_statuses: tuple[str, ...], new_status: str) -> str | None:
+    """Move the booking to `new_status` if it still has one of `old_statuses`; returns the status
+    it left, or None when a concurrent request or sweep changed it first.
+
+    Each UPDATE re-checks the status like the scheduler's sweep, so the counters are moved
+    exactly once however the changes interleave.
+    """
+    for old_status in old_statuses:
+        moved = db.session.execute(
+            db.update(Booking)
+            .where(Booking.id == booking.id, Booking.status == old_status)
+            .values(status=new_status)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if moved:
+            move_counts(db.session.connection(), [(booking.parent_id, booking.sitter_id)], old_status, new_status)
+            return old_status
+    return None
+
+
+def request_booking(parent_id: int, sitter_id: int, start: datetime, end: datetime) -> Booking:
+    """Create and commit a pending booking, refusing past, empty and overlapping slots."""
+    if start < datetime.now():
+        raise BookingError("You cannot book a sitter for a past date or time!", 422)
+    if start >= end:
+        raise BookingError("End time must be after start time.", 422)
+    if db.session.scalar(db.select(User.id).filter_by(id=sitter_id, user_type='sitter')) is None:
+        raise BookingError("Sitter not found.", 404)
+
+    lock_sitter(sitter_id)
+    if find_conflicts(sitter_id, start, end):
+        db.session.rollback()
+        raise BookingError("The sitter is already booked for that time. Please choose another slot.")
+
+    booking = Booking(parent_id=parent_id, sitter_id=sitter_id, start_time=start, end_time=end)
+    db.session.add(booking)
+    db.session.flush()
+    publish('booking_requested', booking, sitter_id)
+    db.session.commit()
+    return booking
+
+
+def answer_booking(booking: Booking, sitter_id: int, action: str) -> None:
+    """Confirm or decline a pending request on behalf of its sitter and commit."""
+    if sitter_id != booking.sitter_id:
+        raise BookingError("Unauthorized action.", 403)
+    if action not in ANSWERS:
+        raise BookingError("Unknown action.", 400)
+    if booking.status != 'Pending':
+        raise BookingError("This request has already been answered or has expired.", category='warning')
+
+    status, event_name = ANSWERS[action]
+    if status == 'Confirmed':
+        lock_sitter(booking.sitter_id)
+        if find_conflicts(booking.sitter_id, booking.start_time, booking.end_time,
+                          exclude_id=booking.id, statuses=('Confirmed',)):
+            db.session.rollback()
+            raise BookingError("You already have a confirmed booking at that time.")
+    if move_booking(booking, ('Pending',), status) is None:
+        db.session.rollback()
+        raise BookingError("This request has already been answered or has expired.", category='warning')
+    publish(event_name, booking, booking.parent_id)
+    db.session.commit()
+
+
+def cancel_booking(booking: Booking, parent_id: int) -> None:
+    """Cancel a booking on behalf of its parent before it starts and commit."""
+    if parent_id != booking.parent_id:
+        raise BookingError("Unauthorized action.", 403)
+    if booking.start_time <= datetime.now():
+        raise BookingError("You cannot cancel a booking that has already started.", category='warning')
+    if booking.status not in ACTIVE_STATUSES:
+        raise BookingError("This booking is no longer active.", category='warning')
+
+    if move_booking(booking, ACTIVE_STATUSES, 'Cancelled') is None:
+        db.session.rollback()
+        raise BookingError("This booking is no longer active.", category='warning')
+    publish('booking_cancelled', booking, booking.sitter_id)
+    db.session.commit()
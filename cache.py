@@ -0,0 +1,142 @@
+import hashlib
+import os
+import pickle
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+_MISS = object()
+
+
+class FileCacheBackend:
+    """Second-level cache that keeps pickled entries as files in a local directory."""
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key) -> str:
+        digest = hashlib.sha1(repr(key).encode()).hexdigest()
+        return os.path.join(self.directory, f"{digest}.cache")
+
+    def get(self, key):
+        try:
+            with open(self._path(key), 'rb') as f:
+                expires_at, value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return _MISS
+        if expires_at < time.time():
+            self.delete(key)
+            return _MISS
+        return value
+
+    def set(self, key, value, expires_at: float) -> None:
+        tmp_path = f"{self._path(key)}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump((expires_at, value), f)
+        os.replace(tmp_path, self._path(key))
+
+    def delete(self, key) -> None:
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def clear(self) -> None:
+        for name in os.listdir(self.directory):
+            if name.endswith('.cache'):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+
+
+class LRUCache:
+    """Thread-safe in-process cache with LRU eviction, per-entry TTL and hit/memory statistics.
+
+    An optional backend (e.g. FileCacheBackend) is consulted on in-memory misses and
+    written through on every set, so entries survive restarts.
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = 60.0, backend=None) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                expires_at, value, size = entry
+                if expires_at >= time.time():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                self._remove(key)
+
+        if self.backend is not None:
+            value = self.backend.get(key)
+            if value is not _MISS:
+                self._store(key, value, time.time() + self.ttl)
+                with self._lock:
+                    self.hits += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return default
+
+    def set(self, key, value, ttl: float | None = None) -> None:
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        self._store(key, value, expires_at)
+        if self.backend is not None:
+            self.backend.set(key, value, expires_at)
+
+    def delete(self, key) -> None:
+        with self._lock:
+            self._remove(key)
+        if self.backend is not None:
+            self.backend.delete(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+        if self.backend is not None:
+            self.backend.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._data),
+                'maxsize': self.maxsize,
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+            }
+
+    def _store(self, key, value, expires_at: float) -> None:
+        size = sys.getsizeof(value)
+        with self._lock:
+            self._remove(key)
+            self._data[key] = (expires_at, value, size)
+            self._bytes += size
+            while len(self._data) > self.maxsize:
+                _, (_, _, evicted_size) = self._data.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def _remove(self, key) -> None:
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
@@ -0,0 +1,455 @@
+import bisect
+import threading
+import uuid
+from array import array
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import contains_eager
+
+import geo
+from geo import MISSING_DISTANCE, batch_distances, bounding_cells, grid_index
+from instrumentation import timed
+from logic import calculate_distance
+from models import db, normalize_city, User, SitterProfile, Review, CatalogVersion
+from pagination import Page, decode_cursor, encode_cursor
+from queries import INITIAL_SEARCH_RADIUS_KM, MAX_SEARCH_RADIUS_KM, UNLOCATED_DISTANCE
+from scoring import Scorer, top_k
+
+# Columns the catalog keeps; changing any other column never bumps the catalog version.
+SITTER_FIELDS = ('hourly_rate', 'experience_years', 'rating', 'reviews_count')
+USER_FIELDS = ('city_normalized', 'lat', 'lng', 'geocode_status')
+ORDERS = ('rating', 'experience')
+
+
+def _select_rows(session, user_ids=None):
+    query = (
+        db.select(SitterProfile.id, SitterProfile.user_id, SitterProfile.hourly_rate,
+                  SitterProfile.experience_years, SitterProfile.rating, SitterProfile.reviews_count,
+                  User.city_normalized, User.lat, User.lng, User.geocode_status)
+        .join(User, SitterProfile.user_id == User.id)
+    )
+    if user_ids is not None:
+        query = query.where(SitterProfile.user_id.in_(user_ids))
+    return session.execute(query.order_by(SitterProfile.id)).all()
+
+
+def current_key(session) -> tuple[str, int] | None:
+    """Return the (epoch, version) of the sitter data, or None before the first tracked change."""
+    row = session.execute(
+        db.select(CatalogVersion.epoch, CatalogVersion.version).where(CatalogVersion.id == 1)
+    ).first()
+    return tuple(row) if row else None
+
+
+def bump_version(connection) -> tuple[str, int]:
+    """Count one more change to the searchable sitter fields; returns the new (epoch, version)."""
+    row = connection.execute(
+        db.update(CatalogVersion).where(CatalogVersion.id == 1)
+        .values(version=CatalogVersion.version + 1)
+        .returning(CatalogVersion.epoch, CatalogVersion.version)
+    ).first()
+    if row is None:
+        epoch = uuid.uuid4().hex
+        connection.execute(db.insert(CatalogVersion).values(id=1, epoch=epoch, version=1))
+        return epoch, 1
+    return tuple(row)
+
+
+class SitterCatalog:
+    """Read-optimized snapshot of the fields sitter searches filter and sort on.
+
+    One row per sitter profile, in id order, stored column by column in typed arrays, with the
+    rating and experience orderings and a grid of located rows kept alongside. It is shared by
+    every request of an application and follows the database change version: commits made in
+    this process are patched in row by row, anything else triggers a full reload.
+    """
+
+    def __init__(self, max_patch: int = 500, max_dead_ratio: float = 0.25) -> None:
+        self.max_patch = max_patch
+        self.max_dead_ratio = max_dead_ratio
+        self.key = None
+        self.loaded = False
+        self._log: dict[tuple[str, int], set[int]] = {}
+        self._lock = threading.RLock()
+        self._clear()
+
+    def _clear(self) -> None:
+        self.ids = array('q')
+        self.user_ids = array('q')
+        self.rates = array('d')
+        self.experience = array('q')
+        self.ratings = array('d')
+        self.reviews = array('q')
+        self.cities = array('l')
+        self.lats = array('d')
+        self.lngs = array('d')
+        self.alive = bytearray()
+        self.located = bytearray()
+        self.city_codes: dict[str, int] = {}
+        self.rows: dict[int, int] = {}
+        self.orders = {sort: array('l') for sort in ORDERS}
+        self.cells: dict[tuple[int, int], list[int]] = {}
+        self.alive_count = 0
+        self.located_count = 0
+
+    def __len__(self) -> int:
+        return self.alive_count
+
+    def _sort_key(self, sort: str):
+        values, ids = (self.ratings if sort == 'rating' else self.experience), self.ids
+        return lambda row: (-values[row], ids[row])
+
+    def _write(self, row: int, values) -> None:
+        if row == len(self.ids):
+            for column in (self.ids, self.user_ids, self.rates, self.experience, self.ratings, self.reviews,
+                           self.cities, self.lats, self.lngs, self.alive, self.located):
+                column.append(0)
+        located = values.geocode_status == 'resolved' and values.lat is not None and values.lng is not None
+        self.ids[row] = values.id
+        self.user_ids[row] = values.user_id
+        self.rates[row] = values.hourly_rate
+        self.experience[row] = values.experience_years or 0
+        self.ratings[row] = values.rating or 0.0
+        self.reviews[row] = values.reviews_count or 0
+        self.cities[row] = self.city_codes.setdefault(values.city_normalized or '', len(self.city_codes))
+        self.lats[row] = values.lat if located else 0.0
+        self.lngs[row] = values.lng if located else 0.0
+        self.located[row] = located
+        self.rows[values.user_id] = row
+
+    def _cell(self, row: int) -> tuple[int, int]:
+        return grid_index(self.lats[row]), grid_index(self.lngs[row])
+
+    def _link(self, row: int, sort: bool = True) -> None:
+        self.alive[row] = 1
+        self.alive_count += 1
+        if sort:
+            for name, order in self.orders.items():
+                bisect.insort(order, row, key=self._sort_key(name))
+        if self.located[row]:
+            self.cells.setdefault(self._cell(row), []).append(row)
+            self.located_count += 1
+
+    def _unlink(self, row: int) -> None:
+        if not self.alive[row]:
+            return
+        for name, order in self.orders.items():
+            key = self._sort_key(name)
+            del order[bisect.bisect_left(order, key(row), key=key)]
+        if self.located[row]:
+            self.cells[self._cell(row)].remove(row)
+            self.located_count -= 1
+        self.alive[row] = 0
+        self.alive_count -= 1
+
+    def _load(self, session) -> None:
+        self._clear()
+        rows = _select_rows(session)
+        if not rows:
+            return
+        ids, user_ids, rates, experience, ratings, reviews, cities, lats, lngs, statuses = zip(*rows)
+        located = [status == 'resolved' and lat is not None and lng is not None
+                   for status, lat, lng in zip(statuses, lats, lngs)]
+        self.ids, self.user_ids = array('q', ids), array('q', user_ids)
+        self.rates = array('d', rates)
+        self.experience = array('q', [years or 0 for years in experience])
+        self.ratings = array('d', [rating or 0.0 for rating in ratings])
+        self.reviews = array('q', [count or 0 for count in reviews])
+        self.cities = array('l', [self.city_codes.setdefault(city or '', len(self.city_codes)) for city in cities])
+        self.lats = array('d', [lat if ok else 0.0 for lat, ok in zip(lats, located)])
+        self.lngs = array('d', [lng if ok else 0.0 for lng, ok in zip(lngs, located)])
+        self.alive, self.located = bytearray(b'\x01' * len(rows)), bytearray(located)
+        self.rows = dict(zip(user_ids, range(len(rows))))
+        self.alive_count = len(rows)
+        for row in (row for row, ok in enumerate(located) if ok):
+            self.cells.setdefault(self._cell(row), []).append(row)
+        self.located_count = sum(located)
+        for name in ORDERS:
+            self.orders[name] = array('l', sorted(range(len(self.ids)), key=self._sort_key(name)))
+
+    def _patch(self, session, user_ids: set[int]) -> bool:
+        """Re-read the given sitters; False if the rows can no longer be kept in id order."""
+        fresh = {values.user_id: values for values in _select_rows(session, user_ids)}
+        for user_id in sorted(user_ids, key=lambda u: fresh[u].id if u in fresh else 0):
+            row, values = self.rows.get(user_id), fresh.get(user_id)
+            if row is not None:
+                self._unlink(row)
+                if values is None or self.ids[row] != values.id:
+                    del self.rows[user_id]
+                    row = None
+            if values is None:
+                continue
+            if row is None:
+                if self.ids and values.id < self.ids[-1]:
+                    return False
+                row = len(self.ids)
+            self._write(row, values)
+            self._link(row)
+        return len(self.ids) - self.alive_count <= self.max_dead_ratio * len(self.ids)
+
+    def _changes_since(self, key) -> set[int] | None:
+        if not self.loaded or key is None or self.key is None or key[0] != self.key[0] or key[1] < self.key[1]:
+            return None
+        changed = set()
+        for version in range(self.key[1] + 1, key[1] + 1):
+            if (key[0], version) not in self._log:
+                return None
+            changed |= self._log[(key[0], version)]
+        return changed
+
+    def record(self, key: tuple[str, int], user_ids: set[int]) -> None:
+        """Remember which sitters a committed change version touched, for the next refresh."""
+        with self._lock:
+            self._log[key] = user_ids
+
+    @timed('catalog_refresh')
+    def refresh(self, session) -> None:
+        """Bring the snapshot up to the change version visible to `session`."""
+        key = current_key(session)
+        with self._lock:
+            if self.loaded and key == self.key:
+                return
+            changed = self._changes_since(key)
+            if changed is None or len(changed) > self.max_patch or not self._patch(session, changed):
+                self._load(session)
+            self.key, self.loaded = key, True
+            self._log = {k: ids for k, ids in self._log.items() if key is None or k[0] != key[0] or k[1] > key[1]}
+
+    def _matcher(self, city=None, max_price=None, min_experience=0):
+        code = self.city_codes.get(normalize_city(city), -1) if city else None
+        cities, rates, experience = self.cities, self.rates, self.experience
+
+        def matches(row: int) -> bool:
+            return ((code is None or cities[row] == code)
+                    and (not max_price or rates[row] <= max_price)
+                    and (not min_experience or experience[row] >= min_experience))
+        return matches
+
+    def ranked(self, sort: str, limit: int, after: tuple | None = None, **filters) -> list[tuple[int, tuple]]:
+        """Return up to `limit` (profile id, cursor key) pairs in 'rating' or 'experience' order."""
+        with self._lock:
+            order, key = self.orders[sort], self._sort_key(sort)
+            values = self.ratings if sort == 'rating' else self.experience
+            start = 0 if after is None else bisect.bisect_right(order, (-after[0], after[1]), key=key)
+            matches = self._matcher(**filters)
+            result = []
+            for i in range(start, len(order)):
+                row = order[i]
+                if matches(row):
+                    result.append((self.ids[row], (values[row], self.ids[row])))
+                    if len(result) == limit:
+                        break
+            return result
+
+    def _located_in_box(self, lat: float, lng: float, radius_km: float, matches) -> tuple[list[int], int]:
+        min_lat, max_lat, min_lng, max_lng = bounding_cells(lat, lng, radius_km)
+        if (max_lat - min_lat + 1) * (max_lng - min_lng + 1) > len(self.cells):
+            cells = [rows for (cell_lat, cell_lng), rows in self.cells.items()
+                     if min_lat <= cell_lat <= max_lat and min_lng <= cell_lng <= max_lng]
+        else:
+            cells = [self.cells[cell] for cell in (
+                (cell_lat, cell_lng)
+                for cell_lat in range(min_lat, max_lat + 1)
+                for cell_lng in range(min_lng, max_lng + 1)
+            ) if cell in self.cells]
+        in_box = sum(len(rows) for rows in cells)
+        return [row for rows in cells for row in rows if matches(row)], in_box
+
+    def nearest(self, lat: float, lng: float, limit: int, after: tuple | None = None,
+                **filters) -> list[tuple[int, tuple]]:
+        """Return up to `limit` (profile id, (distance, id)) pairs, nearest first.
+
+        Follows queries.nearest_page: located sitters are searched in a radius that starts
+        small and doubles up to MAX_SEARCH_RADIUS_KM, then the unlocated ones follow in id
+        order with UNLOCATED_DISTANCE as their distance.
+        """
+        if lat is None or lng is None:
+            return []
+        with self._lock:
+            matches = self._matcher(**filters)
+            if after is not None and after[0] == UNLOCATED_DISTANCE:
+                return self._unlocated(limit, after[1], matches)
+            entries = self._nearest_located(lat, lng, limit, after, matches)
+            if len(entries) < limit:
+                entries += self._unlocated(limit - len(entries), None, matches)
+            return entries
+
+    def _unlocated(self, limit: int, after_id: int | None, matches) -> list[tuple[int, tuple]]:
+        start = 0 if after_id is None else bisect.bisect_right(self.ids, after_id)
+        result = []
+        for row in range(start, len(self.ids)):
+            if self.alive[row] and not self.located[row] and matches(row):
+                result.append((self.ids[row], (UNLOCATED_DISTANCE, self.ids[row])))
+                if len(result) == limit:
+                    break
+        return result
+
+    def _nearest_located(self, lat: float, lng: float, limit: int, after: tuple | None,
+                         matches) -> list[tuple[int, tuple]]:
+        radius = INITIAL_SEARCH_RADIUS_KM
+        if after is not None:
+            radius = min(max(radius, after[0]), MAX_SEARCH_RADIUS_KM)
+        while True:
+            rows, in_box = self._located_in_box(lat, lng, radius, matches)
+            distances = batch_distances(lat, lng, [self.lats[r] for r in rows], [self.lngs[r] for r in rows])
+            ranked = sorted(zip(distances, (self.ids[r] for r in rows)))
+            if after is not None:
+                ranked = [entry for entry in ranked if entry > tuple(after)]
+            in_range = [entry for entry in ranked if entry[0] <= radius]
+
+            if radius >= MAX_SEARCH_RADIUS_KM or len(in_range) >= limit:
+                return [(entry[1], entry) for entry in in_range[:limit]]
+            if in_box >= self.located_count:
+                return [(entry[1], entry) for entry in ranked[:limit]]
+            radius = min(radius * 2, MAX_SEARCH_RADIUS_KM)
+
+    def _candidates(self, np, city=None, max_price=None, min_experience=0):
+        """Return the rows matching the filters, as a numpy index array when numpy is given."""
+        if np is None:
+            matches = self._matcher(city, max_price, min_experience)
+            return [row for row in range(len(self.ids)) if self.alive[row] and matches(row)]
+        mask = np.frombuffer(self.alive, dtype=np.uint8).astype(bool)
+        if city:
+            mask &= np.frombuffer(self.cities, dtype=self.cities.typecode) == self.city_codes.get(
+                normalize_city(city), -1)
+        if max_price:
+            mask &= np.frombuffer(self.rates, dtype=float) <= max_price
+        if min_experience:
+            mask &= np.frombuffer(self.experience, dtype=self.experience.typecode) >= min_experience
+        return np.flatnonzero(mask)
+
+    def _column(self, np, column: array | bytearray, rows):
+        if np is None:
+            return [column[row] for row in rows]
+        return np.frombuffer(column, dtype=getattr(column, 'typecode', 'B'))[rows]
+
+    def best(self, scorer: Scorer, limit: int, after: tuple | None = None,
+             origin: tuple[float, float] | None = None, use_numpy: bool = True,
+             **filters) -> list[tuple[int, tuple]]:
+        """Return up to `limit` (profile id, (score, id)) pairs, best match first.
+
+        Every matching sitter is scored in one batch (vectorized when numpy is installed)
+        and only the top `limit` after the cursor are kept.
+        """
+        np = geo.np if use_numpy else None
+        with self._lock:
+            if not self.ids:
+                return []
+            rows = self._candidates(np, **filters)
+            distances = None
+            if origin is not None:
+                distances = batch_distances(*origin, self._column(np, self.lats, rows),
+                                            self._column(np, self.lngs, rows), use_numpy=use_numpy)
+                located = self._column(np, self.located, rows)
+                if np is None:
+                    distances = [d if ok else MISSING_DISTANCE for d, ok in zip(distances, located)]
+                else:
+                    distances = np.where(located.astype(bool), distances, MISSING_DISTANCE)
+            scores = scorer.score_columns(
+                distances, self._column(np, self.ratings, rows), self._column(np, self.reviews, rows),
+                self._column(np, self.rates, rows), self._column(np, self.experience, rows),
+                filters.get('max_price'), use_numpy=use_numpy)
+            ids = self._column(np, self.ids, rows)
+            positions = top_k(scores, ids, limit, after, use_numpy=use_numpy)
+            return [(int(ids[i]), (float(scores[i]), int(ids[i]))) for i in positions]
+
+
+def hydrate(session, profile_ids: list[int], options=()) -> list[SitterProfile]:
+    """Load the given sitter profiles with their users in one query, in the order given.
+
+    `options` are extra loader options, e.g. load_only to skip columns nobody reads.
+    """
+    if not profile_ids:
+        return []
+    sitters = (
+        session.query(SitterProfile)
+        .join(User, SitterProfile.user_id == User.id)
+        .options(contains_eager(SitterProfile.user), *options)
+        .filter(SitterProfile.id.in_(profile_ids))
+        .all()
+    )
+    by_id = {sitter.id: sitter for sitter in sitters}
+    return [by_id[i] for i in profile_ids if i in by_id]
+
+
+def catalog_page(catalog: SitterCatalog, session, order: str, cursor: str | None, per_page: int,
+                 origin: tuple[float, float] | None = None, scorer: Scorer | None = None, options=(),
+                 **filters) -> Page:
+    """Return one keyset page in 'rating', 'experience', 'distance' or 'best' order, hydrating only its sitters.
+
+    Cursors are interchangeable with queries.sitter_page, queries.nearest_page and scoring.scored_page.
+    """
+    after = decode_cursor(cursor, 2, numeric=True)
+    if order == 'distance':
+        entries = catalog.nearest(*origin, per_page + 1, after, **filters)
+    elif order == 'best':
+        entries = catalog.best(scorer, per_page + 1, after, origin, **filters)
+    else:
+        entries = catalog.ranked(order, per_page + 1, after, **filters)
+
+    shown = entries[:per_page]
+    items = hydrate(session, [profile_id for profile_id, _ in shown], options)
+    keys = {profile_id: key for profile_id, key in shown}
+    for sitter in items:
+        if order == 'distance':
+            if keys[sitter.id][0] != UNLOCATED_DISTANCE:
+                sitter.distance = keys[sitter.id][0]
+        elif order == 'best':
+            sitter.score = keys[sitter.id][0]
+            if origin is not None and sitter.user.geocode_status == 'resolved' and sitter.user.lat is not None:
+                sitter.distance = calculate_distance(*origin, sitter.user.lat, sitter.user.lng)
+    next_cursor = encode_cursor(shown[-1][1]) if len(entries) > per_page else None
+    return Page(items, next_cursor)
+
+
+def _collect_changes(session, flush_context) -> None:
+    changed = set()
+    for obj in session.new:
+        if isinstance(obj, SitterProfile):
+            changed.add(obj.user_id)
+        elif isinstance(obj, Review):
+            changed.add(obj.sitter_id)
+    for obj in session.deleted:
+        if isinstance(obj, SitterProfile):
+            changed.add(obj.user_id)
+        elif isinstance(obj, User) and obj.user_type == 'sitter':
+            changed.add(obj.id)
+    for obj in session.dirty:
+        if isinstance(obj, SitterProfile):
+            fields = SITTER_FIELDS
+        elif isinstance(obj, User) and obj.user_type == 'sitter':
+            fields = USER_FIELDS
+        else:
+            continue
+        state = inspect(obj)
+        if any(state.attrs[field].history.has_changes() for field in fields):
+            changed.add(obj.user_id if isinstance(obj, SitterProfile) else obj.id)
+
+    changed.discard(None)
+    if changed:
+        key = bump_version(session.connection())
+        session.info.setdefault('catalog_changes', []).append((key, changed))
+
+
+def _record_changes(session) -> None:
+    changes = session.info.pop('catalog_changes', [])
+    if changes and has_app_context():
+        catalog = current_app.extensions.get('sitter_catalog')
+        if catalog is not None:
+            for key, user_ids in changes:
+                catalog.record(key, user_ids)
+
+
+def _discard_changes(session, previous_transaction) -> None:
+    session.info.pop('catalog_changes', None)
+
+
+def init_catalog(app) -> None:
+    """Give the application a sitter catalog (unless CATALOG_ENABLED is off) and version every sitter change."""
+    if app.config['CATALOG_ENABLED']:
+        app.extensions['sitter_catalog'] = SitterCatalog(max_patch=app.config['CATALOG_MAX_PATCH'])
+    if not event.contains(db.session, 'after_flush', _collect_changes):
+        event.listen(db.session, 'after_flush', _collect_changes)
+        event.listen(db.session, 'after_commit', _record_changes)
+        event.listen(db.session, 'after_soft_rollback', _discard_changes)
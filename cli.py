@@ -0,0 +1,382 @@
+import csv
+import json
+from datetime import datetime
+
+import click
+from flask.cli import AppGroup, with_appcontext
+
+import search_stats
+from availability import ACTIVE_STATUSES, is_sitter_free, lock_sitter
+from booking_stats import COUNTED_STATUSES, rebuild_booking_counters
+from catalog import bump_version
+from logic import (clamp_children_count,
+                   clamp_experience,
+                   clamp_hourly_rate,
+                   compose_address,
+                   get_coords_from_address,
+                   validate_address_fields)
+from models import db, User, SitterProfile, ParentProfile, Booking
+from ratings import backfill_rating_sums, recompute_ratings
+from scheduler import sweep_bookings
+
+data_cli = AppGroup('data', help="Bulk import and export of sitters, parents and bookings.")
+
+USER_COLUMNS = ['email', 'password_hash', 'name', 'phone', 'city', 'neighborhood', 'street',
+                'street_number', 'block', 'entrance', 'address', 'lat', 'lng', 'bio']
+EXPORT_COLUMNS = {
+    'sitters': USER_COLUMNS + ['hourly_rate', 'experience', 'rating', 'reviews_count', 'rating_sum'],
+    'parents': USER_COLUMNS + ['children_count'],
+    'bookings': ['parent_email', 'sitter_email', 'start_time', 'end_time', 'status'],
+}
+BLOCK_LABELS = {'sitters': 'блок', 'parents': 'block'}
+DATETIME_FORMAT = '%Y-%m-%dT%H:%M'
+
+
+class RowError(ValueError):
+    """A row that fails validation; it is reported and skipped."""
+
+
+def _detect_format(path: str, fmt: str | None) -> str:
+    if fmt:
+        return fmt
+    return 'jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv'
+
+
+def read_rows(stream, fmt: str, errors: list):
+    """Yield (line number, row dict) from a CSV or JSONL stream without loading it into memory.
+
+    JSONL lines that are not a JSON object are skipped and appended to `errors` as
+    (line number, message).
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    else:
+        for line_no, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                errors.append((line_no, f"invalid JSON: {e}"))
+                continue
+            if not isinstance(row, dict):
+                errors.append((line_no, "expected a JSON object"))
+                continue
+            yield line_no, row
+
+
+def _text(row: dict, key: str) -> str:
+    value = row.get(key)
+    return '' if value is None else str(value).strip()
+
+
+def _float_or_none(value) -> float | None:
+    return None if value in (None, '') else float(value)
+
+
+def _rating_totals(row: dict) -> tuple[int, float]:
+    """Return (reviews_count, rating_sum) of a sitter row.
+
+    Files without rating_sum derive it from the average, as ratings.backfill_rating_sums does.
+    """
+    try:
+        reviews_count = int(_float_or_none(row.get('reviews_count')) or 0)
+        rating_sum = _float_or_none(row.get('rating_sum'))
+        if rating_sum is None:
+            rating_sum = (_float_or_none(row.get('rating')) or 0.0) * reviews_count
+    except (TypeError, ValueError, OverflowError) as e:
+        raise RowError(f"invalid number: {e}")
+    if reviews_count < 0 or not 0 <= rating_sum <= 5 * reviews_count:
+        raise RowError("rating_sum must lie between 0 and 5 per review")
+    return reviews_count, rating_sum
+
+
+def build_user(row: dict, kind: str, defer_geocode: bool) -> User:
+    """Validate a user row with the registration form rules and build the User and profile."""
+    email = _text(row, 'email')
+    if not email:
+        raise RowError("email is mandatory")
+
+    city, neighborhood, street = _text(row, 'city'), _text(row, 'neighborhood'), _text(row, 'street')
+    street_number, block, entrance = _text(row, 'street_number'), _text(row, 'block'), _text(row, 'entrance')
+
+    errors = validate_address_fields(city, neighborhood, street, street_number, block)
+    if errors:
+        raise RowError(" ".join(errors))
+    address = _text(row, 'address') or compose_address(city, neighborhood, street, street_number, block,
+                                                       entrance, block_label=BLOCK_LABELS[kind])
+
+    lat, lng = _float_or_none(row.get('lat')), _float_or_none(row.get('lng'))
+    if lat is not None and lng is not None:
+        geocode_status = 'resolved'
+    elif defer_geocode:
+        geocode_status = 'pending'
+    else:
+        lat, lng = get_coords_from_address(address)
+        if lat is None:
+            raise RowError(f"could not geocode address '{address}'")
+        geocode_status = 'resolved'
+
+    user = User(email=email, user_type=kind[:-1], lat=lat, lng=lng, geocode_status=geocode_status,
+                address=address, city=city, neighborhood=neighborhood, street=street,
+                street_number=street_number, block=block, entrance=entrance)
+    if _text(row, 'password_hash'):
+        user.password_hash = _text(row, 'password_hash')
+    elif _text(row, 'password'):
+        user.set_password(_text(row, 'password'))
+    else:
+        raise RowError("password or password_hash is mandatory")
+
+    reviews_count, rating_sum = _rating_totals(row) if kind == 'sitters' else (0, 0.0)
+    try:
+        if kind == 'sitters':
+            SitterProfile(user=user, name=_text(row, 'name'), phone_number=_text(row, 'phone'),
+                          hourly_rate=clamp_hourly_rate(row.get('hourly_rate')),
+                          experience_years=clamp_experience(row.get('experience') or 0),
+                          bio=_text(row, 'bio'), reviews_count=reviews_count, rating_sum=rating_sum,
+                          rating=rating_sum / reviews_count if reviews_count else 0.0)
+        else:
+            ParentProfile(user=user, name=_text(row, 'name'), phone_number=_text(row, 'phone'),
+                          children_count=clamp_children_count(row.get('children_count') or 1),
+                          bio=_text(row, 'bio'))
+    except (TypeError, ValueError) as e:
+        raise RowError(f"invalid number: {e}")
+
+    if not _text(row, 'name') or not _text(row, 'phone'):
+        raise RowError("name and phone are mandatory")
+    return user
+
+
+def _insert_users(batch: list[tuple[int, dict]], kind: str, defer_geocode: bool, seen: set) -> tuple[int, list]:
+    emails = [_text(row, 'email') for _, row in batch]
+    existing = set(db.session.scalars(db.select(User.email).where(User.email.in_(emails))).all())
+
+    users, errors = [], []
+    for line_no, row in batch:
+        email = _text(row, 'email')
+        if email in existing or email in seen:
+            errors.append((line_no, f"email {email} already exists"))
+            continue
+        try:
+            users.append(build_user(row, kind, defer_geocode))
+            seen.add(email)
+        except (RowError, ValueError) as e:
+            errors.append((line_no, str(e)))
+
+    db.session.add_all(users)
+    db.session.commit()
+    return len(users), errors
+
+
+def _parse_datetime(value: str) -> datetime:
+    value = value.strip()
+    try:
+        return datetime.strptime(value, DATETIME_FORMAT)
+    except ValueError:
+        return datetime.fromisoformat(value)
+
+
+def _overlaps(slots: list[tuple[datetime, datetime]], start: datetime, end: datetime) -> bool:
+    return any(slot_start < end and slot_end > start for slot_start, slot_end in slots)
+
+
+def _insert_bookings(batch: list[tuple[int, dict]]) -> tuple[int, list]:
+    """Insert a batch of bookings, rejecting rows whose Pending or Confirmed slot overlaps one
+    already in the database or earlier in the file, as the booking form would."""
+    emails = {_text(row, key) for _, row in batch for key in ('parent_email', 'sitter_email')}
+    ids = dict(db.session.execute(db.select(User.email, User.id).where(User.email.in_(emails))).all())
+    # Keep concurrent booking requests out until the batch commits; sorted to lock in a fixed order.
+    sitter_ids = {ids.get(_text(row, 'sitter_email')) for _, row in batch} - {None}
+    for sitter_id in sorted(sitter_ids):
+        lock_sitter(sitter_id)
+
+    bookings, errors, taken = [], [], {}
+    for line_no, row in batch:
+        parent_id, sitter_id = ids.get(_text(row, 'parent_email')), ids.get(_text(row, 'sitter_email'))
+        if parent_id is None or sitter_id is None:
+            errors.append((line_no, "unknown parent or sitter email"))
+            continue
+        try:
+            start_dt, end_dt = _parse_datetime(_text(row, 'start_time')), _parse_datetime(_text(row, 'end_time'))
+        except ValueError:
+            errors.append((line_no, "Invalid date format."))
+            continue
+        if start_dt >= end_dt:
+            errors.append((line_no, "End time must be after start time."))
+            continue
+        status = _text(row, 'status') or 'Pending'
+        if status not in COUNTED_STATUSES:
+            errors.append((line_no, f"unknown status {status}"))
+            continue
+        if status in ACTIVE_STATUSES:
+            slots = taken.setdefault(sitter_id, [])
+            if _overlaps(slots, start_dt, end_dt) or not is_sitter_free(sitter_id, start_dt, end_dt):
+                errors.append((line_no, "The sitter is already booked for that time."))
+                continue
+            slots.append((start_dt, end_dt))
+        bookings.append(Booking(parent_id=parent_id, sitter_id=sitter_id, start_time=start_dt,
+                                end_time=end_dt, status=status))
+
+    db.session.add_all(bookings)
+    db.session.commit()
+    return len(bookings), errors
+
+
+@data_cli.command('import')
+@click.argument('kind', type=click.Choice(['sitters', 'parents', 'bookings']))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), help="Defaults to the file extension.")
+@click.option('--batch-size', default=1000, show_default=True, help="Rows per transaction.")
+@click.option('--defer-geocode', is_flag=True,
+              help="Save users without coordinates as pending instead of geocoding during the import.")
+def import_command(kind: str, path: str, fmt: str | None, batch_size: int, defer_geocode: bool) -> None:
+    """Stream users or bookings from a CSV/JSONL file into the database in batched transactions."""
+    fmt = _detect_format(path, fmt)
+    imported, failed, seen, unreadable = 0, 0, set(), []
+
+    db.session.info['skip_rollups'] = True
+    try:
+        with open(path, encoding='utf-8', newline='') as stream:
+            for batch in _batched(read_rows(stream, fmt, unreadable), batch_size):
+                if kind == 'bookings':
+                    count, errors = _insert_bookings(batch)
+                else:
+                    count, errors = _insert_users(batch, kind, defer_geocode, seen)
+                errors += unreadable
+                unreadable.clear()
+                imported, failed = imported + count, failed + len(errors)
+                _report(sorted(errors))
+        failed += len(unreadable)
+        _report(unreadable)
+    finally:
+        db.session.info.pop('skip_rollups', None)
+        # Also after a failed batch: the batches committed before it must be counted.
+        if imported:
+            db.session.rollback()
+            _rebuild_stats(kind)
+
+    click.echo(f"Imported {imported} {kind}, skipped {failed} invalid rows.")
+
+
+def _rebuild_stats(kind: str) -> None:
+    """Recompute the aggregates the import skipped maintaining row by row."""
+    if kind == 'sitters':
+        search_stats.rebuild_rollups()
+    elif kind == 'bookings':
+        rebuild_booking_counters()
+    db.session.commit()
+
+
+def _batched(rows, size: int):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _report(errors: list) -> None:
+    for line_no, message in errors:
+        click.echo(f"line {line_no}: {message}", err=True)
+
+
+def _export_rows(kind: str, batch_size: int):
+    if kind == 'bookings':
+        parent, sitter = db.aliased(User), db.aliased(User)
+        query = (db.select(parent.email, sitter.email, Booking.start_time, Booking.end_time, Booking.status)
+                 .join(parent, Booking.parent_id == parent.id)
+                 .join(sitter, Booking.sitter_id == sitter.id)
+                 .order_by(Booking.id))
+    else:
+        profile = SitterProfile if kind == 'sitters' else ParentProfile
+        extra = ([SitterProfile.hourly_rate, SitterProfile.experience_years, SitterProfile.rating,
+                  SitterProfile.reviews_count, SitterProfile.rating_sum]
+                 if kind == 'sitters' else [ParentProfile.children_count])
+        query = (db.select(User.email, User.password_hash, profile.name, profile.phone_number, User.city,
+                           User.neighborhood, User.street, User.street_number, User.block, User.entrance,
+                           User.address, User.lat, User.lng, profile.bio, *extra)
+                 .join(profile, profile.user_id == User.id)
+                 .order_by(User.id))
+
+    result = db.session.execute(query.execution_options(yield_per=batch_size))
+    for row in result:
+        yield [value.strftime(DATETIME_FORMAT) if isinstance(value, datetime) else value for value in row]
+
+
+@data_cli.command('export')
+@click.argument('kind', type=click.Choice(['sitters', 'parents', 'bookings']))
+@click.argument('path', type=click.Path(dir_okay=False, writable=True))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), help="Defaults to the file extension.")
+@click.option('--batch-size', default=1000, show_default=True, help="Rows fetched from the database at a time.")
+def export_command(kind: str, path: str, fmt: str | None, batch_size: int) -> None:
+    """Stream users or bookings to a CSV/JSONL file that the import command can read back."""
+    fmt = _detect_format(path, fmt)
+    columns = EXPORT_COLUMNS[kind]
+    exported = 0
+
+    with open(path, 'w', encoding='utf-8', newline='') as stream:
+        writer = csv.writer(stream) if fmt == 'csv' else None
+        if writer:
+            writer.writerow(columns)
+        for row in _export_rows(kind, batch_size):
+            if writer:
+                writer.writerow(['' if value is None else value for value in row])
+            else:
+                stream.write(json.dumps(dict(zip(columns, row)), ensure_ascii=False) + '\n')
+            exported += 1
+
+    click.echo(f"Exported {exported} {kind}.")
+
+
+@data_cli.command('geocode-pending')
+@click.option('--limit', default=None, type=int, help="Stop after this many users.")
+def geocode_pending_command(limit: int | None) -> None:
+    """Resolve coordinates for users saved with a pending geocode (e.g. after --defer-geocode)."""
+    query = db.select(User).filter_by(geocode_status='pending').order_by(User.id)
+    if limit:
+        query = query.limit(limit)
+
+    resolved = failed = 0
+    for user in db.session.scalars(query).all():
+        user.lat, user.lng = get_coords_from_address(user.address)
+        user.geocode_status = 'resolved' if user.lat is not None else 'failed'
+        if user.lat is None:
+            failed += 1
+        else:
+            resolved += 1
+        db.session.commit()
+
+    click.echo(f"Resolved {resolved} users, {failed} failed.")
+
+
+@data_cli.command('sweep-bookings')
+@click.option('--batch-size', default=500, show_default=True, help="Bookings updated per transaction.")
+def sweep_bookings_command(batch_size: int) -> None:
+    """Expire unanswered requests and mark ended bookings as awaiting a rating, like the background scheduler."""
+    moved = sweep_bookings(batch_size=batch_size)
+    click.echo(f"Expired {moved['Expired']} pending requests, {moved['AwaitingRating']} bookings await a rating.")
+
+
+@click.command('rebuild-search-stats')
+@with_appcontext
+def rebuild_search_stats_command() -> None:
+    """Recompute the per-city price rollups from the sitter table."""
+    counted = search_stats.rebuild_rollups()
+    db.session.commit()
+    click.echo(f"Rebuilt price rollups from {counted} sitters.")
+
+
+@click.command('recompute-ratings')
+@with_appcontext
+def recompute_ratings_command() -> None:
+    """Backfill rating sums and recompute every sitter's rating from the Review table."""
+    backfilled = backfill_rating_sums()
+    recomputed = recompute_ratings()
+    bump_version(db.session.connection())
+    db.session.commit()
+    click.echo(f"Backfilled {backfilled} sitters, recomputed {recomputed} from reviews.")
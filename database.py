@@ -0,0 +1,135 @@
+from flask import current_app
+from flask.globals import app_ctx
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session, scoped_session
+
+from geocoding import transliterate
+from models import db
+
+REPLICA_BIND = 'replica'
+
+
+def database_url(url: str) -> str:
+    """Accept the postgres:// scheme that hosting providers hand out, which SQLAlchemy no longer does."""
+    if url.startswith('postgres://'):
+        return 'postgresql://' + url[len('postgres://'):]
+    return url
+
+
+def is_sqlite(url: str) -> bool:
+    return make_url(url).get_backend_name() == 'sqlite'
+
+
+def is_memory(url: str) -> bool:
+    url = make_url(url)
+    return url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+
+
+def engine_options(url: str, pool_size: int = 5, max_overflow: int = 10, pool_timeout: float = 30,
+                   pool_recycle: int = 1800, busy_timeout: float = 5.0, read_only: bool = False) -> dict:
+    """Return the create_engine options for a database URL.
+
+    SQLite file databases wait up to `busy_timeout` seconds for a lock instead of failing
+    with "database is locked"; server databases get a pre-pinged, recycled connection pool.
+    With read_only set, every connection refuses writes (used for the listing session).
+    """
+    url = make_url(url)
+    if url.get_backend_name() == 'sqlite':
+        if is_memory(str(url)):
+            return {}
+        return {
+            'connect_args': {'timeout': busy_timeout, 'check_same_thread': False},
+            'pool_size': pool_size,
+            'max_overflow': max_overflow,
+            'pool_timeout': pool_timeout,
+        }
+
+    options = {
+        'pool_size': pool_size,
+        'max_overflow': max_overflow,
+        'pool_timeout': pool_timeout,
+        'pool_recycle': pool_recycle,
+        'pool_pre_ping': True,
+    }
+    if read_only and url.get_backend_name() == 'postgresql':
+        options['connect_args'] = {'options': '-c default_transaction_read_only=on'}
+    return options
+
+
+def configure(app) -> None:
+    """Fill in SQLALCHEMY_ENGINE_OPTIONS and the read-only bind from the DB_* settings."""
+    url = database_url(app.config['SQLALCHEMY_DATABASE_URI'])
+    replica_url = database_url(app.config.get('DATABASE_REPLICA_URL') or url)
+    pool = {
+        'pool_size': app.config['DB_POOL_SIZE'],
+        'max_overflow': app.config['DB_MAX_OVERFLOW'],
+        'pool_timeout': app.config['DB_POOL_TIMEOUT'],
+        'pool_recycle': app.config['DB_POOL_RECYCLE'],
+        'busy_timeout': app.config['SQLITE_BUSY_TIMEOUT'],
+    }
+    if is_memory(url) and not app.config.get('DATABASE_REPLICA_URL'):
+        # A second connection to an in-memory database would open a different, empty database.
+        app.config['READ_SESSION_ENABLED'] = False
+    app.config['SQLALCHEMY_DATABASE_URI'] = url
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(url, **pool)
+    app.config.setdefault('SQLALCHEMY_BINDS', {})[REPLICA_BIND] = {
+        'url': replica_url, **engine_options(replica_url, read_only=True, **pool)
+    }
+
+
+def _sqlite_pragmas(app, read_only: bool):
+    busy_timeout_ms = int(app.config['SQLITE_BUSY_TIMEOUT'] * 1000)
+    pragmas = [
+        f"PRAGMA journal_mode={app.config['SQLITE_JOURNAL_MODE']}",
+        f"PRAGMA synchronous={app.config['SQLITE_SYNCHRONOUS']}",
+        f"PRAGMA cache_size=-{int(app.config['SQLITE_CACHE_SIZE_KB'])}",
+        f"PRAGMA busy_timeout={busy_timeout_ms}",
+        "PRAGMA temp_store=MEMORY",
+    ]
+    if read_only:
+        pragmas.append("PRAGMA query_only=ON")
+
+    def on_connect(dbapi_connection, connection_record) -> None:
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+        # Used by the full-text search triggers (search_index.py).
+        dbapi_connection.create_function('translit', 1, transliterate, deterministic=True)
+
+    return on_connect
+
+
+def _new_read_session() -> Session:
+    return Session(bind=db.engines[REPLICA_BIND])
+
+
+# Session for listing routes: bound to the current app's replica (or a read-only connection
+# to its primary), scoped to the application context like db.session.
+read_session = scoped_session(_new_read_session, scopefunc=lambda: id(app_ctx._get_current_object()))
+
+
+def _remove_read_session(exc) -> None:
+    read_session.remove()
+
+
+def init_database(app) -> None:
+    """Apply the SQLite pragmas on every new connection and set up the read-only session."""
+    with app.app_context():
+        primary, replica = db.engine, db.engines[REPLICA_BIND]
+    if is_sqlite(str(primary.url)):
+        event.listen(primary, 'connect', _sqlite_pragmas(app, read_only=False))
+    if is_sqlite(str(replica.url)):
+        event.listen(replica, 'connect', _sqlite_pragmas(app, read_only=True))
+
+    app.teardown_appcontext(_remove_read_session)
+
+
+def listing_session():
+    """Return the session listing routes read from: the read-only one unless it is disabled."""
+    if current_app.config.get('READ_SESSION_ENABLED', True):
+        return read_session
+    return db.session
@@ -0,0 +1,124 @@
+import math
+
+EARTH_RADIUS_KM = 6371.0
+MISSING_DISTANCE = 999.0
+KM_PER_DEGREE_LAT = 111.32
+
+# Size of one spatial grid cell in degrees (~5.5 km north-south, ~4 km east-west in Bulgaria).
+GRID_CELL_DEG = 0.05
+
+_numpy_module = None
+_numpy_loaded = False
+
+
+def _numpy():
+    """Import numpy on first use, so it does not slow down startup; None when it is not installed.
+
+    numpy is optional, the pure-Python path gives identical results.
+    """
+    global _numpy_module, _numpy_loaded
+    if not _numpy_loaded:
+        try:
+            import numpy
+        except ImportError:
+            numpy = None
+        _numpy_module, _numpy_loaded = numpy, True
+    return _numpy_module
+
+
+def __getattr__(name: str):
+    if name == 'np':
+        return _numpy()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def grid_index(value: float | None) -> int | None:
+    """Map a latitude or longitude to the index of the grid cell that contains it."""
+    if value is None:
+        return None
+    return math.floor(value / GRID_CELL_DEG)
+
+
+def bounding_cells(lat: float, lng: float, radius_km: float) -> tuple[int, int, int, int]:
+    """Return the (min_lat, max_lat, min_lng, max_lng) grid cell indexes covering a circle of radius_km."""
+    dlat = radius_km / KM_PER_DEGREE_LAT
+    cos_lat = max(math.cos(math.radians(lat)), 0.01)
+    dlng = min(radius_km / (KM_PER_DEGREE_LAT * cos_lat), 180.0)
+
+    return (
+        grid_index(lat - dlat),
+        grid_index(lat + dlat),
+        grid_index(lng - dlng),
+        grid_index(lng + dlng),
+    )
+
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Calculate the unrounded Haversine distance in kilometers between two coordinates."""
+    dlat = math.radians(lat2 - lat1)
+    dlng = math.radians(lng2 - lng1)
+
+    a = (
+        math.sin(dlat / 2) ** 2
+        + math.cos(math.radians(lat1))
+        * math.cos(math.radians(lat2))
+        * math.sin(dlng / 2) ** 2
+    )
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+    return EARTH_RADIUS_KM * c
+
+
+def batch_distances(lat: float, lng: float, lats, lngs, use_numpy: bool = True) -> list[float]:
+    """Calculate the rounded distances from one point to many in a single pass.
+
+    Missing coordinates on either side yield MISSING_DISTANCE. Uses numpy when it is
+    installed and falls back to a pure-Python loop with the same results otherwise.
+    """
+    if lat is None or lng is None:
+        return [MISSING_DISTANCE] * len(lats)
+
+    np = _numpy() if use_numpy else None
+    if np is None:
+        return [
+            MISSING_DISTANCE if la is None or ln is None else round(haversine_km(lat, lng, la, ln), 2)
+            for la, ln in zip(lats, lngs)
+        ]
+
+    lats = np.asarray(lats, dtype=float)
+    lngs = np.asarray(lngs, dtype=float)
+    lat1 = math.radians(lat)
+
+    dlat = np.radians(lats - lat)
+    dlng = np.radians(lngs - lng)
+    a = np.sin(dlat / 2) ** 2 + math.cos(lat1) * np.cos(np.radians(lats)) * np.sin(dlng / 2) ** 2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+    distances = np.round(EARTH_RADIUS_KM * c, 2)
+    distances[np.isnan(distances)] = MISSING_DISTANCE
+    return distances.tolist()
+
+
+def nearest_indices(distances: list[float], k: int | None = None, use_numpy: bool = True) -> list[int]:
+    """Return the indexes of the k smallest distances, nearest first.
+
+    Ties keep their original order, so the result always equals a full stable sort cut to k.
+    """
+    n = len(distances)
+    if k is None or k > n:
+        k = n
+    if k <= 0:
+        return []
+
+    np = _numpy() if use_numpy else None
+    if np is None:
+        return sorted(range(n), key=distances.__getitem__)[:k]
+
+    values = np.asarray(distances, dtype=float)
+    if k == n:
+        return np.argsort(values, kind='stable').tolist()
+
+    threshold = values[np.argpartition(values, k - 1)[k - 1]]
+    candidates = np.flatnonzero(values <= threshold)
+    order = np.argsort(values[candidates], kind='stable')[:k]
+    return candidates[order].tolist()
@@ -0,0 +1,104 @@
+import logging
+import queue
+import threading
+import time
+
+from models import db, User
+
+logger = logging.getLogger(__name__)
+
+
+class GeocodeWorkerPool:
+    """Background threads that resolve coordinates for users saved with a pending geocode.
+
+    Lookups go through the app's geocoding service (cache, rate limit, pluggable
+    geocoder). Errors are retried with exponential backoff; an address the geocoder does
+    not know is marked as failed straight away. A user is queued at most once at a time.
+    """
+
+    def __init__(self, app, workers: int = 2, max_retries: int = 3, backoff: float = 2.0) -> None:
+        self.app = app
+        self.workers = workers
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._queue = queue.Queue()
+        self._threads = []
+        self._queued: set[int] = set()
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        """Start the worker threads and queue users left pending by a previous run."""
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f"geocode-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+        with self.app.app_context():
+            pending = db.session.scalars(
+                db.select(User.id).filter_by(geocode_status='pending')
+            ).all()
+        for user_id in pending:
+            self._enqueue(user_id)
+
+    def _enqueue(self, user_id: int) -> None:
+        with self._lock:
+            if user_id in self._queued:
+                return
+            self._queued.add(user_id)
+        self._queue.put(user_id)
+
+    def submit(self, user_id: int) -> None:
+        """Queue a user for geocoding, starting the workers on first use."""
+        if not self._threads:
+            self.start()
+        self._enqueue(user_id)
+
+    def join(self) -> None:
+        """Block until every queued user has been processed."""
+        self._queue.join()
+
+    def _run(self) -> None:
+        while True:
+            user_id = self._queue.get()
+            # Taken off before processing, so an address changed meanwhile is queued again.
+            with self._lock:
+                self._queued.discard(user_id)
+            try:
+                self.process(user_id)
+            except Exception:
+                logger.exception("Geocoding user %s failed", user_id)
+            finally:
+                self._queue.task_done()
+
+    def _resolve_with_retry(self, address: str) -> tuple[float | None, float | None]:
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self.app.extensions['geocoding'].resolve(address)
+            except Exception as e:
+                if attempt == self.max_retries:
+                    logger.warning("Geocoding %r failed after %d attempts: %s", address, attempt + 1, e)
+                    return None, None
+                time.sleep(self.backoff * 2 ** attempt)
+        return None, None
+
+    def process(self, user_id: int) -> None:
+        """Resolve and store the coordinates of a single pending user."""
+        with self.app.app_context():
+            user = db.session.get(User, user_id)
+            if user is None or user.geocode_status != 'pending':
+                return
+            address = user.address
+            # Release the read transaction before the (possibly slow) lookup.
+            db.session.remove()
+
+            lat, lng = self._resolve_with_retry(address)
+
+            user = db.session.get(User, user_id)
+            if user is None or user.geocode_status != 'pending':
+                return
+            user.lat, user.lng = lat, lng
+            user.geocode_status = 'resolved' if lat is not None else 'failed'
+            db.session.commit()
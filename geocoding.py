@@ -0,0 +1,281 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Protocol
+
+from flask import current_app, has_app_context
+
+CYRILLIC_TO_LATIN = {
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ж': 'zh', 'з': 'z',
+    'и': 'i', 'й': 'y', 'к': 'k', 'л': 'l', 'м': 'm', 'н': 'n', 'о': 'o', 'п': 'p',
+    'р': 'r', 'с': 's', 'т': 't', 'у': 'u', 'ф': 'f', 'х': 'h', 'ц': 'ts', 'ч': 'ch',
+    'ш': 'sh', 'щ': 'sht', 'ъ': 'a', 'ь': 'y', 'ю': 'yu', 'я': 'ya',
+}
+
+# Common spellings of the same address words, mapped to one canonical token.
+TOKEN_ALIASES = {
+    'blok': 'bl', 'block': 'bl', 'bl': 'bl',
+    'ulitsa': 'ul', 'ul': 'ul', 'street': 'ul', 'str': 'ul',
+    'kvartal': 'kv', 'kv': 'kv', 'zhk': 'kv',
+    'vhod': 'vh', 'vh': 'vh', 'entrance': 'vh',
+}
+DROPPED_TOKENS = {'bulgaria', 'balgaria'}
+
+# City centers used in offline mode when an address is not in the cache.
+GAZETTEER = {
+    ('София', 'Sofia'): (42.6977, 23.3219),
+    ('Пловдив', 'Plovdiv'): (42.1354, 24.7453),
+    ('Варна', 'Varna'): (43.2141, 27.9147),
+    ('Бургас', 'Burgas'): (42.5048, 27.4626),
+    ('Русе', 'Ruse'): (43.8356, 25.9657),
+    ('Стара Загора', 'Stara Zagora'): (42.4258, 25.6345),
+    ('Плевен', 'Pleven'): (43.4170, 24.6067),
+    ('Сливен', 'Sliven'): (42.6817, 26.3229),
+    ('Добрич', 'Dobrich'): (43.5726, 27.8273),
+    ('Шумен', 'Shumen'): (43.2712, 26.9361),
+    ('Перник', 'Pernik'): (42.6052, 23.0378),
+    ('Хасково', 'Haskovo'): (41.9344, 25.5554),
+    ('Ямбол', 'Yambol'): (42.4842, 26.5035),
+    ('Пазарджик', 'Pazardzhik'): (42.1928, 24.3336),
+    ('Благоевград', 'Blagoevgrad'): (42.0209, 23.0943),
+    ('Велико Търново', 'Veliko Tarnovo'): (43.0757, 25.6172),
+    ('Враца', 'Vratsa'): (43.2102, 23.5529),
+    ('Габрово', 'Gabrovo'): (42.8742, 25.3187),
+}
+
+_MISS = object()
+
+
+def transliterate(text: str | None) -> str:
+    """Lowercase a text and spell Bulgarian Cyrillic in Latin letters ("Лозенец" -> "lozenets")."""
+    return ''.join(CYRILLIC_TO_LATIN.get(ch, ch) for ch in (text or '').casefold())
+
+
+def normalize_address(address: str) -> str:
+    """Normalize an address into a cache key that ignores case, spacing, script and common abbreviations."""
+    text = address.casefold()
+    text = re.sub(r'(?<!\w)ж\.?\s*к\.?(?!\w)', ' kv ', text)
+    text = transliterate(text)
+    text = re.sub(r'iya\b', 'ia', text)
+
+    parts = []
+    for part in text.split(','):
+        tokens = [TOKEN_ALIASES.get(t, t) for t in re.findall(r'\w+', part)]
+        tokens = [t for t in tokens if t not in DROPPED_TOKENS]
+        if tokens:
+            parts.append(' '.join(tokens))
+    return ', '.join(parts)
+
+
+def fallback_queries(address: str) -> list[str]:
+    """Return the queries to try for an address, from most to least specific."""
+    queries = [address]
+    parts = address.split(",")
+    if len(parts) > 1:
+        queries.append(f"{parts[0].strip()}, {parts[-1].strip()}")
+    return queries
+
+
+class Geocoder(Protocol):
+    """Anything that turns a query into (lat, lng), or None when the address is unknown."""
+
+    def geocode(self, query: str) -> tuple[float, float] | None: ...
+
+
+class RateLimitedGeocoder:
+    """Wrap a geocoder so that calls are spaced at least min_interval seconds apart."""
+
+    def __init__(self, geocoder: Geocoder, min_interval: float = 1.0) -> None:
+        self.geocoder = geocoder
+        self.min_interval = min_interval
+        self._next_call = 0.0
+        self._lock = threading.Lock()
+
+    def geocode(self, query: str) -> tuple[float, float] | None:
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next_call - now
+            self._next_call = max(now, self._next_call) + self.min_interval
+        if wait > 0:
+            time.sleep(wait)
+        return self.geocoder.geocode(query)
+
+
+class NominatimGeocoder:
+    """Geocoder backed by the public Nominatim service, restricted to Bulgaria."""
+
+    def __init__(self, user_agent: str = "babysitter_fmi_project", timeout: int = 10) -> None:
+        self.user_agent = user_agent
+        self.timeout = timeout
+        self._client = None
+
+    def geocode(self, query: str) -> tuple[float, float] | None:
+        if self._client is None:
+            from geopy.geocoders import Nominatim
+            self._client = Nominatim(user_agent=self.user_agent)
+
+        location = self._client.geocode(f"{query}, Bulgaria", timeout=self.timeout)
+        if location:
+            return location.latitude, location.longitude
+        return None
+
+
+class GeocodeCache:
+    """Persistent SQLite cache of geocoding results keyed on normalized addresses.
+
+    Failed lookups are cached as well (negative caching) with their own, shorter TTL.
+    """
+
+    def __init__(self, path: str, ttl: float = 30 * 24 * 3600, negative_ttl: float = 24 * 3600) -> None:
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if self.path != ':memory:':
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS geocode_cache ("
+                "key TEXT PRIMARY KEY, lat REAL, lng REAL, created_at REAL NOT NULL)"
+            )
+        return self._conn
+
+    def get(self, key: str, allow_stale: bool = False):
+        """Return cached (lat, lng), (None, None) for a cached failure, or _MISS."""
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT lat, lng, created_at FROM geocode_cache WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is not None:
+                lat, lng, created_at = row
+                ttl = self.ttl if lat is not None else self.negative_ttl
+                if allow_stale or time.time() - created_at <= ttl:
+                    if lat is None:
+                        self.negative_hits += 1
+                    else:
+                        self.hits += 1
+                    return lat, lng
+
+            self.misses += 1
+            return _MISS
+
+    def set(self, key: str, lat: float | None, lng: float | None) -> None:
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO geocode_cache (key, lat, lng, created_at) VALUES (?, ?, ?, ?)",
+                (key, lat, lng, time.time()),
+            )
+            conn.commit()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.negative_hits + self.misses
+        return {
+            'hits': self.hits,
+            'negative_hits': self.negative_hits,
+            'misses': self.misses,
+            'hit_ratio': (self.hits + self.negative_hits) / lookups if lookups else 0.0,
+        }
+
+
+class GeocodingService:
+    """Resolve addresses through the cache first and the geocoder only on a miss.
+
+    In offline mode the geocoder is never called; unknown addresses fall back to the
+    city center from the local gazetteer.
+    """
+
+    def __init__(self, geocoder: Geocoder | None = None, cache: GeocodeCache | None = None,
+                 offline: bool = False) -> None:
+        self.geocoder = geocoder or NominatimGeocoder()
+        self.cache = cache
+        self.offline = offline
+        self.geocoder_calls = 0
+        self._gazetteer = {
+            normalize_address(name): coords for names, coords in GAZETTEER.items() for name in names
+        }
+
+    def _cached(self, key: str):
+        if self.cache is None:
+            return _MISS
+        return self.cache.get(key, allow_stale=self.offline)
+
+    def _store(self, key: str, coords: tuple[float | None, float | None]) -> None:
+        if self.cache is not None:
+            self.cache.set(key, *coords)
+
+    def resolve(self, address: str) -> tuple[float | None, float | None]:
+        if not address:
+            return None, None
+
+        key = normalize_address(address)
+        coords = self._cached(key)
+        if coords is not _MISS:
+            return coords
+
+        if self.offline:
+            return self.from_gazetteer(address)
+
+        for query in fallback_queries(address):
+            query_key = normalize_address(query)
+            coords = _MISS if query_key == key else self._cached(query_key)
+            if coords is _MISS:
+                self.geocoder_calls += 1
+                coords = self.geocoder.geocode(query) or (None, None)
+                self._store(query_key, coords)
+            if coords[0] is not None:
+                if query_key != key:
+                    self._store(key, coords)
+                return coords
+
+        return None, None
+
+    def from_gazetteer(self, address: str) -> tuple[float | None, float | None]:
+        """Look up the city (last address part) in the local gazetteer."""
+        city = normalize_address(address.split(",")[-1])
+        return self._gazetteer.get(city, (None, None))
+
+
+# Used outside an application context, e.g. from a plain script.
+_default_service = GeocodingService()
+
+
+def build_service(cache_path: str | None = None, ttl: float = 30 * 24 * 3600,
+                  negative_ttl: float = 24 * 3600, offline: bool = False,
+                  geocoder: Geocoder | None = None, min_interval: float = 0.0) -> GeocodingService:
+    """Create a geocoding service with an optional persistent cache and rate limit."""
+    cache = GeocodeCache(cache_path, ttl, negative_ttl) if cache_path else None
+    geocoder = geocoder or NominatimGeocoder()
+    if min_interval > 0:
+        geocoder = RateLimitedGeocoder(geocoder, min_interval)
+    return GeocodingService(geocoder=geocoder, cache=cache, offline=offline)
+
+
+def init_geocoding(app) -> GeocodingService:
+    """Create the app's geocoding service from the GEOCODE_* settings."""
+    service = build_service(
+        cache_path=app.config['GEOCODE_CACHE_PATH'],
+        ttl=app.config['GEOCODE_CACHE_TTL'],
+        negative_ttl=app.config['GEOCODE_NEGATIVE_TTL'],
+        offline=app.config['GEOCODE_OFFLINE'],
+        min_interval=app.config['GEOCODE_MIN_INTERVAL'],
+    )
+    app.extensions['geocoding'] = service
+    return service
+
+
+def get_service() -> GeocodingService:
+    """Return the current app's geocoding service, used by logic.get_coords_from_address."""
+    if has_app_context() and 'geocoding' in current_app.extensions:
+        return current_app.extensions['geocoding']
+    return _default_service
@@ -0,0 +1,285 @@
+import cProfile
+import hmac
+import os
+import random
+import threading
+import time
+from functools import wraps
+
+from flask import before_render_template, current_app, g, has_app_context, request, template_rendered
+from sqlalchemy import event
+
+from models import db
+
+# Upper bounds (in seconds) of the latency histogram buckets.
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised in strict mode when a view issues more SQL statements than its budget."""
+
+
+class Metrics:
+    """Thread-safe registry of counters and latency histograms, rendered in the Prometheus text format."""
+
+    def __init__(self, buckets: tuple = DEFAULT_BUCKETS) -> None:
+        self.buckets = buckets
+        self._counters = {}
+        self._histograms = {}
+        self._help = {}
+        self._lock = threading.Lock()
+
+    def describe(self, name: str, help_text: str) -> None:
+        self._help[name] = help_text
+
+    def inc(self, name: str, amount: float = 1, **labels) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            counts, total, observations = self._histograms.get(key, ([0] * len(self.buckets), 0.0, 0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._histograms[key] = (counts, total + value, observations + 1)
+
+    def value(self, name: str, **labels) -> float:
+        """Return a counter, or the number of observations of a histogram, for the given labels."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            if key in self._histograms:
+                return self._histograms[key][2]
+            return self._counters.get(key, 0)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def render(self) -> str:
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: (list(counts), total, n) for key, (counts, total, n) in self._histograms.items()}
+
+        lines, declared = [], set()
+
+        def declare(name: str, kind: str) -> None:
+            if name not in declared:
+                declared.add(name)
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in sorted(counters.items()):
+            declare(name, 'counter')
+            lines.append(f"{name}{_format_labels(labels)} {_format_number(value)}")
+
+        for (name, labels), (counts, total, observations) in sorted(histograms.items()):
+            declare(name, 'histogram')
+            for bound, count in zip(self.buckets, counts):
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', str(bound)),))} {count}")
+            lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {observations}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_number(total)}")
+            lines.append(f"{name}_count{_format_labels(labels)} {observations}")
+        return '\n'.join(lines) + '\n'
+
+
+def _escape_label(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels: tuple) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape_label(value)}"' for key, value in labels) + '}'
+
+
+def _format_number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(round(value, 6))
+
+
+metrics = Metrics()
+metrics.describe('http_requests_total', "Requests handled, by endpoint, method and status.")
+metrics.describe('http_request_duration_seconds', "Wall-clock time spent handling a request.")
+metrics.describe('db_queries_total', "SQL statements executed, by endpoint.")
+metrics.describe('db_query_duration_seconds', "Time spent executing single SQL statements.")
+metrics.describe('request_db_seconds', "Total time spent in SQL per request.")
+metrics.describe('template_render_seconds', "Time spent rendering templates, by template.")
+metrics.describe('function_duration_seconds', "Time spent in instrumented hot-path functions.")
+metrics.describe('profiles_written_total', "Sampled cProfile dumps written for slow requests.")
+
+
+def metrics_enabled() -> bool:
+    """Whether the current app collects timings (METRICS_ENABLED); never outside an app context."""
+    return has_app_context() and current_app.config['METRICS_ENABLED']
+
+
+def diagnostics_allowed() -> bool:
+    """Whether the current request may read the diagnostic endpoints.
+
+    They exist only while METRICS_ENABLED is on, for clients in METRICS_ALLOWED_IPS or
+    sending `Authorization: Bearer <METRICS_TOKEN>`.
+    """
+    config = current_app.config
+    if not config['METRICS_ENABLED']:
+        return False
+    if request.remote_addr in config['METRICS_ALLOWED_IPS']:
+        return True
+    token = config['METRICS_TOKEN']
+    scheme, _, supplied = request.headers.get('Authorization', '').partition(' ')
+    return bool(token) and scheme == 'Bearer' and hmac.compare_digest(supplied.encode(), token.encode())
+
+
+def timed(name: str):
+    """Record the duration of every call in function_duration_seconds while metrics are enabled.
+
+    When metrics are disabled the wrapper only adds a configuration check.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not metrics_enabled():
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                metrics.observe('function_duration_seconds', time.perf_counter() - start, function=name)
+        return wrapper
+    return decorator
+
+
+def query_budget(limit: int):
+    """Declare the maximum number of SQL statements a view may issue per request."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            return view(*args, **kwargs)
+        wrapper.query_budget = limit
+        return wrapper
+    return decorator
+
+
+def _count_query(conn, cursor, statement, parameters, context, executemany) -> None:
+    if has_app_context():
+        g.query_count = g.get('query_count', 0) + 1
+
+
+def _reset_query_count() -> None:
+    g.query_count = 0
+
+
+def _check_query_budget(response):
+    count = g.get('query_count', 0)
+    view = current_app.view_functions.get(request.endpoint)
+    budget = getattr(view, 'query_budget', None) or current_app.config.get('QUERY_BUDGET')
+
+    if current_app.config.get('QUERY_COUNT_HEADER'):
+        response.headers['X-Query-Count'] = str(count)
+
+    if budget is not None and count > budget:
+        message = f"{request.endpoint} issued {count} queries (budget {budget})"
+        if current_app.config.get('QUERY_BUDGET_STRICT', current_app.testing):
+            raise QueryBudgetExceeded(message)
+        current_app.logger.warning(message)
+    return response
+
+
+def init_query_counter(app) -> None:
+    """Count SQL statements per request and enforce per-view query budgets."""
+    with app.app_context():
+        for engine in db.engines.values():
+            event.listen(engine, 'after_cursor_execute', _count_query)
+    app.before_request(_reset_query_count)
+    app.after_request(_check_query_budget)
+
+
+def _start_query_timer(conn, cursor, statement, parameters, context, executemany) -> None:
+    if context is not None and metrics_enabled():
+        context._query_started = time.perf_counter()
+
+
+def _stop_query_timer(conn, cursor, statement, parameters, context, executemany) -> None:
+    started = getattr(context, '_query_started', None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    metrics.observe('db_query_duration_seconds', elapsed)
+    if has_app_context():
+        g.db_seconds = g.get('db_seconds', 0.0) + elapsed
+
+
+def _start_template_timer(sender, template, context, **extra) -> None:
+    if metrics_enabled():
+        g.setdefault('template_starts', []).append(time.perf_counter())
+
+
+def _stop_template_timer(sender, template, context, **extra) -> None:
+    starts = g.get('template_starts') if metrics_enabled() else None
+    if starts:
+        metrics.observe('template_render_seconds', time.perf_counter() - starts.pop(),
+                        template=template.name or 'string')
+
+
+def _start_request_timer() -> None:
+    if not metrics_enabled():
+        return
+    g.request_started = time.perf_counter()
+    g.db_seconds = 0.0
+
+    rate = current_app.config.get('PROFILE_SAMPLE_RATE', 0.0)
+    if rate and random.random() < rate:
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:  # another profiler is already active in this thread
+            return
+        g.profiler = profiler
+
+
+def _stop_request_timer(response):
+    started = g.get('request_started')
+    if started is None or not metrics_enabled():
+        return response
+    elapsed = time.perf_counter() - started
+    endpoint = request.endpoint or 'unknown'
+
+    metrics.inc('http_requests_total', endpoint=endpoint, method=request.method, status=response.status_code)
+    metrics.observe('http_request_duration_seconds', elapsed, endpoint=endpoint)
+    metrics.observe('request_db_seconds', g.get('db_seconds', 0.0), endpoint=endpoint)
+    metrics.inc('db_queries_total', g.get('query_count', 0), endpoint=endpoint)
+
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.disable()
+        if elapsed * 1000 >= current_app.config.get('PROFILE_SLOW_MS', 500):
+            _dump_profile(profiler, endpoint, elapsed)
+    return response
+
+
+def _dump_profile(profiler: cProfile.Profile, endpoint: str, elapsed: float) -> None:
+    directory = current_app.config.get('PROFILE_DIR') or os.path.join(current_app.instance_path, 'profiles')
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{endpoint}-{time.strftime('%Y%m%d-%H%M%S')}-{int(elapsed * 1000)}ms.prof")
+    profiler.dump_stats(path)
+    metrics.inc('profiles_written_total', endpoint=endpoint)
+    current_app.logger.info("Wrote profile of slow request %s (%.0f ms) to %s", request.path, elapsed * 1000, path)
+
+
+def init_metrics(app) -> None:
+    """Time requests, SQL statements and template rendering, and sample profiles of slow requests.
+
+    Collection is controlled by the app's METRICS_ENABLED; while it is off every hook returns
+    after a configuration check.
+    """
+    with app.app_context():
+        for engine in db.engines.values():
+            event.listen(engine, 'before_cursor_execute', _start_query_timer)
+            event.listen(engine, 'after_cursor_execute', _stop_query_timer)
+    before_render_template.connect(_start_template_timer, app)
+    template_rendered.connect(_stop_template_timer, app)
+    app.before_request(_start_request_timer)
+    app.after_request(_stop_request_timer)
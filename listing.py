@@ -0,0 +1,63 @@
+import math
+
+from flask import current_app
+
+from catalog import catalog_page
+from models import db
+from pagination import Page
+from queries import build_sitter_query, nearest_page, sitter_page
+from scoring import Scorer, scored_page
+from search_index import text_criterion, text_search_page
+
+
+def finite_float(text: str) -> float:
+    """Parse a query-string number for request.args.get(type=...); 'inf' and 'nan' count as invalid."""
+    value = float(text)
+    if not math.isfinite(value):
+        raise ValueError(f"not a finite number: {text}")
+    return value
+
+
+def listing_order(sort: str | None, origin: tuple[float, float] | None, terms: list[str] | None = None) -> str:
+    """Pick the order of a sitter listing: an explicit sort, text relevance, distance or rating.
+
+    Keywords rank by relevance unless the visitor sorts by rating or experience; without
+    keywords a viewer with a known address sees the nearest sitters first.
+    """
+    if sort in ('experience', 'rating'):
+        return sort
+    if terms:
+        return 'relevance'
+    if sort == 'best':
+        return 'best'
+    return 'distance' if origin is not None else 'rating'
+
+
+def listing_page(session, order: str, cursor: str | None, per_page: int, city=None, max_price=None,
+                 min_experience=0, available=None, terms=None, origin=None, options=()) -> Page:
+    """Return one page of sitters for the home page and the API, in an order from listing_order.
+
+    Free text is matched in SQL together with the other filters; otherwise the in-memory
+    catalog answers unless an availability window needs the bookings table. `options` are
+    loader options applied to every path, e.g. load_only for compact API responses.
+    """
+    scorer = Scorer.from_config(current_app.config) if order == 'best' else None
+    catalog = current_app.extensions.get('sitter_catalog')
+    if terms:
+        query = build_sitter_query(city, max_price, min_experience, available, session=session).options(*options)
+        if order == 'relevance' and db.engine.dialect.name == 'sqlite':
+            return text_search_page(query, terms, cursor, per_page)
+        query = query.filter(text_criterion(terms, db.engine.dialect.name))
+        return sitter_page(query, 'experience' if order == 'experience' else 'rating', cursor, per_page)
+
+    if catalog is not None and not available:
+        catalog.refresh(session)
+        return catalog_page(catalog, session, order, cursor, per_page, origin, scorer, options,
+                            city=city, max_price=max_price, min_experience=min_experience)
+
+    query = build_sitter_query(city, max_price, min_experience, available, session=session).options(*options)
+    if order == 'best':
+        return scored_page(query.all(), scorer, cursor, per_page, origin, max_price)
+    if order == 'distance':
+        return nearest_page(query, *origin, cursor, per_page)
+    return sitter_page(query, order, cursor, per_page)
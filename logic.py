@@ -1,29 +1,68 @@
 from models import SitterProfile
-import math
-from geopy.geocoders import Nominatim
+from geo import MISSING_DISTANCE, haversine_km, batch_distances, nearest_indices
+import geocoding
+from instrumentation import timed
+import ranking
+
+
+def validate_address_fields(city, neighborhood, street, street_number, block) -> list[str]:
+    """Check the structured address fields and return a list of error messages."""
+    errors = []
+    if not city:
+        errors.append("City is mandatory.")
+
+    if not neighborhood and not street:
+        errors.append("Please provide either a Neighborhood or a Street name.")
+
+    if not street_number and not block:
+        errors.append("Please provide either a Street Number or a Block number.")
+
+    return errors
+
+
+def compose_address(city, neighborhood="", street="", street_number="", block="", entrance="",
+                    block_label="блок") -> str:
+    """Join the structured address fields into the single-line address used for geocoding."""
+    address_parts = []
+    if street:
+        st_line = street.strip()
+        if street_number:
+            st_line += f" {street_number.strip()}"
+        address_parts.append(st_line)
+    if neighborhood:
+        address_parts.append(neighborhood.strip())
+    if block:
+        address_parts.append(f"{block_label} {block.strip()}")
+        if entrance:
+            address_parts.append(entrance.strip())
+    if city:
+        address_parts.append(city.strip())
 
+    return ", ".join(address_parts)
+
+
+def clamp_hourly_rate(value) -> float:
+    """Parse an hourly rate, clamping negative values to 0."""
+    return max(0, float(value))
 
-def get_coords_from_address(address: str):
-    """Convert a textual address into latitude and longitude using geopy's Nominatim geocoder."""
-    if not address:
-        return None, None
-    try:
-        search_query = f"{address}, Bulgaria"
 
-        geolocator = Nominatim(user_agent="babysitter_fmi_project")
-        location = geolocator.geocode(search_query, timeout=10)
+def clamp_experience(value) -> int:
+    """Parse years of experience, clamping negative values to 0."""
+    return max(0, int(value))
 
-        if location:
-            return location.latitude, location.longitude
 
-        parts = address.split(",")
-        if len(parts) > 1:
-            fallback = f"{parts[0]}, {parts[-1]}, Bulgaria"
-            location = geolocator.geocode(fallback, timeout=10)
-            if location:
-                return location.latitude, location.longitude
+def clamp_children_count(value) -> int:
+    """Parse the number of children, with a minimum of 1."""
+    return max(1, int(value))
 
+
+@timed('geocode')
+def get_coords_from_address(address: str):
+    """Convert a textual address into latitude and longitude, using the geocode cache before Nominatim."""
+    if not address:
         return None, None
+    try:
+        return geocoding.get_service().resolve(address)
     except Exception as e:
         print(f"Geocoding error: {e}")
         return None, None
@@ -31,36 +70,30 @@ def get_coords_from_address(address: str):
 
 def calculate_distance(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
     """Calculate the Haversine distance between two geographic coordinates."""
-    if not all([lat1, lng1, lat2, lng2]):
-        return 999.0
-
-    R = 6371.0  # Earth's radius
-    dlat = math.radians(lat2 - lat1)
-    dlng = math.radians(lng2 - lng1)
-
-    a = (
-        math.sin(dlat / 2) ** 2
-        + math.cos(math.radians(lat1))
-        * math.cos(math.radians(lat2))
-        * math.sin(dlng / 2) ** 2
-    )
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+    if any(value is None for value in (lat1, lng1, lat2, lng2)):
+        return MISSING_DISTANCE
 
-    return round(R * c, 2)
+    return round(haversine_km(lat1, lng1, lat2, lng2), 2)
 
 
+@timed('sort_sitters_by_distance')
 def sort_sitters_by_distance(
-    parent_lat: float, parent_lng: float, sitters: list[SitterProfile]
+    parent_lat: float, parent_lng: float, sitters: list[SitterProfile], limit: int | None = None
 ) -> list[SitterProfile]:
-    """Sort sitters based on their distance from a given latitude and longitude."""
-    for sitter in sitters:
-        sitter.distance = calculate_distance(
-            parent_lat, parent_lng, sitter.user.lat, sitter.user.lng
-        )
+    """Sort sitters based on their distance from a given latitude and longitude, optionally keeping the nearest `limit`."""
+    distances = batch_distances(
+        parent_lat,
+        parent_lng,
+        [s.user.lat for s in sitters],
+        [s.user.lng for s in sitters],
+    )
+    for sitter, distance in zip(sitters, distances):
+        sitter.distance = distance
 
-    return sorted(sitters, key=lambda x: getattr(x, "distance", 999))
+    return [sitters[i] for i in nearest_indices(distances, limit)]
 
 
+@timed('calculate_average_price')
 def calculate_average_price(sitters: list[SitterProfile]) -> float:
     """Calculate the average hourly rate of a list of sitters."""
     try:
@@ -75,9 +108,10 @@ def has_affordable_sitter(sitters: list[SitterProfile], max_budget: float) -> bo
     return any(s.hourly_rate <= max_budget for s in sitters)
 
 
-def sort_sitters_by_experience(sitters: list[SitterProfile]) -> list[SitterProfile]:
-    """Sort sitters by their years of experience in descending order."""
-    return sorted(sitters, key=lambda s: s.experience_years, reverse=True)
+@timed('sort_sitters_by_experience')
+def sort_sitters_by_experience(sitters: list[SitterProfile], limit: int | None = None) -> list[SitterProfile]:
+    """Sort sitters by their years of experience in descending order, optionally keeping the top `limit`."""
+    return ranking.top_k_by_experience(sitters, limit)
 
 
 def validate_rating(rating: float) -> bool:
@@ -90,6 +124,7 @@ def validate_rating(rating: float) -> bool:
         return False
 
 
+@timed('search_sitters')
 def search_sitters(
     sitters: list[SitterProfile], city=None, max_price=None, min_experience=0) -> list[SitterProfile]:
     """Filter sitters based on city, maximum price, and minimum experience."""
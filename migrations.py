@@ -0,0 +1,173 @@
+import threading
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import inspect
+from sqlalchemy.exc import IntegrityError
+
+from geo import grid_index
+from models import (db, Booking, BookingCounter, OutboxEvent, SitterProfile, SchemaVersion, CatalogVersion, User,
+                    normalize_city)
+import booking_stats
+import search_index
+import search_stats
+
+db_cli = AppGroup('db', help="Database schema migrations.")
+
+# (version, description, function), applied in ascending order by upgrade().
+MIGRATIONS = []
+
+
+def migration(version: int, description: str):
+    """Register a schema migration; versions must be added in increasing order."""
+    def decorator(func):
+        MIGRATIONS.append((version, description, func))
+        return func
+    return decorator
+
+
+def _add_columns(table: str, definitions: dict[str, str]) -> list[str]:
+    """ALTER TABLE the missing columns in; returns the names that were added."""
+    existing = {column['name'] for column in inspect(db.engine).get_columns(table)}
+    added = [name for name in definitions if name not in existing]
+    for name in added:
+        db.session.execute(db.text(f'ALTER TABLE "{table}" ADD COLUMN {name} {definitions[name]}'))
+    return added
+
+
+@migration(1, "Create the baseline schema")
+def _baseline() -> None:
+    db.create_all()
+    # create_all() only adds missing tables. A database from before the migrations has the
+    # user and sitter_profile tables without the columns migration 2 onwards read.
+    _search_columns()
+
+
+@migration(2, "Fill the price rollups for existing sitters")
+def _price_rollups() -> None:
+    if db.session.query(SitterProfile.id).first():
+        search_stats.rebuild_rollups()
+
+
+@migration(3, "Add the sitter catalog change version")
+def _catalog_version() -> None:
+    CatalogVersion.__table__.create(db.engine, checkfirst=True)
+
+
+@migration(4, "Add the sitter full-text search index")
+def _search_index() -> None:
+    connection = db.session.connection()
+    if search_index.is_available(connection):
+        search_index.create_search_index(None, connection)
+        search_index.rebuild_search_index(connection)
+
+
+@migration(5, "Add booking status indexes and per-user booking counters")
+def _booking_counters() -> None:
+    BookingCounter.__table__.create(db.engine, checkfirst=True)
+    for index in Booking.__table__.indexes:
+        index.create(db.engine, checkfirst=True)
+    booking_stats.rebuild_booking_counters()
+
+
+@migration(6, "Add the booking lifecycle indexes and counters for swept bookings")
+def _booking_lifecycle() -> None:
+    _add_columns(BookingCounter.__tablename__, dict.fromkeys(('awaiting_rating', 'expired'),
+                                                             "INTEGER NOT NULL DEFAULT 0"))
+    db.session.commit()
+    for index in Booking.__table__.indexes:
+        index.create(db.engine, checkfirst=True)
+
+
+@migration(7, "Add the notification outbox")
+def _outbox() -> None:
+    OutboxEvent.__table__.create(db.engine, checkfirst=True)
+
+
+@migration(8, "Add the normalized city, grid cell, geocode status and rating sum columns")
+def _search_columns() -> None:
+    """Bring the user and sitter_profile tables of a pre-migration database up to the models.
+
+    Existing rows get their normalized city and grid cells computed, count as geocoded,
+    and keep their average rating with rating_sum = rating * reviews_count.
+    """
+    _add_columns(User.__tablename__, {'city_normalized': "VARCHAR(50)", 'grid_lat': "INTEGER",
+                                      'grid_lng': "INTEGER", 'geocode_status': "VARCHAR(10) DEFAULT 'resolved'"})
+    if _add_columns(SitterProfile.__tablename__, {'rating_sum': "FLOAT DEFAULT 0.0"}):
+        db.session.execute(db.update(SitterProfile).values(
+            rating_sum=db.func.coalesce(SitterProfile.rating, 0.0) * db.func.coalesce(SitterProfile.reviews_count, 0)))
+
+    # normalize_city() and grid_index() run in Python: SQLite's lower() only folds ASCII.
+    rows = db.session.execute(
+        db.select(User.id, User.city, User.lat, User.lng).where(User.city_normalized.is_(None))).all()
+    if rows:
+        db.session.execute(db.update(User), [
+            {'id': user_id, 'city_normalized': normalize_city(city), 'grid_lat': grid_index(lat),
+             'grid_lng': grid_index(lng)} for user_id, city, lat, lng in rows])
+    db.session.commit()
+    for table in (User.__table__, SitterProfile.__table__):
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
+
+
+@migration(9, "Track the outbox sinks each event was delivered to")
+def _outbox_delivered_to() -> None:
+    _add_columns(OutboxEvent.__tablename__, {'delivered_to': "VARCHAR(100) NOT NULL DEFAULT ''"})
+    db.session.commit()
+
+
+def current_version() -> int:
+    """Return the newest applied migration, or 0 for a database that has never been migrated."""
+    if not inspect(db.engine).has_table(SchemaVersion.__tablename__):
+        return 0
+    return db.session.query(db.func.max(SchemaVersion.version)).scalar() or 0
+
+
+def upgrade(target: int | None = None) -> list[int]:
+    """Apply every pending migration up to `target` (default: the latest); returns the versions applied."""
+    applied = []
+    version = current_version()
+    for number, description, func in MIGRATIONS:
+        if number <= version or (target is not None and number > target):
+            continue
+        func()
+        db.session.add(SchemaVersion(version=number, description=description))
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Another worker applied the same migration concurrently.
+            db.session.rollback()
+            continue
+        applied.append(number)
+    return applied
+
+
+def init_auto_migrate(app) -> None:
+    """Run pending migrations once, before the first request, instead of at import time."""
+    lock = threading.Lock()
+    state = {'done': False}
+
+    def migrate_once() -> None:
+        if state['done']:
+            return
+        with lock:
+            if not state['done']:
+                upgrade()
+                state['done'] = True
+
+    app.before_request(migrate_once)
+
+
+@db_cli.command('upgrade')
+@click.option('--target', type=int, default=None, help="Stop after this migration version.")
+def upgrade_command(target: int | None) -> None:
+    """Apply pending schema migrations."""
+    applied = upgrade(target)
+    click.echo(f"Applied migrations {applied}." if applied else "Database is up to date.")
+    click.echo(f"Current version: {current_version()}")
+
+
+@db_cli.command('current')
+def current_command() -> None:
+    """Show the current schema version."""
+    click.echo(f"Current version: {current_version()}")
@@ -1,10 +1,21 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy.orm import validates
 from datetime import datetime, timezone
 
+from geo import grid_index
+from security import hash_password, verify_password
+
 db = SQLAlchemy()
 
+
+def normalize_city(city: str | None) -> str | None:
+    """Normalize a city name for case-insensitive lookups."""
+    if city is None:
+        return None
+    return city.strip().lower()
+
+
 class User(db.Model, UserMixin):
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(120), unique=True, nullable=False)
@@ -12,6 +23,7 @@ class User(db.Model, UserMixin):
     user_type = db.Column(db.String(20))
     
     city = db.Column(db.String(50), nullable=False)
+    city_normalized = db.Column(db.String(50))
     neighborhood = db.Column(db.String(50), nullable=True)
     street = db.Column(db.String(100), nullable=True)
     street_number = db.Column(db.String(10), nullable=True)
@@ -22,27 +34,58 @@ class User(db.Model, UserMixin):
     
     lat = db.Column(db.Float)
     lng = db.Column(db.Float)
+    grid_lat = db.Column(db.Integer)
+    grid_lng = db.Column(db.Integer)
+    geocode_status = db.Column(db.String(10), default='resolved', index=True)
     
     sitter_profile = db.relationship('SitterProfile', backref='user', uselist=False)
     parent_profile = db.relationship('ParentProfile', backref='user', uselist=False)
 
+    __table_args__ = (
+        db.Index('ix_user_city_type', 'city_normalized', 'user_type'),
+        db.Index('ix_user_grid', 'grid_lat', 'grid_lng'),
+    )
+
+    @validates('city')
+    def _sync_city_normalized(self, key: str, city: str) -> str:
+        self.city_normalized = normalize_city(city)
+        return city
+
+    @validates('lat')
+    def _sync_grid_lat(self, key: str, lat: float) -> float:
+        self.grid_lat = grid_index(lat)
+        return lat
+
+    @validates('lng')
+    def _sync_grid_lng(self, key: str, lng: float) -> float:
+        self.grid_lng = grid_index(lng)
+        return lng
+
     def set_password(self, password: str) -> None:
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
 
     def check_password(self, password: str) -> bool:
-        return check_password_hash(self.password_hash, password)
+        return verify_password(self.password_hash, password)
 
 class SitterProfile(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), index=True)
     name = db.Column(db.String(100), nullable=False)
     phone_number = db.Column(db.String(20), nullable=False)
     hourly_rate = db.Column(db.Float, nullable=False)
     experience_years = db.Column(db.Integer, default=0)
     bio = db.Column(db.Text)
+    # rating is the precomputed average rating_sum / reviews_count, kept in sync by ratings.record_rating.
     rating = db.Column(db.Float, default=0.0)
+    rating_sum = db.Column(db.Float, default=0.0)
     reviews_count = db.Column(db.Integer, default=0)
 
+    __table_args__ = (
+        db.Index('ix_sitter_rate_experience', 'hourly_rate', 'experience_years'),
+        db.Index('ix_sitter_experience', 'experience_years', 'id'),
+        db.Index('ix_sitter_rating', 'rating', 'id'),
+    )
+
 class ParentProfile(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
@@ -64,4 +107,82 @@ class Booking(db.Model):
 
 
     parent = db.relationship('User', foreign_keys=[parent_id], backref='my_hires')
-    sitter = db.relationship('User', foreign_keys=[sitter_id], backref='my_jobs')
\ No newline at end of file
+    sitter = db.relationship('User', foreign_keys=[sitter_id], backref='my_jobs')
+
+    __table_args__ = (
+        db.Index('ix_booking_sitter_window', 'sitter_id', 'start_time', 'end_time'),
+        db.Index('ix_booking_sitter_status', 'sitter_id', 'status', 'start_time'),
+        db.Index('ix_booking_parent_status', 'parent_id', 'status', 'start_time'),
+        db.Index('ix_booking_status_start', 'status', 'start_time'),
+        db.Index('ix_booking_status_end', 'status', 'end_time'),
+    )
+
+
+class Review(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    booking_id = db.Column(db.Integer, db.ForeignKey('booking.id'), unique=True, nullable=False)
+    sitter_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    parent_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    rating = db.Column(db.Float, nullable=False)
+    date_created = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+
+    booking = db.relationship('Booking', backref=db.backref('review', uselist=False))
+
+
+# Incrementally maintained count/sum/min of sitter rates per city, experience bucket and price bucket.
+class PriceRollup(db.Model):
+    city_key = db.Column(db.String(50), primary_key=True)
+    experience_bucket = db.Column(db.Integer, primary_key=True)
+    price_bucket = db.Column(db.Integer, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    rate_sum = db.Column(db.Float, nullable=False, default=0.0)
+    min_rate = db.Column(db.Float)
+
+
+# One row per schema migration applied by migrations.upgrade().
+class SchemaVersion(db.Model):
+    version = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    description = db.Column(db.String(200), nullable=False)
+    applied_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+
+
+# Single row counting the commits that changed searchable sitter fields; the epoch changes
+# whenever the row is recreated, so a catalog snapshot can tell its version is still current.
+class CatalogVersion(db.Model):
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    epoch = db.Column(db.String(32), nullable=False)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+
+# Per-user number of bookings in each status, kept in step with every flush by booking_stats.
+class BookingCounter(db.Model):
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True, autoincrement=False)
+    pending = db.Column(db.Integer, nullable=False, default=0)
+    confirmed = db.Column(db.Integer, nullable=False, default=0)
+    awaiting_rating = db.Column(db.Integer, nullable=False, default=0)
+    completed = db.Column(db.Integer, nullable=False, default=0)
+    cancelled = db.Column(db.Integer, nullable=False, default=0)
+    expired = db.Column(db.Integer, nullable=False, default=0)
+
+
+# Notifications written in the same transaction as the booking change they describe;
+# the outbox dispatcher delivers them to the configured sinks after the commit.
+class OutboxEvent(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    event = db.Column(db.String(40), nullable=False)
+    booking_id = db.Column(db.Integer, db.ForeignKey('booking.id'))
+    recipient_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    payload = db.Column(db.Text, nullable=False)
+    dedupe_key = db.Column(db.String(120), unique=True, nullable=False)
+    status = db.Column(db.String(10), nullable=False, default='pending')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    # Comma-separated names of the sinks that already accepted the event; retries skip them.
+    delivered_to = db.Column(db.String(100), nullable=False, default='')
+    available_at = db.Column(db.DateTime, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False)
+    sent_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index('ix_outbox_due', 'status', 'available_at'),
+        db.Index('ix_outbox_recipient', 'recipient_id', 'id'),
+    )
@@ -0,0 +1,330 @@
+import json
+import logging
+import smtplib
+import threading
+import time
+import urllib.request
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import db, User, OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+EVENT_MESSAGES = {
+    'booking_requested': "New booking request for {start}.",
+    'booking_confirmed': "Your booking for {start} was confirmed.",
+    'booking_declined': "Your booking request for {start} was declined.",
+    'booking_cancelled': "The booking for {start} was cancelled by the parent.",
+    'booking_expired': "Your booking request for {start} expired without an answer.",
+    'booking_awaiting_rating': "How did it go? Rate your sitter for {start}.",
+}
+# Events newer than the stream's position read per query.
+STREAM_BATCH = 50
+
+# Notified after every commit that queued events, waking the dispatcher and the open streams.
+_published = threading.Condition()
+
+
+def _insert(dialect_name: str):
+    return (postgresql if dialect_name == 'postgresql' else sqlite).insert(OutboxEvent)
+
+
+def publish_many(event_name: str, rows) -> None:
+    """Queue one event per (booking id, recipient id, start time) in the current transaction.
+
+    An event already queued for the same booking and recipient is skipped, so a repeated
+    request or an overlapping sweep cannot notify anyone twice.
+    """
+    now = datetime.now()
+    values = []
+    for booking_id, recipient_id, start_time in rows:
+        payload = {'event': event_name, 'booking_id': booking_id, 'start_time': start_time.isoformat(),
+                   'message': EVENT_MESSAGES[event_name].format(start=start_time.strftime('%d %b %Y %H:%M'))}
+        values.append({'event': event_name, 'booking_id': booking_id, 'recipient_id': recipient_id,
+                       'payload': json.dumps(payload), 'dedupe_key': f'{event_name}:{booking_id}:{recipient_id}',
+                       'status': 'pending', 'attempts': 0, 'delivered_to': '', 'available_at': now,
+                       'created_at': now})
+    if values:
+        db.session.execute(_insert(db.engine.dialect.name).on_conflict_do_nothing(index_elements=['dedupe_key']),
+                           values)
+        db.session.info['outbox_published'] = True
+
+
+def publish(event_name: str, booking, recipient_id: int) -> None:
+    """Queue an event about `booking` for one user; the booking must have been flushed."""
+    publish_many(event_name, [(booking.id, recipient_id, booking.start_time)])
+
+
+def wait_for_events(timeout: float) -> None:
+    """Block until this process commits new events or `timeout` seconds pass."""
+    with _published:
+        _published.wait(timeout)
+
+
+def _notify_committed(session) -> None:
+    if session.info.pop('outbox_published', False):
+        with _published:
+            _published.notify_all()
+
+
+def _discard_published(session, previous_transaction) -> None:
+    session.info.pop('outbox_published', None)
+
+
+class LogSink:
+    """Write every notification to the log."""
+
+    name = 'log'
+
+    def send(self, notification: dict) -> None:
+        logger.info("Notify %s: %s", notification['recipient_email'], notification['message'])
+
+
+class SMTPSink:
+    """Send notifications as e-mail, e.g. through a local stand-in started with `python -m aiosmtpd -n`.
+
+    The Message-ID is derived from the event's dedupe key, so a retried delivery can be recognized.
+    """
+
+    name = 'smtp'
+
+    def __init__(self, host: str, port: int, sender: str, timeout: float = 10.0) -> None:
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.timeout = timeout
+
+    def send(self, notification: dict) -> None:
+        message = EmailMessage()
+        message['From'] = self.sender
+        message['To'] = notification['recipient_email']
+        message['Subject'] = "Babysitter Hub: booking update"
+        message['Message-ID'] = f"<{notification['dedupe_key'].replace(':', '.')}@babysitter-hub>"
+        message.set_content(notification['message'])
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+            smtp.send_message(message)
+
+
+class WebhookSink:
+    """POST notifications as JSON; the Idempotency-Key header lets the receiver drop repeats."""
+
+    name = 'webhook'
+
+    def __init__(self, url: str, timeout: float = 5.0) -> None:
+        self.url = url
+        self.timeout = timeout
+
+    def send(self, notification: dict) -> None:
+        request = urllib.request.Request(
+            self.url, data=json.dumps(notification).encode(), method='POST',
+            headers={'Content-Type': 'application/json', 'Idempotency-Key': notification['dedupe_key']})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+def build_sinks(config) -> list:
+    """Create the sinks named in OUTBOX_SINKS, a comma-separated list of log, smtp and webhook."""
+    sinks = []
+    for name in (part.strip() for part in config['OUTBOX_SINKS'].split(',')):
+        if name == 'log':
+            sinks.append(LogSink())
+        elif name == 'smtp':
+            sinks.append(SMTPSink(config['OUTBOX_SMTP_HOST'], config['OUTBOX_SMTP_PORT'],
+                                  config['OUTBOX_SMTP_SENDER']))
+        elif name == 'webhook' and config['OUTBOX_WEBHOOK_URL']:
+            sinks.append(WebhookSink(config['OUTBOX_WEBHOOK_URL'], config['OUTBOX_WEBHOOK_TIMEOUT']))
+    return sinks
+
+
+class OutboxDispatcher:
+    """Background thread that delivers committed outbox events to every sink.
+
+    Events are claimed in batches under a lease, so several processes can dispatch without
+    sending an event twice while it is in flight. The lease is `lease` seconds plus the summed
+    sink timeouts for every claimed event, so a batch of slow sends cannot outlive it; events
+    still unsent when it runs out are left for the next claim, and results are only written
+    back while the row still carries this claim's lease. A failed delivery is retried with
+    exponential backoff and marked dead after `max_attempts`; each retry skips the sinks
+    (told apart by their `name`) that already accepted the event. At most `batch_size`
+    events are in flight at once, and when a whole batch fails the dispatcher waits
+    `backoff` seconds before claiming more instead of hammering a sink that is down.
+    """
+
+    def __init__(self, app, sinks: list, batch_size: int = 100, max_attempts: int = 8,
+                 backoff: float = 5.0, lease: float = 60.0, idle: float = 5.0) -> None:
+        self.app = app
+        self.sinks = sinks
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.lease = lease
+        self.idle = idle
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        """Start the dispatching thread; calling it again is a no-op."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="outbox-dispatcher", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the thread after its current batch."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stop.set()
+            with _published:
+                _published.notify_all()
+            thread.join()
+
+    def _claim(self, now: datetime) -> tuple[datetime, list[tuple[dict, set[str]]]]:
+        """Lease a batch of due events; returns the lease expiry and each notification with the
+        sinks it already reached."""
+        ids = db.session.scalars(
+            db.select(OutboxEvent.id)
+            .where(OutboxEvent.status == 'pending', OutboxEvent.available_at <= now)
+            .order_by(OutboxEvent.available_at)
+            .limit(self.batch_size)
+        ).all()
+        if not ids:
+            return now, []
+        send_timeout = sum(getattr(sink, 'timeout', 0.0) for sink in self.sinks)
+        leased_until = now + timedelta(seconds=self.lease + len(ids) * send_timeout)
+        rows = db.session.execute(
+            db.update(OutboxEvent)
+            .where(OutboxEvent.id.in_(ids), OutboxEvent.status == 'pending', OutboxEvent.available_at <= now)
+            .values(available_at=leased_until)
+            .returning(OutboxEvent.id, OutboxEvent.recipient_id, OutboxEvent.payload,
+                       OutboxEvent.dedupe_key, OutboxEvent.attempts, OutboxEvent.delivered_to)
+            .execution_options(synchronize_session=False)
+        ).all()
+        emails = dict(db.session.execute(
+            db.select(User.id, User.email).where(User.id.in_({row.recipient_id for row in rows}))).all())
+        db.session.commit()
+        notifications = [({**json.loads(row.payload), 'id': row.id, 'recipient_id': row.recipient_id,
+                           'recipient_email': emails.get(row.recipient_id), 'dedupe_key': row.dedupe_key,
+                           'attempts': row.attempts}, set(filter(None, row.delivered_to.split(','))))
+                         for row in rows]
+        return leased_until, notifications
+
+    def _finish(self, sent: list[int], failed: list[tuple[dict, set[str]]], now: datetime,
+                leased_until: datetime) -> None:
+        # A row whose lease ran out may already be claimed by another dispatcher; leave it to that one.
+        leased = OutboxEvent.available_at == leased_until
+        if sent:
+            db.session.execute(db.update(OutboxEvent).where(OutboxEvent.id.in_(sent), leased)
+                               .values(status='sent', sent_at=now))
+        for notification, delivered in failed:
+            attempts = notification['attempts'] + 1
+            values = {'attempts': attempts, 'delivered_to': ','.join(sorted(delivered)),
+                      'available_at': now + timedelta(seconds=self.backoff * 2 ** (attempts - 1))}
+            if attempts >= self.max_attempts:
+                values['status'] = 'dead'
+            db.session.execute(db.update(OutboxEvent).where(OutboxEvent.id == notification['id'], leased)
+                               .values(values))
+        db.session.commit()
+
+    def dispatch_once(self) -> tuple[int, int]:
+        """Claim and deliver one batch; returns (delivered, failed)."""
+        with self.app.app_context():
+            try:
+                leased_until, notifications = self._claim(datetime.now())
+                sent, failed = [], []
+                for notification, delivered in notifications:
+                    if datetime.now() >= leased_until:
+                        break
+                    try:
+                        for sink in self.sinks:
+                            if sink.name not in delivered:
+                                sink.send(notification)
+                                delivered.add(sink.name)
+                    except Exception as e:
+                        logger.warning("Outbox delivery of event %s failed: %s", notification['id'], e)
+                        failed.append((notification, delivered))
+                    else:
+                        sent.append(notification['id'])
+                if notifications:
+                    self._finish(sent, failed, datetime.now(), leased_until)
+                return len(sent), len(failed)
+            finally:
+                db.session.remove()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                sent, failed = self.dispatch_once()
+            except Exception:
+                logger.exception("Outbox dispatch failed")
+                sent, failed = 0, 1
+            if failed and not sent:
+                self._stop.wait(self.backoff)
+            elif sent + failed < self.batch_size:
+                wait_for_events(self.idle)
+
+
+def latest_event_id(user_id: int) -> int:
+    return db.session.query(db.func.max(OutboxEvent.id)).filter(OutboxEvent.recipient_id == user_id).scalar() or 0
+
+
+def recipient_events(user_id: int, after_id: int) -> list[tuple[int, str]]:
+    """Return (id, payload) of the user's events after `after_id`, oldest first, from the recipient index."""
+    return db.session.execute(
+        db.select(OutboxEvent.id, OutboxEvent.payload)
+        .where(OutboxEvent.recipient_id == user_id, OutboxEvent.id > after_id)
+        .order_by(OutboxEvent.id)
+        .limit(STREAM_BATCH)
+    ).all()
+
+
+def event_stream(app, user_id: int, last_id: int, max_seconds: float, keepalive: float, poll: float):
+    """Yield the user's new events as Server-Sent Events until `max_seconds` have passed.
+
+    Commits in this process wake the stream at once; events written by other processes are
+    picked up within `poll` seconds. The browser reconnects with Last-Event-ID afterwards.
+    """
+    deadline = time.monotonic() + max_seconds
+    last_sent = time.monotonic()
+    yield 'retry: 3000\n\n'
+    while True:
+        with app.app_context():
+            try:
+                events = recipient_events(user_id, last_id)
+            finally:
+                db.session.remove()
+        for event_id, payload in events:
+            yield f'id: {event_id}\ndata: {payload}\n\n'
+            last_id = event_id
+
+        now = time.monotonic()
+        if events:
+            last_sent = now
+        elif now - last_sent >= keepalive:
+            yield ': keepalive\n\n'
+            last_sent = now
+        if now >= deadline:
+            return
+        if len(events) < STREAM_BATCH:
+            wait_for_events(min(poll, deadline - now))
+
+
+def init_outbox(app) -> None:
+    """Create the app's dispatcher and stream limit, and wake them whenever events are committed."""
+    dispatcher = OutboxDispatcher(app, build_sinks(app.config), batch_size=app.config['OUTBOX_BATCH'],
+                                  max_attempts=app.config['OUTBOX_MAX_ATTEMPTS'],
+                                  backoff=app.config['OUTBOX_RETRY_BACKOFF'])
+    app.extensions['outbox_dispatcher'] = dispatcher
+    app.extensions['event_streams'] = threading.BoundedSemaphore(app.config['OUTBOX_SSE_MAX_STREAMS'])
+    if not event.contains(db.session, 'after_commit', _notify_committed):
+        event.listen(db.session, 'after_commit', _notify_committed)
+        event.listen(db.session, 'after_soft_rollback', _discard_published)
+    if app.config['OUTBOX_DISPATCHER_ENABLED'] and not app.testing:
+        app.before_request(dispatcher.start)
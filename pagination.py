@@ -0,0 +1,92 @@
+import base64
+import binascii
+import json
+import math
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+
+
+class Page:
+    """One page of results plus the cursor that continues after its last item."""
+
+    def __init__(self, items: list, next_cursor: str | None) -> None:
+        self.items = items
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    return value
+
+
+def _decode_value(value, numeric: bool):
+    """Decode one cursor value: a finite float, a 64-bit integer or, unless `numeric`, an encoded datetime."""
+    if isinstance(value, float) and math.isfinite(value):
+        return value
+    if isinstance(value, int) and not isinstance(value, bool) and -2 ** 63 <= value < 2 ** 63:
+        return value
+    if not numeric and isinstance(value, dict) and isinstance(value.get('dt'), str):
+        return datetime.fromisoformat(value['dt'])
+    raise ValueError(f"Invalid cursor value: {value!r}")
+
+
+def encode_cursor(values: tuple) -> str:
+    """Encode the sort key of the last item on a page into an opaque URL-safe cursor."""
+    raw = json.dumps([_encode_value(v) for v in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str | None, size: int, numeric: bool = False) -> tuple | None:
+    """Decode a cursor produced by encode_cursor; malformed cursors restart from the first page.
+
+    Every value must be a number or an encoded datetime; `numeric` accepts numbers only, for
+    the sitter orders, whose keys are never datetimes.
+    """
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != size:
+            return None
+        return tuple(_decode_value(v, numeric) for v in values)
+    except (binascii.Error, ValueError, UnicodeDecodeError):
+        return None
+
+
+def keyset_condition(order: list[tuple], values: tuple):
+    """Build the WHERE clause selecting rows that sort strictly after `values`.
+
+    `order` is a list of (column, descending) pairs; the last one must be unique (e.g. id).
+    """
+    clauses = []
+    for i, (column, descending) in enumerate(order):
+        equal_prefix = [col == val for (col, _), val in zip(order[:i], values[:i])]
+        after = column < values[i] if descending else column > values[i]
+        clauses.append(and_(*equal_prefix, after))
+    return or_(*clauses)
+
+
+def paginate_keyset(query, order: list[tuple], cursor: str | None, per_page: int, key,
+                    numeric: bool = False) -> Page:
+    """Return one page of `query` in keyset order, continuing after `cursor`.
+
+    `key` maps a result item to the tuple of values for the `order` columns; `numeric` is
+    passed to decode_cursor.
+    """
+    values = decode_cursor(cursor, len(order), numeric)
+    if values is not None:
+        query = query.filter(keyset_condition(order, values))
+
+    query = query.order_by(*(col.desc() if descending else col.asc() for col, descending in order))
+    rows = query.limit(per_page + 1).all()
+
+    items = rows[:per_page]
+    next_cursor = encode_cursor(key(items[-1])) if len(rows) > per_page else None
+    return Page(items, next_cursor)
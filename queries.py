@@ -0,0 +1,166 @@
+from sqlalchemy import func, or_
+from sqlalchemy.orm import contains_eager
+
+from availability import available_clause
+from geo import bounding_cells
+from instrumentation import timed
+from logic import sort_sitters_by_distance
+from models import db, User, SitterProfile, Booking, normalize_city
+from pagination import Page, decode_cursor, encode_cursor, paginate_keyset
+from search_index import text_criterion
+
+INITIAL_SEARCH_RADIUS_KM = 5.0
+MAX_SEARCH_RADIUS_KM = 1000.0
+# Cursor distance of sitters without coordinates, which distance order lists after every located one by id.
+UNLOCATED_DISTANCE = -1.0
+
+
+# Keyset orderings for sitter listings: (column, descending) pairs ending in a unique column.
+SITTER_ORDERINGS = {
+    'rating': [(SitterProfile.rating, True), (SitterProfile.id, False)],
+    'experience': [(SitterProfile.experience_years, True), (SitterProfile.id, False)],
+}
+SITTER_ORDER_KEYS = {
+    'rating': lambda s: (s.rating, s.id),
+    'experience': lambda s: (s.experience_years, s.id),
+}
+BOOKING_ORDERING = [(Booking.start_time, False), (Booking.id, False)]
+BOOKING_HISTORY_ORDERING = [(Booking.start_time, True), (Booking.id, True)]
+
+
+def sitter_filters(city=None, max_price=None, min_experience=0, available=None, text=None) -> list:
+    """Return the SQL criteria for the city, maximum price, minimum experience, availability and text filters.
+
+    `available` is an optional (start, end) window the sitter must be free for; `text`
+    is a list of search terms matched against the full-text index.
+    """
+    criteria = []
+
+    if min_experience:
+        criteria.append(SitterProfile.experience_years >= min_experience)
+
+    if city:
+        criteria.append(User.city_normalized == normalize_city(city))
+
+    if max_price:
+        criteria.append(SitterProfile.hourly_rate <= max_price)
+
+    if available:
+        criteria.append(available_clause(*available))
+
+    if text:
+        criteria.append(text_criterion(text, db.engine.dialect.name))
+
+    return criteria
+
+
+def build_sitter_query(city=None, max_price=None, min_experience=0, available=None, session=None):
+    """Build a query that filters sitters by city, maximum price, and minimum experience in the database.
+
+    Mirrors the semantics of logic.search_sitters, which remains the reference implementation.
+    The joined User row is loaded in the same SELECT, so `sitter.user` never triggers a lazy load.
+    `session` defaults to db.session; listing routes pass the read-only session.
+    """
+    return (
+        (session or db.session).query(SitterProfile)
+        .join(User, SitterProfile.user_id == User.id)
+        .options(contains_eager(SitterProfile.user))
+        .filter(*sitter_filters(city, max_price, min_experience, available))
+    )
+
+
+@timed('sitter_price_stats')
+def sitter_price_stats(city=None, max_price=None, min_experience=0,
+                       available=None, session=None, text=None) -> tuple[int, float, float | None]:
+    """Return (count, average rate, minimum rate) of the matching sitters, aggregated in SQL."""
+    count, average, minimum = (session or db.session).execute(
+        db.select(func.count(SitterProfile.id), func.avg(SitterProfile.hourly_rate),
+                  func.min(SitterProfile.hourly_rate))
+        .join(User, SitterProfile.user_id == User.id)
+        .where(*sitter_filters(city, max_price, min_experience, available, text))
+    ).one()
+    return count, average or 0.0, minimum
+
+
+def sitter_page(query, sort: str, cursor: str | None, per_page: int) -> Page:
+    """Return one keyset page of sitters in 'rating' or 'experience' order."""
+    return paginate_keyset(query, SITTER_ORDERINGS[sort], cursor, per_page, SITTER_ORDER_KEYS[sort],
+                           numeric=True)
+
+
+def nearest_page(query, lat: float, lng: float, cursor: str | None, per_page: int) -> Page:
+    """Return one keyset page of sitters ordered by distance, ties broken by id.
+
+    Sitters without coordinates follow the located ones in id order; their cursor carries
+    UNLOCATED_DISTANCE, so the next page knows the located phase is over.
+    """
+    after = decode_cursor(cursor, 2, numeric=True)
+    if after is not None and after[0] == UNLOCATED_DISTANCE:
+        located, after_id = [], after[1]
+    else:
+        located, after_id = nearest_sitters(query, lat, lng, k=per_page + 1, after=after), None
+    keys = [((s.distance, s.id), s) for s in located]
+    if len(keys) <= per_page:
+        unlocated = unlocated_sitters(query, per_page + 1 - len(keys), after_id)
+        keys += [((UNLOCATED_DISTANCE, s.id), s) for s in unlocated]
+
+    items = [sitter for _, sitter in keys[:per_page]]
+    next_cursor = encode_cursor(keys[per_page - 1][0]) if len(keys) > per_page else None
+    return Page(items, next_cursor)
+
+
+def unlocated_sitters(query, k: int, after_id: int | None = None) -> list[SitterProfile]:
+    """Return up to k sitters from query whose address has no coordinates, in id order after `after_id`."""
+    unlocated = query.filter(or_(User.geocode_status.is_(None), User.geocode_status != 'resolved',
+                                 User.lat.is_(None), User.lng.is_(None)))
+    if after_id is not None:
+        unlocated = unlocated.filter(SitterProfile.id > after_id)
+    return unlocated.order_by(SitterProfile.id).limit(k).all()
+
+
+def bookings_page(query, cursor: str | None, per_page: int, ordering=BOOKING_ORDERING) -> Page:
+    """Return one keyset page of bookings ordered by start time (BOOKING_HISTORY_ORDERING: newest first)."""
+    return paginate_keyset(query, ordering, cursor, per_page, lambda b: (b.start_time, b.id))
+
+
+@timed('nearest_sitters')
+def nearest_sitters(query, lat: float, lng: float, k: int | None = None,
+                    radius_km: float | None = None, after: tuple | None = None) -> list[SitterProfile]:
+    """Return up to k sitters from query nearest to (lat, lng), optionally limited to radius_km.
+
+    Only the grid cells around the point are scanned, and users whose address has not
+    been geocoded yet are left out (nearest_page lists them afterwards). Without an explicit radius the search
+    starts small and doubles until k sitters are found or MAX_SEARCH_RADIUS_KM is reached.
+    Each returned sitter gets a `distance` attribute, like sort_sitters_by_distance.
+    Passing `after=(distance, id)` skips everything up to and including that sitter.
+    """
+    if lat is None or lng is None:
+        return []
+
+    located = query.filter(User.geocode_status == 'resolved')
+    total = None
+    radius = radius_km if radius_km is not None else INITIAL_SEARCH_RADIUS_KM
+    if after is not None and radius_km is None:
+        radius = min(max(radius, after[0]), MAX_SEARCH_RADIUS_KM)
+    while True:
+        min_lat, max_lat, min_lng, max_lng = bounding_cells(lat, lng, radius)
+        candidates = located.filter(
+            User.grid_lat.between(min_lat, max_lat),
+            User.grid_lng.between(min_lng, max_lng),
+        ).order_by(SitterProfile.id).all()
+
+        ranked = sort_sitters_by_distance(lat, lng, candidates)
+        if after is not None:
+            ranked = [s for s in ranked if (s.distance, s.id) > tuple(after)]
+        in_range = [s for s in ranked if s.distance <= radius]
+
+        if radius_km is not None or radius >= MAX_SEARCH_RADIUS_KM or (k is not None and len(in_range) >= k):
+            return in_range if k is None else in_range[:k]
+
+        if total is None:
+            total = located.filter(User.grid_lat.isnot(None)).count()
+        if len(candidates) >= total:
+            # Every located sitter is already in the box, so a wider search finds nothing new.
+            return ranked if k is None else ranked[:k]
+
+        radius = min(radius * 2, MAX_SEARCH_RADIUS_KM)
@@ -0,0 +1,61 @@
+import heapq
+
+from geo import MISSING_DISTANCE
+
+# Named orderings as lists of (attribute, descending) pairs, most significant first.
+ORDERINGS = {
+    'rating': [('rating', True)],
+    'experience': [('experience_years', True)],
+    'distance': [('distance', False)],
+    'rating_distance': [('rating', True), ('distance', False)],
+    'experience_rating': [('experience_years', True), ('rating', True)],
+}
+
+_DEFAULTS = {'distance': MISSING_DISTANCE}
+
+
+def ordering_key(ordering: list[tuple[str, bool]]):
+    """Build a sort key for a multi-key ordering; descending numeric keys are negated."""
+    def key(item):
+        values = []
+        for attr, descending in ordering:
+            value = getattr(item, attr, _DEFAULTS.get(attr, 0))
+            if value is None:
+                value = _DEFAULTS.get(attr, 0)
+            values.append(-value if descending else value)
+        return tuple(values)
+    return key
+
+
+def top_k(items: list, k: int | None, key) -> list:
+    """Return the first k items by ascending key, equal to sorted(items, key=key)[:k].
+
+    Uses a bounded heap, so the cost is O(n log k) instead of O(n log n).
+    """
+    if k is None or k >= len(items):
+        return sorted(items, key=key)
+    if k <= 0:
+        return []
+    return heapq.nsmallest(k, items, key=key)
+
+
+def rank(items: list, ordering: str | list[tuple[str, bool]], k: int | None = None) -> list:
+    """Rank items by a named or explicit ordering and keep the top k."""
+    if isinstance(ordering, str):
+        ordering = ORDERINGS[ordering]
+    return top_k(items, k, ordering_key(ordering))
+
+
+def top_k_by_rating(sitters: list, k: int | None = None) -> list:
+    """Return the k best-rated sitters."""
+    return rank(sitters, 'rating', k)
+
+
+def top_k_by_experience(sitters: list, k: int | None = None) -> list:
+    """Return the k most experienced sitters."""
+    return rank(sitters, 'experience', k)
+
+
+def top_k_by_distance(sitters: list, k: int | None = None) -> list:
+    """Return the k nearest sitters by their precomputed `distance` attribute."""
+    return rank(sitters, 'distance', k)
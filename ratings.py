@@ -0,0 +1,47 @@
+from sqlalchemy import func
+
+from models import db, SitterProfile, Review
+
+
+def record_rating(sitter_user_id: int, rating: float) -> None:
+    """Add one rating to a sitter's aggregate in a single atomic UPDATE.
+
+    The right-hand side sees the row as it was before the update, so concurrent ratings
+    never overwrite each other and the average is derived from the exact sum and count.
+    """
+    db.session.execute(
+        db.update(SitterProfile)
+        .where(SitterProfile.user_id == sitter_user_id)
+        .values(
+            rating_sum=func.coalesce(SitterProfile.rating_sum, 0.0) + rating,
+            reviews_count=func.coalesce(SitterProfile.reviews_count, 0) + 1,
+            rating=(func.coalesce(SitterProfile.rating_sum, 0.0) + rating)
+            / (func.coalesce(SitterProfile.reviews_count, 0) + 1),
+        )
+    )
+
+
+def backfill_rating_sums() -> int:
+    """Derive rating_sum from the stored average for sitters rated before reviews were recorded."""
+    result = db.session.execute(
+        db.update(SitterProfile)
+        .where(SitterProfile.rating_sum.is_(None))
+        .values(rating_sum=func.coalesce(SitterProfile.rating, 0.0)
+                * func.coalesce(SitterProfile.reviews_count, 0))
+    )
+    return result.rowcount
+
+
+def recompute_ratings() -> int:
+    """Recompute sum, count and average for every sitter that has Review rows."""
+    totals = (
+        db.select(Review.sitter_id, func.sum(Review.rating).label('total'), func.count().label('n'))
+        .group_by(Review.sitter_id)
+        .subquery()
+    )
+    result = db.session.execute(
+        db.update(SitterProfile)
+        .where(SitterProfile.user_id == totals.c.sitter_id)
+        .values(rating_sum=totals.c.total, reviews_count=totals.c.n, rating=totals.c.total / totals.c.n)
+    )
+    return result.rowcount
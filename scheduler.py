@@ -0,0 +1,120 @@
+import logging
+import threading
+from datetime import datetime
+
+from booking_stats import move_counts
+from instrumentation import timed
+from models import db, Booking
+from outbox import publish_many
+
+logger = logging.getLogger(__name__)
+
+# (from status, to status, time column, event sent to the parent): a booking moves once the
+# column's time has passed. Pending requests the sitter never answered expire when they would
+# have started; confirmed bookings wait for the parent's rating once they have ended.
+TRANSITIONS = [
+    ('Pending', 'Expired', Booking.start_time, 'booking_expired'),
+    ('Confirmed', 'AwaitingRating', Booking.end_time, 'booking_awaiting_rating'),
+]
+
+
+def _transition_batch(old_status: str, new_status: str, column, event_name: str, now: datetime,
+                      batch_size: int) -> tuple[int, int]:
+    """Move one batch of due bookings; returns (bookings selected, bookings actually moved)."""
+    ids = db.session.scalars(
+        db.select(Booking.id)
+        .where(Booking.status == old_status, column <= now)
+        .order_by(column)
+        .limit(batch_size)
+    ).all()
+    if not ids:
+        return 0, 0
+    # Re-checking the status skips bookings a request changed since they were selected.
+    rows = db.session.execute(
+        db.update(Booking)
+        .where(Booking.id.in_(ids), Booking.status == old_status)
+        .values(status=new_status)
+        .returning(Booking.id, Booking.parent_id, Booking.sitter_id, Booking.start_time)
+        .execution_options(synchronize_session=False)
+    ).all()
+    move_counts(db.session.connection(), [(row.parent_id, row.sitter_id) for row in rows],
+                old_status, new_status)
+    publish_many(event_name, [(row.id, row.parent_id, row.start_time) for row in rows])
+    db.session.commit()
+    return len(ids), len(rows)
+
+
+@timed('booking_sweep')
+def sweep_bookings(now: datetime | None = None, batch_size: int = 500) -> dict[str, int]:
+    """Apply every due time-based transition; returns the number of bookings moved to each status.
+
+    Each batch is a range scan on the (status, time) index followed by one UPDATE, committed
+    on its own so requests never wait on a long sweep.
+    """
+    now = now or datetime.now()
+    moved = {}
+    for old_status, new_status, column, event_name in TRANSITIONS:
+        moved[new_status] = 0
+        while True:
+            selected, count = _transition_batch(old_status, new_status, column, event_name, now, batch_size)
+            moved[new_status] += count
+            if selected < batch_size:
+                break
+    return moved
+
+
+class BookingScheduler:
+    """Background thread that sweeps bookings through their time-based transitions.
+
+    Several processes may each run one: a booking is only moved while it still has its old
+    status, so overlapping sweeps never count a transition twice.
+    """
+
+    def __init__(self, app, interval: float = 60.0, batch_size: int = 500) -> None:
+        self.app = app
+        self.interval = interval
+        self.batch_size = batch_size
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        """Start the sweeping thread; calling it again is a no-op."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="booking-scheduler", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the thread after its current sweep."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stop.set()
+            thread.join()
+
+    def sweep(self) -> dict[str, int]:
+        with self.app.app_context():
+            try:
+                return sweep_bookings(batch_size=self.batch_size)
+            finally:
+                db.session.remove()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.sweep()
+            except Exception:
+                logger.exception("Booking sweep failed")
+            self._stop.wait(self.interval)
+
+
+def init_scheduler(app) -> None:
+    """Create the app's scheduler and start it before the first request when it is enabled."""
+    scheduler = BookingScheduler(app, interval=app.config['BOOKING_SWEEP_INTERVAL'],
+                                 batch_size=app.config['BOOKING_SWEEP_BATCH'])
+    app.extensions['booking_scheduler'] = scheduler
+    if app.config['BOOKING_SCHEDULER_ENABLED'] and not app.testing:
+        app.before_request(scheduler.start)
@@ -0,0 +1,131 @@
+import heapq
+
+import geo
+from geo import MISSING_DISTANCE, batch_distances
+from pagination import Page, decode_cursor, encode_cursor
+
+DEFAULT_WEIGHTS = {'distance': 0.4, 'rating': 0.3, 'price': 0.2, 'experience': 0.1}
+MAX_RATING = 5.0
+
+
+def parse_weights(text: str | None) -> dict[str, float]:
+    """Parse weights like 'distance=0.5,rating=0.3'; components left out keep their default."""
+    weights = dict(DEFAULT_WEIGHTS)
+    for part in (text or '').split(','):
+        name, _, value = part.partition('=')
+        if name.strip() in weights and value.strip():
+            weights[name.strip()] = float(value)
+    return weights
+
+
+class Scorer:
+    """Relevance score in [0, 1]: a weighted mean of four components normalized to [0, 1].
+
+    - distance: halves every `distance_half_life_km`; 0 without coordinates
+    - rating: Bayesian average that pulls sitters with few reviews towards `rating_prior`
+    - price: budget / (budget + rate), so 1 for free, 0.5 at the budget (max_price or `price_reference`)
+    - experience: years / (years + `experience_half_years`)
+
+    Without an origin the distance weight is left out. Every formula is plain arithmetic,
+    so it runs unchanged on numpy arrays (one vectorized pass) and on Python numbers.
+    """
+
+    def __init__(self, weights: dict[str, float] | None = None, distance_half_life_km: float = 5.0,
+                 rating_prior: float = 4.0, rating_prior_count: float = 5.0, price_reference: float = 15.0,
+                 experience_half_years: float = 3.0) -> None:
+        self.weights = dict(DEFAULT_WEIGHTS if weights is None else weights)
+        self.distance_half_life_km = distance_half_life_km
+        self.rating_prior = rating_prior
+        self.rating_prior_count = rating_prior_count
+        self.price_reference = price_reference
+        self.experience_half_years = experience_half_years
+
+    @classmethod
+    def from_config(cls, config) -> 'Scorer':
+        return cls(weights=config['SCORING_WEIGHTS'],
+                   distance_half_life_km=config['SCORING_DISTANCE_HALF_LIFE_KM'],
+                   rating_prior=config['SCORING_RATING_PRIOR'],
+                   rating_prior_count=config['SCORING_RATING_PRIOR_COUNT'],
+                   price_reference=config['SCORING_PRICE_REFERENCE'],
+                   experience_half_years=config['SCORING_EXPERIENCE_HALF_YEARS'])
+
+    def components(self, distance, rating, reviews, rate, years, max_price=None) -> dict:
+        """Return the normalized components for one sitter or for arrays of sitters."""
+        m = self.rating_prior_count
+        budget = max_price or self.price_reference
+        parts = {
+            'rating': (self.rating_prior * m + rating * reviews) / (m + reviews) / MAX_RATING,
+            'price': budget / (budget + rate),
+            'experience': years / (years + self.experience_half_years),
+        }
+        if distance is not None:
+            parts['distance'] = 0.5 ** (distance / self.distance_half_life_km) * (distance < MISSING_DISTANCE)
+        return parts
+
+    def score(self, distance, rating, reviews, rate, years, max_price=None):
+        """Weighted mean of the components; same shape as the inputs."""
+        parts = self.components(distance, rating, reviews, rate, years, max_price)
+        total_weight = sum(self.weights.get(name, 0.0) for name in parts)
+        if total_weight <= 0:
+            return 0.0 * rate
+        return sum(self.weights.get(name, 0.0) * value for name, value in parts.items()) / total_weight
+
+    def score_columns(self, distances, ratings, reviews, rates, years, max_price=None,
+                      use_numpy: bool = True) -> list[float]:
+        """Score columns of sitter values in one pass; distances may be None when there is no origin."""
+        np = geo.np if use_numpy else None
+        if np is None:
+            distances = distances if distances is not None else [None] * len(rates)
+            return [self.score(*values, max_price=max_price)
+                    for values in zip(distances, ratings, reviews, rates, years)]
+        return self.score(None if distances is None else np.asarray(distances, dtype=float),
+                          np.asarray(ratings, dtype=float), np.asarray(reviews, dtype=float),
+                          np.asarray(rates, dtype=float), np.asarray(years, dtype=float), max_price)
+
+
+def top_k(scores, ids, k: int, after: tuple | None = None, use_numpy: bool = True) -> list[int]:
+    """Return the positions of the k best (highest score, then lowest id) entries after the cursor `after`."""
+    np = geo.np if use_numpy else None
+    if np is None:
+        positions = range(len(ids))
+        if after is not None:
+            positions = [i for i in positions if (-scores[i], ids[i]) > (-after[0], after[1])]
+        return heapq.nsmallest(k, positions, key=lambda i: (-scores[i], ids[i]))
+
+    scores, ids = np.asarray(scores, dtype=float), np.asarray(ids)
+    candidates = np.arange(len(ids))
+    if after is not None:
+        candidates = np.flatnonzero((scores < after[0]) | ((scores == after[0]) & (ids > after[1])))
+    if len(candidates) > k:
+        cut = scores[candidates]
+        threshold = cut[np.argpartition(-cut, k - 1)[k - 1]]
+        candidates = candidates[cut >= threshold]
+    order = np.lexsort((ids[candidates], -scores[candidates]))[:k]
+    return candidates[order].tolist()
+
+
+def scored_page(sitters: list, scorer: Scorer, cursor: str | None, per_page: int,
+                origin: tuple[float, float] | None = None, max_price=None) -> Page:
+    """Return one page of already loaded sitters in best-match order, used where the catalog is not."""
+    distances = None
+    if origin is not None:
+        located = [s.user.geocode_status == 'resolved' for s in sitters]
+        distances = batch_distances(*origin, [s.user.lat if ok else None for s, ok in zip(sitters, located)],
+                                    [s.user.lng if ok else None for s, ok in zip(sitters, located)])
+    scores = scorer.score_columns(distances, [s.rating or 0.0 for s in sitters],
+                                  [s.reviews_count or 0 for s in sitters],
+                                  [s.hourly_rate for s in sitters],
+                                  [s.experience_years or 0 for s in sitters], max_price)
+    ids = [s.id for s in sitters]
+    after = decode_cursor(cursor, 2, numeric=True)
+    positions = top_k(scores, ids, per_page + 1, after)
+
+    items = []
+    for i in positions[:per_page]:
+        sitter = sitters[i]
+        sitter.score = float(scores[i])
+        if distances is not None and distances[i] < MISSING_DISTANCE:
+            sitter.distance = distances[i]
+        items.append(sitter)
+    next_cursor = encode_cursor((items[-1].score, items[-1].id)) if len(positions) > per_page else None
+    return Page(items, next_cursor)
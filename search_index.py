@@ -0,0 +1,146 @@
+import re
+
+from sqlalchemy import event, or_
+
+from geocoding import transliterate
+from models import db, User, SitterProfile
+from pagination import Page, decode_cursor, encode_cursor, keyset_condition
+
+FTS_TABLE = 'sitter_search'
+# bm25 weights per column: name, bio, neighborhood, street, latin.
+COLUMN_WEIGHTS = (3.0, 1.0, 2.0, 1.0, 1.0)
+MAX_TERMS = 8
+# Terms at least this long are matched on all but their last letter, a crude stem
+# for plurals and Bulgarian endings ("toddlers" -> toddler*, "лозенец" -> лозене*).
+STEM_MIN_LENGTH = 6
+
+_LATIN = "translit(coalesce({name}, '') || ' ' || coalesce({bio}, '') || ' ' || coalesce({neighborhood}, '')" \
+         " || ' ' || coalesce({street}, ''))"
+
+
+def _index_rows(profile: str, user: str) -> str:
+    columns = dict(name=f'{profile}.name', bio=f'{profile}.bio',
+                   neighborhood=f'{user}.neighborhood', street=f'{user}.street')
+    return (f"{columns['name']}, {columns['bio']}, {columns['neighborhood']}, {columns['street']}, "
+            + _LATIN.format(**columns))
+
+
+# The index has one row per sitter profile (rowid = sitter_profile.id). `latin` holds the
+# transliterated text, so "Lozenets" finds "Лозенец". translit() is registered on every
+# SQLite connection by database.init_database.
+SCHEMA = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        name, bio, neighborhood, street, latin,
+        tokenize = "unicode61 remove_diacritics 2")""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert AFTER INSERT ON sitter_profile BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name, bio, neighborhood, street, latin)
+        SELECT NEW.id, {_index_rows('NEW', 'u')} FROM "user" u WHERE u.id = NEW.user_id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update AFTER UPDATE OF name, bio, user_id ON sitter_profile BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = OLD.id;
+        INSERT INTO {FTS_TABLE}(rowid, name, bio, neighborhood, street, latin)
+        SELECT NEW.id, {_index_rows('NEW', 'u')} FROM "user" u WHERE u.id = NEW.user_id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete AFTER DELETE ON sitter_profile BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = OLD.id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_user_update AFTER UPDATE OF neighborhood, street ON "user" BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid IN (SELECT id FROM sitter_profile WHERE user_id = NEW.id);
+        INSERT INTO {FTS_TABLE}(rowid, name, bio, neighborhood, street, latin)
+        SELECT p.id, {_index_rows('p', 'NEW')} FROM sitter_profile p WHERE p.user_id = NEW.id;
+    END""",
+]
+
+
+def is_available(connection) -> bool:
+    return connection.dialect.name == 'sqlite'
+
+
+def create_search_index(target, connection, **kw) -> None:
+    """Create the FTS5 table and the triggers that keep it in sync (SQLite only)."""
+    if is_available(connection):
+        for statement in SCHEMA:
+            connection.exec_driver_sql(statement)
+
+
+def drop_search_index(target, connection, **kw) -> None:
+    if is_available(connection):
+        connection.exec_driver_sql(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+def rebuild_search_index(connection) -> int:
+    """Re-index every sitter profile; returns the number of rows indexed."""
+    connection.exec_driver_sql(f"DELETE FROM {FTS_TABLE}")
+    return connection.exec_driver_sql(
+        f"""INSERT INTO {FTS_TABLE}(rowid, name, bio, neighborhood, street, latin)
+        SELECT p.id, {_index_rows('p', 'u')} FROM sitter_profile p JOIN "user" u ON u.id = p.user_id"""
+    ).rowcount
+
+
+def search_terms(text: str | None) -> list[str]:
+    """Split free text into at most MAX_TERMS lowercase word terms."""
+    return re.findall(r'\w+', (text or '').casefold())[:MAX_TERMS]
+
+
+def _prefix(term: str) -> str:
+    return term[:-1] if len(term) >= STEM_MIN_LENGTH else term
+
+
+def match_expression(terms: list[str]) -> str:
+    """Build an FTS5 query matching any term, as written or transliterated; bm25 ranks sitters matching more."""
+    clauses = []
+    for term in terms:
+        latin = transliterate(term)
+        clauses.append(f'{{name bio neighborhood street}} : "{_prefix(term)}"* OR latin : "{_prefix(latin)}"*')
+    return ' OR '.join(f'({clause})' for clause in clauses)
+
+
+def text_matches(terms: list[str]):
+    """Return a subquery of (rowid, rank) for the sitters matching the terms, best (lowest rank) first."""
+    weights = ', '.join(str(w) for w in COLUMN_WEIGHTS)
+    return (
+        db.select(db.literal_column('rowid').label('sitter_id'),
+                  db.literal_column(f'bm25({FTS_TABLE}, {weights})').label('rank'))
+        .select_from(db.text(FTS_TABLE))
+        .where(db.text(f'{FTS_TABLE} MATCH :match').bindparams(match=match_expression(terms)))
+        .subquery('text_match')
+    )
+
+
+def text_criterion(terms: list[str], dialect_name: str):
+    """Return a WHERE criterion keeping the sitters whose text matches any of the terms."""
+    if dialect_name == 'sqlite':
+        return SitterProfile.id.in_(db.select(text_matches(terms).c.sitter_id))
+    # Other databases have no FTS5 table: fall back to a case-insensitive substring match.
+    return or_(*(column.ilike(f'%{term}%') for term in terms
+                 for column in (SitterProfile.name, SitterProfile.bio, User.neighborhood, User.street)))
+
+
+def text_search_page(query, terms: list[str], cursor: str | None, per_page: int) -> Page:
+    """Return one keyset page of `query` (a build_sitter_query) ordered by text relevance, then id.
+
+    The FTS5 match, the bm25 ranking and the other filters run as one SQL query; each
+    returned sitter gets its `rank` (lower is better).
+    """
+    matches = text_matches(terms)
+    ordered = query.join(matches, matches.c.sitter_id == SitterProfile.id).add_columns(matches.c.rank)
+    order = [(matches.c.rank, False), (SitterProfile.id, False)]
+
+    values = decode_cursor(cursor, 2, numeric=True)
+    if values is not None:
+        ordered = ordered.filter(keyset_condition(order, values))
+    rows = ordered.order_by(matches.c.rank, SitterProfile.id).limit(per_page + 1).all()
+
+    items = []
+    for sitter, rank in rows[:per_page]:
+        sitter.rank = rank
+        items.append(sitter)
+    next_cursor = encode_cursor((items[-1].rank, items[-1].id)) if len(rows) > per_page else None
+    return Page(items, next_cursor)
+
+
+def init_search_index() -> None:
+    """Create and drop the FTS5 index together with the tables (db.create_all / db.drop_all)."""
+    if not event.contains(db.metadata, 'after_create', create_search_index):
+        event.listen(db.metadata, 'after_create', create_search_index)
+        event.listen(db.metadata, 'before_drop', drop_search_index)
@@ -0,0 +1,202 @@
+from bisect import bisect_left, bisect_right
+
+from sqlalchemy import case, event, func, inspect
+
+from instrumentation import timed
+from models import db, User, SitterProfile, PriceRollup, normalize_city
+
+ALL_CITIES = '*'
+# Lower bounds of the experience buckets, in years.
+EXPERIENCE_BUCKETS = (0, 2, 5, 10)
+# Edges of the hourly rate histogram: bucket i holds rates in (PRICE_BUCKETS[i], PRICE_BUCKETS[i + 1]],
+# bucket 0 also holds 0, and the last bucket is open-ended.
+PRICE_BUCKETS = (0, 5, 10, 15, 20, 25, 30, 40, 50)
+
+
+def experience_bucket(years: int | None) -> int:
+    return max(bisect_right(EXPERIENCE_BUCKETS, years or 0) - 1, 0)
+
+
+def price_bucket(rate: float) -> int:
+    return max(bisect_left(PRICE_BUCKETS, rate) - 1, 0)
+
+
+class SearchStats:
+    """Aggregate price statistics for one search, answered from the rollup rows."""
+
+    def __init__(self, rows: list[PriceRollup]) -> None:
+        self.histogram = [0] * len(PRICE_BUCKETS)
+        self.count = 0
+        self.rate_sum = 0.0
+        self.min_rate = None
+        for row in rows:
+            if not row.count:
+                continue
+            self.histogram[row.price_bucket] += row.count
+            self.count += row.count
+            self.rate_sum += row.rate_sum
+            if row.min_rate is not None and (self.min_rate is None or row.min_rate < self.min_rate):
+                self.min_rate = row.min_rate
+
+    @property
+    def average(self) -> float:
+        return self.rate_sum / self.count if self.count else 0.0
+
+    def has_affordable(self, budget: float) -> bool:
+        return self.min_rate is not None and self.min_rate <= budget
+
+    def percentile(self, p: float) -> float | None:
+        """Estimate the p-th percentile rate by interpolating inside the histogram bucket."""
+        if not self.count:
+            return None
+        target = p / 100 * self.count
+        seen = 0
+        for i, n in enumerate(self.histogram):
+            if n and seen + n >= target:
+                low = PRICE_BUCKETS[i]
+                high = PRICE_BUCKETS[i + 1] if i + 1 < len(PRICE_BUCKETS) else low * 2
+                return low + (high - low) * (target - seen) / n
+            seen += n
+        return float(PRICE_BUCKETS[-1])
+
+    def facets(self) -> list[tuple[float, int]]:
+        """Return (max price, number of sitters at or below it) for every non-empty histogram bucket."""
+        facets, seen = [], 0
+        for i, n in enumerate(self.histogram[:-1]):
+            seen += n
+            if n:
+                facets.append((PRICE_BUCKETS[i + 1], seen))
+        return facets
+
+
+@timed('search_stats')
+def search_stats(city=None, min_experience=0, max_price=None) -> SearchStats | None:
+    """Return the rollup statistics for a search, or None if the rollups cannot answer it exactly.
+
+    Minimum experience must fall on an experience bucket boundary and maximum price on a
+    price bucket edge; anything else needs a query over the sitter table.
+    """
+    min_experience = min_experience or 0
+    if min_experience not in EXPERIENCE_BUCKETS:
+        return None
+    if max_price and max_price not in PRICE_BUCKETS[1:]:
+        return None
+
+    city_key = normalize_city(city) if city else ALL_CITIES
+    query = PriceRollup.query.filter(
+        PriceRollup.city_key == city_key,
+        PriceRollup.experience_bucket >= EXPERIENCE_BUCKETS.index(min_experience),
+    )
+    if max_price:
+        query = query.filter(PriceRollup.price_bucket < PRICE_BUCKETS.index(max_price))
+    return SearchStats(query.all())
+
+
+def _bucket_min(connection, city_key: str, exp_b: int, price_b: int) -> float | None:
+    query = (
+        db.select(func.min(SitterProfile.hourly_rate))
+        .join(User, SitterProfile.user_id == User.id)
+        .where(SitterProfile.experience_years >= EXPERIENCE_BUCKETS[exp_b])
+    )
+    if price_b > 0:
+        query = query.where(SitterProfile.hourly_rate > PRICE_BUCKETS[price_b])
+    if price_b + 1 < len(PRICE_BUCKETS):
+        query = query.where(SitterProfile.hourly_rate <= PRICE_BUCKETS[price_b + 1])
+    if exp_b + 1 < len(EXPERIENCE_BUCKETS):
+        query = query.where(SitterProfile.experience_years < EXPERIENCE_BUCKETS[exp_b + 1])
+    if city_key != ALL_CITIES:
+        query = query.where(User.city_normalized == city_key)
+    return connection.execute(query).scalar()
+
+
+def _apply(connection, city: str | None, years: int | None, rate: float, sign: int) -> None:
+    exp_b, price_b = experience_bucket(years), price_bucket(rate)
+    for city_key in {city or '', ALL_CITIES}:
+        key = (PriceRollup.city_key == city_key, PriceRollup.experience_bucket == exp_b,
+               PriceRollup.price_bucket == price_b)
+        values = {'count': PriceRollup.count + sign, 'rate_sum': PriceRollup.rate_sum + sign * rate}
+        if sign > 0:
+            values['min_rate'] = case(
+                ((PriceRollup.min_rate.is_(None)) | (PriceRollup.min_rate > rate), rate),
+                else_=PriceRollup.min_rate,
+            )
+        updated = connection.execute(db.update(PriceRollup).where(*key).values(**values))
+
+        if updated.rowcount == 0 and sign > 0:
+            connection.execute(db.insert(PriceRollup).values(
+                city_key=city_key, experience_bucket=exp_b, price_bucket=price_b,
+                count=1, rate_sum=rate, min_rate=rate))
+        elif sign < 0:
+            connection.execute(db.update(PriceRollup).where(*key).values(
+                min_rate=_bucket_min(connection, city_key, exp_b, price_b)))
+
+
+def _old_value(state, attr: str):
+    history = state.attrs[attr].history
+    if history.deleted:
+        return history.deleted[0]
+    return getattr(state.obj(), attr)
+
+
+def _track_changes(session, flush_context) -> None:
+    if session.info.get('skip_rollups'):
+        return
+
+    changes = []
+    for obj in session.new:
+        if isinstance(obj, SitterProfile) and obj.hourly_rate is not None:
+            city = obj.user.city_normalized if obj.user else None
+            changes.append((city, obj.experience_years, obj.hourly_rate, 1))
+
+    for obj in session.deleted:
+        if isinstance(obj, SitterProfile):
+            state = inspect(obj)
+            city = obj.user.city_normalized if obj.user else None
+            changes.append((city, _old_value(state, 'experience_years'), _old_value(state, 'hourly_rate'), -1))
+
+    for obj in session.dirty:
+        state = inspect(obj)
+        if isinstance(obj, SitterProfile) and obj not in session.deleted:
+            old_rate, old_exp = _old_value(state, 'hourly_rate'), _old_value(state, 'experience_years')
+            if (old_rate, old_exp) != (obj.hourly_rate, obj.experience_years) and obj.user is not None:
+                changes.append((obj.user.city_normalized, old_exp, old_rate, -1))
+                changes.append((obj.user.city_normalized, obj.experience_years, obj.hourly_rate, 1))
+        elif isinstance(obj, User) and obj.user_type == 'sitter' and obj.sitter_profile is not None:
+            old_city = _old_value(state, 'city_normalized')
+            profile = obj.sitter_profile
+            if old_city != obj.city_normalized and profile not in session.new:
+                changes.append((old_city, profile.experience_years, profile.hourly_rate, -1))
+                changes.append((obj.city_normalized, profile.experience_years, profile.hourly_rate, 1))
+
+    if changes:
+        connection = session.connection()
+        for city, years, rate, sign in changes:
+            _apply(connection, city, years, rate, sign)
+
+
+def rebuild_rollups() -> int:
+    """Recompute every rollup row from the sitter table; returns the number of sitters counted."""
+    db.session.execute(db.delete(PriceRollup))
+    rows = db.session.execute(
+        db.select(User.city_normalized, SitterProfile.experience_years, SitterProfile.hourly_rate)
+        .join(User, SitterProfile.user_id == User.id)
+    ).all()
+
+    totals = {}
+    for city, years, rate in rows:
+        for city_key in {city or '', ALL_CITIES}:
+            key = (city_key, experience_bucket(years), price_bucket(rate))
+            count, rate_sum, min_rate = totals.get(key, (0, 0.0, rate))
+            totals[key] = (count + 1, rate_sum + rate, min(min_rate, rate))
+
+    db.session.add_all(
+        PriceRollup(city_key=c, experience_bucket=e, price_bucket=p, count=n, rate_sum=total, min_rate=low)
+        for (c, e, p), (n, total, low) in totals.items()
+    )
+    return len(rows)
+
+
+def init_rollup_tracking() -> None:
+    """Keep the rollups in step with every flush that inserts, updates or deletes sitters."""
+    if not event.contains(db.session, 'after_flush', _track_changes):
+        event.listen(db.session, 'after_flush', _track_changes)
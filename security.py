@@ -0,0 +1,162 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app, has_app_context
+from werkzeug.security import check_password_hash, generate_password_hash
+
+DEFAULT_HASH_METHOD = 'scrypt'
+
+
+class TokenBucketLimiter:
+    """In-memory token buckets keyed by e.g. client IP or email.
+
+    Each key holds up to `capacity` tokens and regains `refill_per_second` of them continuously;
+    an attempt spends one token. The least recently used keys are dropped beyond `max_keys`.
+    """
+
+    def __init__(self, capacity: float, refill_per_second: float, max_keys: int = 10000,
+                 clock=time.monotonic) -> None:
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.max_keys = max_keys
+        self.clock = clock
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _take(self, key: str, cost: int) -> float:
+        now = self.clock()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - updated) * self.refill_per_second)
+            if tokens >= 1:
+                tokens -= cost
+                wait = 0.0
+            else:
+                wait = (1 - tokens) / self.refill_per_second
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def hit(self, key: str) -> float:
+        """Spend a token for `key`; return 0 if allowed, else the seconds until a token is available."""
+        return self._take(key, 1)
+
+    def retry_after(self, key: str) -> float:
+        """Like hit(), but without spending a token."""
+        return self._take(key, 0)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+
+class VerifierBusy(Exception):
+    """Raised when too many password checks are already waiting for a worker."""
+
+
+class PasswordVerifier:
+    """Run password checks on a small thread pool so a burst of logins cannot occupy every core.
+
+    hashlib's KDFs release the GIL, so `workers` bounds how many run at once; beyond
+    `max_pending` queued checks new logins are turned away instead of waiting.
+    """
+
+    def __init__(self, workers: int = 2, max_pending: int = 32) -> None:
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def _submit(self, password_hash: str, password: str):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise VerifierBusy()
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='password')
+            self._pending += 1
+        future = self._executor.submit(check_password_hash, password_hash, password)
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future) -> None:
+        with self._lock:
+            self._pending -= 1
+
+    def verify(self, password_hash: str, password: str) -> bool:
+        return self._submit(password_hash, password).result()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+def hash_method() -> str:
+    """Return the configured werkzeug hash method, e.g. 'scrypt' or 'pbkdf2:sha256:600000'."""
+    if has_app_context():
+        return current_app.config.get('PASSWORD_HASH_METHOD', DEFAULT_HASH_METHOD)
+    return DEFAULT_HASH_METHOD
+
+
+def hash_password(password: str) -> str:
+    return generate_password_hash(password, method=hash_method())
+
+
+_method_prefixes: dict[str, str] = {}
+
+
+def needs_rehash(password_hash: str) -> bool:
+    """Tell whether a stored hash was made with other parameters than the configured method."""
+    method = hash_method()
+    prefix = _method_prefixes.get(method)
+    if prefix is None:
+        # Let werkzeug fill in the default parameters of a bare method name ('scrypt' -> 'scrypt:32768:8:1').
+        prefix = _method_prefixes[method] = generate_password_hash('', method=method).split('$', 1)[0]
+    return password_hash.split('$', 1)[0] != prefix
+
+
+def verify_password(password_hash: str, password: str) -> bool:
+    """Check a password on the application's verifier pool, or inline outside an app context."""
+    if not password_hash or password is None:
+        return False
+    if has_app_context() and 'password_verifier' in current_app.extensions:
+        return current_app.extensions['password_verifier'].verify(password_hash, password)
+    return check_password_hash(password_hash, password)
+
+
+def init_security(app) -> None:
+    """Set up the password verifier pool and the per-IP and per-email login limiters."""
+    app.extensions['password_verifier'] = PasswordVerifier(
+        workers=app.config['PASSWORD_VERIFY_WORKERS'],
+        max_pending=app.config['PASSWORD_VERIFY_MAX_PENDING'],
+    )
+    app.extensions['login_limiters'] = {
+        'ip': TokenBucketLimiter(app.config['LOGIN_IP_BURST'], app.config['LOGIN_IP_PER_MINUTE'] / 60),
+        'email': TokenBucketLimiter(app.config['LOGIN_EMAIL_BURST'], app.config['LOGIN_EMAIL_PER_MINUTE'] / 60),
+    }
+
+
+def login_retry_after(ip: str | None, email: str | None) -> float:
+    """Spend a login attempt for the client IP; return seconds to wait if it or the email is exhausted.
+
+    The email's allowance is only spent by record_failed_login, so a user who types the right
+    password is never locked out by their own successful logins.
+    """
+    if not current_app.config['LOGIN_RATE_LIMIT_ENABLED']:
+        return 0.0
+    limiters = current_app.extensions['login_limiters']
+    wait = limiters['ip'].hit(ip or 'unknown')
+    if wait or not email:
+        return wait
+    return limiters['email'].retry_after(email.strip().lower())
+
+
+def record_failed_login(email: str | None) -> None:
+    """Spend a token of the email's allowance after a wrong password."""
+    if current_app.config['LOGIN_RATE_LIMIT_ENABLED'] and email:
+        current_app.extensions['login_limiters']['email'].hit(email.strip().lower())
@@ -0,0 +1,91 @@
+from urllib.parse import urlencode
+
+from flask import current_app, has_app_context
+from sqlalchemy import event
+
+from cache import FileCacheBackend, LRUCache
+from models import db, User, SitterProfile, Review, Booking
+
+
+class SitterCaches:
+    """Rendered pages and sitter cards of one application.
+
+    Index pages for anonymous visitors are keyed on the normalized query string, sitter
+    cards on the sitter's user id. A commit invalidates only this application's entries;
+    the TTLs bound how stale another worker's copies can get.
+    """
+
+    def __init__(self, page_size: int = 512, page_ttl: float = 60, fragment_size: int = 4096,
+                 fragment_ttl: float = 60, directory: str | None = None) -> None:
+        self.pages = LRUCache(maxsize=page_size, ttl=page_ttl,
+                              backend=FileCacheBackend(directory) if directory else None)
+        self.fragments = LRUCache(maxsize=fragment_size, ttl=fragment_ttl)
+
+    def invalidate(self, sitter_ids) -> None:
+        """Drop the cached cards of the given sitters and every cached page."""
+        for sitter_id in sitter_ids:
+            self.fragments.delete(sitter_id)
+        self.pages.clear()
+
+    def clear(self) -> None:
+        self.pages.clear()
+        self.fragments.clear()
+
+
+def init_sitter_cache(app) -> SitterCaches:
+    """Create the app's page and card caches from the PAGE_CACHE_* and FRAGMENT_CACHE_* settings."""
+    caches = SitterCaches(page_size=app.config['PAGE_CACHE_SIZE'], page_ttl=app.config['PAGE_CACHE_TTL'],
+                          fragment_size=app.config['FRAGMENT_CACHE_SIZE'],
+                          fragment_ttl=app.config['FRAGMENT_CACHE_TTL'], directory=app.config['PAGE_CACHE_DIR'])
+    app.extensions['sitter_cache'] = caches
+    return caches
+
+
+def sitter_caches() -> SitterCaches:
+    return current_app.extensions['sitter_cache']
+
+
+def page_key(args) -> str:
+    """Normalize query arguments so equivalent searches share one cache entry."""
+    items = []
+    for name, value in args.items(multi=True):
+        value = value.strip()
+        if name == 'city':
+            value = value.lower()
+        if value:
+            items.append((name, value))
+    return urlencode(sorted(items))
+
+
+def _collect_changes(session, flush_context) -> None:
+    stale = session.info.setdefault('stale_sitters', set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, SitterProfile):
+            stale.add(obj.user_id)
+        elif isinstance(obj, User) and obj.user_type == 'sitter':
+            stale.add(obj.id)
+        elif isinstance(obj, Review):
+            stale.add(obj.sitter_id)
+        elif isinstance(obj, Booking):
+            session.info['stale_pages'] = True
+
+
+def _apply_invalidation(session) -> None:
+    stale = session.info.pop('stale_sitters', set())
+    stale_pages = session.info.pop('stale_pages', False)
+    if (stale or stale_pages) and has_app_context() and 'sitter_cache' in current_app.extensions:
+        sitter_caches().invalidate(stale - {None})
+
+
+def _discard_changes(session, previous_transaction) -> None:
+    session.info.pop('stale_sitters', None)
+    session.info.pop('stale_pages', None)
+
+
+def init_cache_invalidation() -> None:
+    """Invalidate cached pages and cards after any commit that touches sitters, reviews or bookings."""
+    if event.contains(db.session, 'after_flush', _collect_changes):
+        return
+    event.listen(db.session, 'after_flush', _collect_changes)
+    event.listen(db.session, 'after_commit', _apply_invalidation)
+    event.listen(db.session, 'after_soft_rollback', _discard_changes)
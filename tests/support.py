@@ -0,0 +1,14 @@
+import tempfile
+
+from app import create_app
+
+# Directories of the apps created below, kept alive until the test run exits.
+_DATABASE_DIRS = []
+
+
+def make_test_app(**config):
+    """Create a testing app on its own SQLite file in a temporary directory; `config` overrides settings."""
+    database_dir = tempfile.TemporaryDirectory()
+    _DATABASE_DIRS.append(database_dir)
+    return create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': f'sqlite:///{database_dir.name}/test.db',
+                       **config})
@@ -0,0 +1,210 @@
+import asyncio
+import datetime
+import gzip
+import importlib.util
+import json
+import unittest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app import db
+from models import User, SitterProfile, ParentProfile, Booking
+from outbox import publish
+from tests.support import make_test_app
+
+app = make_test_app()
+
+SITTERS = [
+    # name, bio, rate, years, lat, lng
+    ('Anna', 'Loves toddlers', 12, 5, 42.70, 23.32),
+    ('Boris', 'Nurse, first aid certified', 20, 2, 42.66, 23.31),
+    ('Vera', 'Helps with homework', 15, 8, 42.69, 23.35),
+]
+
+
+class TestApi(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.ctx = app.app_context()
+        self.ctx.push()
+        db.create_all()
+        self.tomorrow = (datetime.datetime.now() + datetime.timedelta(days=1)).replace(
+            hour=10, minute=0, second=0, microsecond=0)
+        for i, (name, bio, rate, years, lat, lng) in enumerate(SITTERS):
+            user = User(email=f'sitter{i}@test.com', user_type='sitter', city='София', address='София',
+                        lat=lat, lng=lng)
+            user.set_password('secret')
+            db.session.add(SitterProfile(user=user, name=name, bio=bio, phone_number='1', hourly_rate=rate,
+                                         experience_years=years))
+        parent = User(email='parent@test.com', user_type='parent', city='София', address='София')
+        parent.set_password('secret')
+        db.session.add(ParentProfile(user=parent, name='Parent', phone_number='1'))
+        db.session.commit()
+        self.parent_id = parent.id
+        self.sitter_id = User.query.filter_by(email='sitter0@test.com').one().id
+        self.client = app.test_client()
+
+    def tearDown(self) -> None:
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def login(self, email: str) -> None:
+        response = self.client.post('/api/v1/session', json={'email': email, 'password': 'secret'})
+        self.assertEqual(response.status_code, 200)
+
+    def slot(self, hours: int = 0) -> dict:
+        start = self.tomorrow + datetime.timedelta(hours=hours)
+        return {'sitter_id': self.sitter_id, 'start_time': start.isoformat(),
+                'end_time': (start + datetime.timedelta(hours=2)).isoformat()}
+
+    def test_sitter_search(self) -> None:
+        """Tests the filters, sort orders and cursors of the sitter search, and that it selects only listed columns."""
+        statements = []
+
+        def record(conn, cursor, statement, *args) -> None:
+            statements.append(statement)
+
+        event.listen(Engine, 'before_cursor_execute', record)
+        try:
+            page = self.client.get('/api/v1/sitters?sort=experience&per_page=2').get_json()
+        finally:
+            event.remove(Engine, 'before_cursor_execute', record)
+        self.assertEqual([item['name'] for item in page['items']], ['Vera', 'Anna'])
+        self.assertNotIn('bio', page['items'][0])
+        self.assertFalse([s for s in statements if 'sitter_profile.bio' in s or 'user.address' in s])
+
+        rest = self.client.get(f"/api/v1/sitters?sort=experience&per_page=2&cursor={page['next_cursor']}")
+        self.assertEqual([item['name'] for item in rest.get_json()['items']], ['Boris'])
+        self.assertIsNone(rest.get_json()['next_cursor'])
+
+        nearest = self.client.get('/api/v1/sitters?lat=42.66&lng=23.31').get_json()['items']
+        self.assertEqual(nearest[0]['name'], 'Boris')
+        self.assertEqual(nearest[0]['distance_km'], 0.0)
+        cheap = self.client.get('/api/v1/sitters?max_price=15&sort=best&lat=42.66&lng=23.31').get_json()
+        self.assertEqual(sorted(item['name'] for item in cheap['items']), ['Anna', 'Vera'])
+        found = self.client.get('/api/v1/sitters?q=toddler').get_json()['items']
+        self.assertEqual([item['id'] for item in found], [self.sitter_id])
+
+    def test_non_finite_numbers_are_ignored(self) -> None:
+        """Tests that inf and nan prices and coordinates are treated as missing on the API and the home page."""
+        for query in ('max_price=nan', 'max_price=inf&sort=best', 'lat=nan&lng=23.31', 'lat=42.66&lng=-inf&sort=best'):
+            response = self.client.get(f'/api/v1/sitters?{query}')
+            self.assertEqual(response.status_code, 200, query)
+            self.assertEqual(len(response.get_json()['items']), 3, query)
+            self.assertNotIn('distance_km', response.get_json()['items'][0], query)
+        html = self.client.get('/?max_price=nan').get_data(as_text=True)
+        self.assertEqual(html.count('Book Now'), 3)
+
+    def test_conditional_get_and_gzip(self) -> None:
+        """Tests weak ETags with 304 answers, private revalidation and gzip only for large bodies."""
+        app.config['API_GZIP_MIN_BYTES'] = 300
+        try:
+            response = self.client.get('/api/v1/sitters', headers={'Accept-Encoding': 'gzip'})
+            small = self.client.get('/api/v1/sitters?per_page=1', headers={'Accept-Encoding': 'gzip'})
+        finally:
+            app.config['API_GZIP_MIN_BYTES'] = 500
+        etag = response.headers['ETag']
+        self.assertTrue(etag.startswith('W/'))
+        self.assertIn('private', response.headers['Cache-Control'])
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(len(json.loads(gzip.decompress(response.data))['items']), 3)
+        self.assertNotIn('Content-Encoding', small.headers)
+        self.assertEqual(self.client.get('/api/v1/sitters').headers['ETag'], etag)
+
+        self.assertEqual(self.client.get('/api/v1/sitters', headers={'If-None-Match': etag}).status_code, 304)
+        db.session.get(SitterProfile, 1).hourly_rate = 11
+        db.session.commit()
+        changed = self.client.get('/api/v1/sitters', headers={'If-None-Match': etag})
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed.headers['ETag'], etag)
+
+    def test_booking_lifecycle(self) -> None:
+        """Tests requesting, listing, confirming and cancelling a booking, with the error statuses."""
+        unauthorized = self.client.get('/api/v1/bookings')
+        self.assertEqual(unauthorized.status_code, 401)
+        self.assertIn('error', unauthorized.get_json())
+        wrong = self.client.post('/api/v1/session', json={'email': 'parent@test.com', 'password': 'nope'})
+        self.assertEqual(wrong.status_code, 401)
+
+        self.login('parent@test.com')
+        created = self.client.post('/api/v1/bookings', json=self.slot())
+        self.assertEqual(created.status_code, 201)
+        booking = created.get_json()
+        self.assertEqual(created.headers['Location'], f"/api/v1/bookings/{booking['id']}")
+        self.assertEqual((booking['status'], booking['sitter']['name']), ('Pending', 'Anna'))
+        self.assertEqual(self.client.post('/api/v1/bookings', json=self.slot(1)).status_code, 409)
+        self.assertEqual(self.client.post('/api/v1/bookings', json={**self.slot(), 'sitter_id': 'x'}).status_code,
+                         400)
+        past = self.client.post('/api/v1/bookings', json=self.slot(-72))
+        self.assertEqual((past.status_code, past.get_json()['error']),
+                         (422, "You cannot book a sitter for a past date or time!"))
+        self.assertEqual(self.client.post('/api/v1/bookings', json={**self.slot(), 'sitter_id': self.parent_id})
+                         .status_code, 404)
+
+        self.login('sitter0@test.com')
+        self.assertEqual(self.client.post('/api/v1/bookings', json=self.slot(5)).status_code, 403)
+        listed = self.client.get('/api/v1/bookings').get_json()
+        self.assertEqual([(item['id'], item['parent']['id']) for item in listed['items']],
+                         [(booking['id'], self.parent_id)])
+        url = f"/api/v1/bookings/{booking['id']}"
+        self.assertEqual(self.client.patch(url, json={'action': 'confirm'}).get_json()['status'], 'Confirmed')
+        self.assertEqual(self.client.patch(url, json={'action': 'confirm'}).status_code, 409)
+        self.assertEqual(self.client.delete(url).status_code, 403)
+
+        self.login('parent@test.com')
+        self.assertEqual(self.client.delete(url).get_json()['status'], 'Cancelled')
+        self.assertEqual(self.client.delete(url).status_code, 409)
+        self.assertEqual(self.client.get('/api/v1/bookings').get_json()['items'], [])
+        history = self.client.get('/api/v1/bookings?view=history').get_json()['items']
+        self.assertEqual([item['status'] for item in history], ['Cancelled'])
+        self.assertEqual(self.client.get('/api/v1/bookings/999').status_code, 404)
+        self.assertEqual(self.client.delete('/api/v1/session').status_code, 204)
+        self.assertEqual(self.client.get(url).status_code, 401)
+
+    @unittest.skipUnless(importlib.util.find_spec('asgiref'), "asgiref is not installed")
+    def test_asgi_application(self) -> None:
+        """Tests the ASGI wrapper: API calls through WsgiToAsgi and a native, authenticated /events stream."""
+        from asgi import make_application
+        application = make_application(app)
+        self.login('parent@test.com')
+        cookie = f"session={self.client.get_cookie('session').value}".encode()
+        booking = Booking(parent_id=self.parent_id, sitter_id=self.sitter_id, start_time=self.tomorrow,
+                          end_time=self.tomorrow + datetime.timedelta(hours=2))
+        db.session.add(booking)
+        db.session.flush()
+        publish('booking_confirmed', booking, self.parent_id)
+        db.session.commit()
+
+        async def call(path: str, headers: list) -> tuple[int, bytes]:
+            sent, requests = [], [{'type': 'http.request', 'body': b''}]
+
+            async def receive() -> dict:
+                if requests:
+                    return requests.pop()
+                await asyncio.sleep(3600)
+
+            async def send(message: dict) -> None:
+                sent.append(message)
+
+            scope = {'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+                     'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': b'',
+                     'root_path': '', 'headers': headers, 'client': ('127.0.0.1', 5000),
+                     'server': ('localhost', 80)}
+            await application(scope, receive, send)
+            return sent[0]['status'], b''.join(m.get('body', b'') for m in sent[1:])
+
+        app.config['OUTBOX_SSE_MAX_SECONDS'] = 0
+        try:
+            status, body = asyncio.run(call('/api/v1/sitters', []))
+            self.assertEqual((status, len(json.loads(body)['items'])), (200, 3))
+            status, body = asyncio.run(call('/events', [(b'cookie', cookie), (b'last-event-id', b'0')]))
+            self.assertEqual(status, 200)
+            self.assertIn(b'was confirmed', body)
+            self.assertEqual(asyncio.run(call('/events', []))[0], 401)
+        finally:
+            app.config['OUTBOX_SSE_MAX_SECONDS'] = 300
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,11 +1,11 @@
 import unittest
-from app import app, db
+from app import db
+from tests.support import make_test_app
+
+app = make_test_app(WTF_CSRF_ENABLED=False)
 
 class TestFlaskApp(unittest.TestCase):
     def setUp(self) -> None:
-        app.config['TESTING'] = True
-        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
-        app.config['WTF_CSRF_ENABLED'] = False
         self.client = app.test_client()
         
         with app.app_context():
@@ -50,36 +50,30 @@ class TestFlaskApp(unittest.TestCase):
         
     def test_app_index(self) -> None:
         """Tests whether the index page loads through the Flask client."""
-        from app import app
         client = app.test_client()
         response = client.get('/')
         self.assertEqual(response.status_code, 200)
 
     def test_app_404(self) -> None:
         """Tests the 404 error handler."""
-        from app import app
         client = app.test_client()
         response = client.get('/non-existent-page')
         self.assertEqual(response.status_code, 404)
         
     def test_flask_index(self) -> None:
         """Tests whether the index page loads (status code 200)."""
-        from app import app
-        app.config['TESTING'] = True
         with app.test_client() as client:
             response = client.get('/')
             self.assertEqual(response.status_code, 200)
 
     def test_flask_login_get(self) -> None:
         """Tests access to the login page."""
-        from app import app
         with app.test_client() as client:
             response = client.get('/login')
             self.assertEqual(response.status_code, 200)
 
     def test_flask_404(self) -> None:
         """Tests whether the 404 handler works for a non-existent page."""
-        from app import app
         with app.test_client() as client:
             response = client.get('/non-existent-page')
             self.assertEqual(response.status_code, 404)
@@ -0,0 +1,100 @@
+import datetime
+import unittest
+from app import db
+from availability import find_conflicts, free_sitter_ids, is_sitter_free
+from models import User, SitterProfile, ParentProfile, Booking
+from queries import build_sitter_query
+from tests.support import make_test_app
+
+app = make_test_app()
+
+
+class TestAvailability(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.client = app.test_client()
+        self.ctx = app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+        self.day = (datetime.datetime.now() + datetime.timedelta(days=2)).replace(
+            hour=0, minute=0, second=0, microsecond=0)
+        parent = User(email='parent@test.com', user_type='parent', city='София', address='София')
+        parent.set_password('secret')
+        db.session.add(ParentProfile(user=parent, name='Ivan', phone_number='2'))
+        self.sitters = []
+        for i in range(3):
+            sitter = User(email=f's{i}@test.com', user_type='sitter', city='София', address='София')
+            sitter.set_password('secret')
+            db.session.add(SitterProfile(user=sitter, name=f'S{i}', phone_number='1', hourly_rate=10, bio=''))
+            self.sitters.append(sitter)
+        db.session.commit()
+        self.parent_id = parent.id
+
+        self.book(self.sitters[0].id, 10, 12, 'Confirmed')
+        self.book(self.sitters[1].id, 14, 16, 'Pending')
+        self.book(self.sitters[2].id, 10, 12, 'Cancelled')
+
+    def tearDown(self) -> None:
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def at(self, hour: int) -> datetime.datetime:
+        return self.day + datetime.timedelta(hours=hour)
+
+    def book(self, sitter_id: int, start: int, end: int, status: str = 'Pending') -> Booking:
+        booking = Booking(parent_id=self.parent_id, sitter_id=sitter_id, status=status,
+                          start_time=self.at(start), end_time=self.at(end))
+        db.session.add(booking)
+        db.session.commit()
+        return booking
+
+    def test_overlap_detection(self) -> None:
+        """Tests overlapping, touching and cancelled bookings."""
+        sitter_id = self.sitters[0].id
+        self.assertEqual(len(find_conflicts(sitter_id, self.at(11), self.at(13))), 1)
+        self.assertTrue(is_sitter_free(sitter_id, self.at(12), self.at(14)))
+        self.assertTrue(is_sitter_free(sitter_id, self.at(8), self.at(10)))
+        self.assertFalse(is_sitter_free(sitter_id, self.at(9), self.at(13)))
+        self.assertTrue(is_sitter_free(self.sitters[2].id, self.at(10), self.at(12)))
+
+    def test_bulk_free_query(self) -> None:
+        """Tests the bulk availability check for a window."""
+        ids = [s.id for s in self.sitters]
+        self.assertEqual(free_sitter_ids(ids, self.at(11), self.at(15)), {self.sitters[2].id})
+        self.assertEqual(free_sitter_ids(ids, self.at(12), self.at(14)), set(ids))
+
+    def test_homepage_filter_by_availability(self) -> None:
+        """Tests that the sitter query can keep only sitters free in a slot."""
+        free = build_sitter_query(available=(self.at(11), self.at(13))).all()
+        self.assertEqual(sorted(s.name for s in free), ['S1', 'S2'])
+
+        start = self.at(11).strftime('%Y-%m-%dT%H:%M')
+        end = self.at(15).strftime('%Y-%m-%dT%H:%M')
+        response = self.client.get(f'/?sort=rating&available_from={start}&available_to={end}')
+        self.assertIn(b'Found: 1 sitters', response.data)
+
+    def test_booking_route_rejects_overlap(self) -> None:
+        """Tests that a parent cannot request a slot the sitter already holds."""
+        self.client.post('/login', data={'email': 'parent@test.com', 'password': 'secret'})
+        form = {'start_time': self.at(11).strftime('%Y-%m-%dT%H:%M'),
+                'end_time': self.at(13).strftime('%Y-%m-%dT%H:%M')}
+
+        response = self.client.post(f'/book/{self.sitters[0].id}', data=form)
+        self.assertIn(b'already booked', response.data)
+        self.client.post(f'/book/{self.sitters[2].id}', data=form)
+        self.assertEqual(Booking.query.filter_by(sitter_id=self.sitters[0].id).count(), 1)
+        self.assertEqual(Booking.query.filter_by(sitter_id=self.sitters[2].id).count(), 2)
+
+    def test_confirm_rejects_overlap(self) -> None:
+        """Tests that a sitter cannot confirm a request overlapping a confirmed booking."""
+        legacy = self.book(self.sitters[0].id, 11, 13, 'Pending')
+        self.client.post('/login', data={'email': 's0@test.com', 'password': 'secret'})
+        self.client.get(f'/booking/action/{legacy.id}/confirm')
+        db.session.expire_all()
+        self.assertEqual(db.session.get(Booking, legacy.id).status, 'Pending')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+from app import db
+from availability import find_conflicts
+from benchmarks.datagen import BENCHMARK_PASSWORD, BOOKING_STATUSES, generate
+from booking_stats import COUNTED_STATUSES
+from models import User, SitterProfile, Booking
+from search_stats import search_stats
+from tests.support import make_test_app
+
+app = make_test_app()
+
+
+class TestDataGenerator(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.ctx = app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+    def tearDown(self) -> None:
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def snapshot(self) -> list:
+        return [(u.email, u.city, u.lat, u.lng, u.grid_lat, u.city_normalized)
+                for u in User.query.order_by(User.id)]
+
+    def test_generator_is_reproducible(self) -> None:
+        """Tests that the same seed generates the same users and derived columns."""
+        generate(30, 10, 60, seed=7)
+        first = self.snapshot()
+        db.drop_all()
+        db.create_all()
+        generate(30, 10, 60, seed=7)
+
+        self.assertEqual(self.snapshot(), first)
+        self.assertEqual(SitterProfile.query.count(), 30)
+        self.assertEqual(Booking.query.count(), 60)
+        user = User.query.first()
+        self.assertTrue(user.check_password(BENCHMARK_PASSWORD))
+
+    def test_generated_data_is_consistent(self) -> None:
+        """Tests that generated bookings use the app's statuses, never overlap and rollups cover every sitter."""
+        generate(10, 5, 40, seed=3)
+
+        self.assertLessEqual(set(BOOKING_STATUSES), set(COUNTED_STATUSES))
+        for booking in Booking.query.all():
+            self.assertEqual(find_conflicts(booking.sitter_id, booking.start_time, booking.end_time,
+                                            exclude_id=booking.id, statuses=tuple(COUNTED_STATUSES)), [])
+        self.assertEqual(search_stats(None, 0, None).count, 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,164 @@
+import datetime
+import unittest
+from sqlalchemy import event
+from app import db
+from booking_stats import booking_counts, move_counts, rebuild_booking_counters
+from migrations import upgrade
+from models import User, SitterProfile, ParentProfile, Booking, BookingCounter
+from tests.support import make_test_app
+
+app = make_test_app()
+
+
+class TestBookingCounters(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.ctx = app.app_context()
+        self.ctx.push()
+        db.create_all()
+        self.tomorrow = (datetime.datetime.now() + datetime.timedelta(days=1)).replace(
+            hour=0, minute=0, second=0, microsecond=0)
+        for user_type, profile in (('parent', ParentProfile), ('sitter', SitterProfile)):
+            user = User(email=f'{user_type}@test.com', user_type=user_type, city='София', address='София')
+            user.set_password('secret')
+            extra = {'hourly_rate': 10} if profile is SitterProfile else {}
+            db.session.add(profile(user=user, name=user_type.title(), phone_number='1', **extra))
+        db.session.commit()
+        self.parent_id = User.query.filter_by(user_type='parent').one().id
+        self.sitter_id = User.query.filter_by(user_type='sitter').one().id
+
+    def tearDown(self) -> None:
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def counts(self, user_id: int) -> dict:
+        db.session.remove()  # start a new transaction that sees the requests' commits
+        counts = booking_counts(user_id)
+        return {'pending': counts.pending, 'confirmed': counts.confirmed,
+                'completed': counts.completed, 'cancelled': counts.cancelled}
+
+    def login(self, user_type: str, client=None):
+        client = client or app.test_client()
+        client.post('/login', data={'email': f'{user_type}@test.com', 'password': 'secret'})
+        return client
+
+    def add_booking(self, day_offset: int, status: str = 'Pending') -> Booking:
+        start = self.tomorrow + datetime.timedelta(days=day_offset, hours=10)
+        booking = Booking(parent_id=self.parent_id, sitter_id=self.sitter_id, status=status,
+                          start_time=start, end_time=start + datetime.timedelta(hours=2))
+        db.session.add(booking)
+        db.session.commit()
+        return booking
+
+    def test_routes_keep_counters_in_step(self) -> None:
+        """Tests booking, confirming, declining, cancelling and rating against a full recount."""
+        client = self.login('parent')
+        for day in (0, 1, 2):
+            start = self.tomorrow + datetime.timedelta(days=day, hours=10)
+            client.post(f'/book/{self.sitter_id}', data={
+                'start_time': start.strftime('%Y-%m-%dT%H:%M'),
+                'end_time': (start + datetime.timedelta(hours=2)).strftime('%Y-%m-%dT%H:%M')})
+        db.session.remove()
+        first, second, third = Booking.query.order_by(Booking.start_time).all()
+        self.assertEqual(self.counts(self.sitter_id), {'pending': 3, 'confirmed': 0, 'completed': 0, 'cancelled': 0})
+
+        self.login('sitter', client)
+        client.get(f'/booking/action/{first.id}/confirm')
+        client.get(f'/booking/action/{second.id}/decline')
+        self.login('parent', client)
+        client.get(f'/booking/cancel/{third.id}')
+        db.session.execute(db.update(Booking).where(Booking.id == first.id).values(
+            start_time=self.tomorrow - datetime.timedelta(days=2),
+            end_time=self.tomorrow - datetime.timedelta(days=1)))
+        db.session.commit()
+        client.post(f'/rate-sitter/{first.id}', data={'rating': '5'})
+
+        expected = {'pending': 0, 'confirmed': 0, 'completed': 1, 'cancelled': 2}
+        self.assertEqual(self.counts(self.parent_id), expected)
+        self.assertEqual(self.counts(self.sitter_id), expected)
+        rebuild_booking_counters()
+        db.session.commit()
+        self.assertEqual(self.counts(self.parent_id), expected)
+
+    def test_expired_and_deleted_bookings(self) -> None:
+        """Tests a status change on an expired instance and a deleted booking."""
+        booking = self.add_booking(0)
+        db.session.expire_all()
+        booking.status = 'Confirmed'
+        db.session.commit()
+        self.assertEqual(self.counts(self.parent_id)['confirmed'], 1)
+        self.assertEqual(self.counts(self.parent_id)['pending'], 0)
+
+        db.session.delete(booking)
+        db.session.commit()
+        self.assertEqual(set(self.counts(self.sitter_id).values()), {0})
+
+    def test_status_changes_race_the_sweep(self) -> None:
+        """Tests that a booking the sweep moves between a request's read and its update is counted once."""
+        answered = self.add_booking(0).id
+        cancelled = self.add_booking(1).id
+        rated = self.add_booking(-3, 'Confirmed').id
+        sweeps = []
+
+        def sweep_first(state) -> None:
+            if state.is_update and sweeps:
+                booking_id, old_status, new_status = sweeps.pop()
+                connection = state.session.connection()
+                connection.execute(db.update(Booking).where(Booking.id == booking_id).values(status=new_status))
+                move_counts(connection, [(self.parent_id, self.sitter_id)], old_status, new_status)
+
+        client = self.login('sitter')
+        event.listen(db.session, 'do_orm_execute', sweep_first)
+        try:
+            sweeps.append((answered, 'Pending', 'Expired'))
+            client.get(f'/booking/action/{answered}/confirm')
+            self.login('parent', client)
+            sweeps.append((cancelled, 'Pending', 'Expired'))
+            client.get(f'/booking/cancel/{cancelled}')
+            sweeps.append((rated, 'Confirmed', 'AwaitingRating'))
+            client.post(f'/rate-sitter/{rated}', data={'rating': '4'})
+        finally:
+            event.remove(db.session, 'do_orm_execute', sweep_first)
+
+        # The refused answer and cancellation roll back together with the sweep they raced.
+        db.session.remove()
+        self.assertEqual([b.status for b in Booking.query.order_by(Booking.id)], ['Pending', 'Pending', 'Completed'])
+        expected = {'pending': 2, 'confirmed': 0, 'completed': 1, 'cancelled': 0}
+        self.assertEqual(self.counts(self.sitter_id), expected)
+        self.assertEqual(booking_counts(self.parent_id).awaiting_rating, 0)
+        rebuild_booking_counters()
+        db.session.commit()
+        self.assertEqual(self.counts(self.sitter_id), expected)
+
+    def test_dashboard_loads_history_lazily(self) -> None:
+        """Tests that upcoming bookings are listed by default and the archive only on the history tab."""
+        self.add_booking(0, 'Confirmed')
+        self.add_booking(1, 'Pending')
+        self.add_booking(-5, 'Completed')
+        self.add_booking(-3, 'Cancelled')
+        client = self.login('parent')
+
+        html = client.get('/my-bookings').get_data(as_text=True)
+        self.assertIn('Upcoming <span class="badge bg-secondary">2</span>', html)
+        self.assertIn('History <span class="badge bg-secondary">2</span>', html)
+        self.assertNotIn('>\n                            Completed\n', html)
+        self.assertEqual(html.count('bi-telephone'), 2)
+
+        html = client.get('/my-bookings?view=history').get_data(as_text=True)
+        self.assertEqual(html.count('bi-telephone'), 2)
+        self.assertLess(html.index('Cancelled'), html.index('Completed & Rated'))
+
+    def test_migration_fills_the_counters(self) -> None:
+        """Tests that upgrading a database created before the counters counts its bookings."""
+        self.add_booking(0)
+        self.add_booking(1, 'Confirmed')
+        BookingCounter.__table__.drop(db.engine)
+        db.session.execute(db.text("DELETE FROM schema_version"))
+        db.session.commit()
+        upgrade()
+        self.assertEqual(self.counts(self.sitter_id), {'pending': 1, 'confirmed': 1, 'completed': 0, 'cancelled': 0})
+
+
+if __name__ == '__main__':
+    unittest.main()
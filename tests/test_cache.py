@@ -0,0 +1,122 @@
+import datetime
+import tempfile
+import time
+import unittest
+from werkzeug.datastructures import MultiDict
+from app import db
+from cache import FileCacheBackend, LRUCache
+from models import User, SitterProfile, ParentProfile, Booking, Review
+from sitter_cache import page_key
+from tests.support import make_test_app
+
+app = make_test_app()
+pages, fragments = app.extensions['sitter_cache'].pages, app.extensions['sitter_cache'].fragments
+
+
+class TestLRUCache(unittest.TestCase):
+
+    def test_lru_eviction_and_stats(self) -> None:
+        """Tests that the least recently used entry is evicted and statistics are tracked."""
+        cache = LRUCache(maxsize=2, ttl=60)
+        cache.set('a', 'x' * 100)
+        cache.set('b', 'y')
+        cache.get('a')
+        cache.set('c', 'z')
+
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 'x' * 100)
+        stats = cache.stats()
+        self.assertEqual((stats['entries'], stats['evictions'], stats['hits'], stats['misses']), (2, 1, 2, 1))
+        self.assertGreater(stats['bytes'], 100)
+
+    def test_ttl_expiry(self) -> None:
+        """Tests that entries expire after their TTL."""
+        cache = LRUCache(maxsize=10, ttl=0.01)
+        cache.set('a', 1)
+        time.sleep(0.02)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.stats()['bytes'], 0)
+
+    def test_file_backend_survives_new_cache(self) -> None:
+        """Tests that the optional file backend serves entries to a fresh in-process cache."""
+        with tempfile.TemporaryDirectory() as directory:
+            LRUCache(ttl=60, backend=FileCacheBackend(directory)).set('page', '<html>')
+            fresh = LRUCache(ttl=60, backend=FileCacheBackend(directory))
+            self.assertEqual(fresh.get('page'), '<html>')
+            fresh.clear()
+            self.assertIsNone(LRUCache(backend=FileCacheBackend(directory)).get('page'))
+
+    def test_page_key_normalization(self) -> None:
+        """Tests that equivalent filter query strings share a key."""
+        self.assertEqual(page_key(MultiDict([('city', ' София '), ('sort', 'rating'), ('max_price', '')])),
+                         page_key(MultiDict([('sort', 'rating'), ('city', 'софия')])))
+
+
+class TestIndexCaching(unittest.TestCase):
+
+    def setUp(self) -> None:
+        app.config['CACHE_ENABLED'] = True
+        app.extensions['sitter_cache'].clear()
+        self.client = app.test_client()
+        self.ctx = app.app_context()
+        self.ctx.push()
+        db.create_all()
+        self.add_sitter('maria@test.com', 'Maria', 12.0)
+
+    def tearDown(self) -> None:
+        app.config.pop('CACHE_ENABLED')
+        app.extensions['sitter_cache'].clear()
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def add_sitter(self, email: str, name: str, rate: float) -> SitterProfile:
+        user = User(email=email, user_type='sitter', city='София', address='София')
+        profile = SitterProfile(user=user, name=name, phone_number='1', hourly_rate=rate, bio='Hi')
+        db.session.add(profile)
+        db.session.commit()
+        return profile
+
+    def test_anonymous_index_is_served_from_cache(self) -> None:
+        """Tests that a repeated anonymous search is answered from the page cache."""
+        first = self.client.get('/?city=София')
+        second = self.client.get('/?city=%20софия')
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(pages.stats()['hits'], 1)
+        self.assertEqual(fragments.stats()['entries'], 1)
+
+    def test_new_sitter_invalidates_pages(self) -> None:
+        """Tests that registering a sitter drops cached pages."""
+        self.client.get('/')
+        self.add_sitter('ivana@test.com', 'Ivana', 10.0)
+        self.assertIn(b'Ivana', self.client.get('/').data)
+
+    def test_rate_change_invalidates_card(self) -> None:
+        """Tests that changing a sitter's rate drops their cached card."""
+        self.client.get('/')
+        profile = SitterProfile.query.one()
+        profile.hourly_rate = 21.5
+        db.session.commit()
+        self.assertIn(b'$21.5/hr', self.client.get('/').data)
+
+    def test_review_invalidates_card(self) -> None:
+        """Tests that a new review drops the sitter's cached card."""
+        self.client.get('/')
+        profile = SitterProfile.query.one()
+        parent = User(email='p@test.com', user_type='parent', city='София', address='София')
+        db.session.add(ParentProfile(user=parent, name='P', phone_number='2'))
+        booking = Booking(parent=parent, sitter_id=profile.user_id, start_time=datetime.datetime.now(), end_time=datetime.datetime.now())
+        db.session.add(booking)
+        db.session.commit()
+
+        self.client.get('/')
+        self.assertEqual(fragments.stats()['entries'], 1)
+        profile.rating = 4.0
+        db.session.add(Review(booking_id=booking.id, sitter_id=profile.user_id, parent_id=parent.id, rating=4))
+        db.session.commit()
+        self.assertEqual(fragments.stats()['entries'], 0)
+        self.assertIn('★ 4.0', self.client.get('/').data.decode())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import unittest
+from unittest import mock
+from app import db
+from catalog import bump_version, catalog_page
+from models import User, SitterProfile
+from queries import build_sitter_query, nearest_page, sitter_page
+from tests.support import make_test_app
+
+app = make_test_app()
+
+FILTERS = [
+    {},
+    {'city': 'софия'},
+    {'city': 'Пловдив', 'max_price': 14},
+    {'max_price': 12, 'min_experience': 2},
+]
+
+
+class TestSitterCatalog(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.ctx = app.app_context()
+        self.ctx.push()
+        db.create_all()
+        for i in range(30):
+            city, lat = ('София', 42.69) if i % 3 else ('Пловдив', 42.14)
+            user = User(email=f's{i}@test.com', user_type='sitter', city=city, address=city,
+                        lat=lat + (i % 7) / 50, lng=23.32 + (i % 5) / 20,
+                        geocode_status='pending' if i == 4 else 'resolved')
+            db.session.add(SitterProfile(user=user, name=f'S{i}', phone_number='1', hourly_rate=10 + i % 6,
+                                         experience_years=i % 4, rating=float(i % 5)))
+        db.session.commit()
+        self.catalog = app.extensions['sitter_catalog']
+        self.catalog.refresh(db.session)
+
+    def tearDown(self) -> None:
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def walk(self, fetch) -> list:
+        ids, cursor = [], None
+        while True:
+            page = fetch(cursor)
+            ids.extend((s.id, getattr(s, 'distance', None)) for s in page.items)
+            if not page.has_next:
+                return ids
+            cursor = page.next_cursor
+
+    def catalog_walk(self, order: str, origin=None, **filters) -> list:
+        return self.walk(lambda c: catalog_page(self.catalog, db.session, order, c, 4, origin, **filters))
+
+    def test_pages_match_sql_queries(self) -> None:
+        """Tests that catalog pages equal the SQL keyset pages for every ordering and filter."""
+        for filters in FILTERS:
+            for sort in ('rating', 'experience'):
+                expected = self.walk(lambda c: sitter_page(build_sitter_query(**filters), sort, c, 4))
+                self.assertEqual(self.catalog_walk(sort, **filters), expected)
+            expected = self.walk(lambda c: nearest_page(build_sitter_query(**filters), 42.69, 23.32, c, 4))
+            self.assertEqual(self.catalog_walk('distance', (42.69, 23.32), **filters), expected)
+
+    def test_distance_order_ends_with_unlocated_sitters(self) -> None:
+        """Tests that pending and failed geocodes follow the located sitters in id order, across pages."""
+        failed = SitterProfile.query.filter(SitterProfile.name.in_(['S9', 'S10'])).order_by(SitterProfile.id).all()
+        for sitter in failed:
+            sitter.user.geocode_status = 'failed'
+            sitter.user.lat = sitter.user.lng = None
+        db.session.commit()
+        self.catalog.refresh(db.session)
+        pending = SitterProfile.query.filter_by(name='S4').one()
+
+        walked = self.catalog_walk('distance', (42.69, 23.32))
+        self.assertEqual(len(walked), 30)
+        self.assertEqual(walked[-3:], [(pending.id, None)] + [(sitter.id, None) for sitter in failed])
+        self.assertEqual(walked, self.walk(lambda c: nearest_page(build_sitter_query(), 42.69, 23.32, c, 4)))
+
+    def test_commits_are_patched_in(self) -> None:
+        """Tests that changes committed in this process refresh the catalog without a full reload."""
+        sitter = SitterProfile.query.filter_by(name='S1').one()
+        sitter.rating = 9.0
+        removed = SitterProfile.query.filter_by(name='S2').one()
+        db.session.delete(removed)
+        user = User(email='new@test.com', user_type='sitter', city='София', address='София', lat=42.69, lng=23.32)
+        db.session.add(SitterProfile(user=user, name='New', phone_number='1', hourly_rate=5, rating=8.0))
+        db.session.commit()
+
+        with mock.patch.object(self.catalog, '_load', side_effect=AssertionError("full reload")):
+            self.catalog.refresh(db.session)
+        ranked = [profile_id for profile_id, _ in self.catalog.ranked('rating', 3)]
+        self.assertEqual(ranked[:2], [sitter.id, user.sitter_profile.id])
+        self.assertNotIn(removed.id, [p for p, _ in self.catalog.ranked('rating', 100)])
+        self.assertEqual(len(self.catalog), 30)
+
+    def test_unrelated_changes_keep_the_version(self) -> None:
+        """Tests that editing a field the catalog does not keep leaves its version alone."""
+        key = self.catalog.key
+        SitterProfile.query.filter_by(name='S1').one().bio = 'Updated'
+        db.session.commit()
+        self.catalog.refresh(db.session)
+        self.assertEqual(self.catalog.key, key)
+
+    def test_changes_from_other_processes_reload(self) -> None:
+        """Tests that a version bump the catalog did not see being made triggers a full reload."""
+        with db.engine.begin() as connection:
+            connection.execute(db.update(SitterProfile).values(hourly_rate=99))
+            bump_version(connection)
+        self.catalog.refresh(db.session)
+        self.assertEqual(self.catalog.ranked('rating', 100, max_price=50), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,203 @@
+import json
+import os
+import tempfile
+import unittest
+from datetime import datetime
+from unittest import mock
+import cli
+from app import db
+from models import User, SitterProfile, ParentProfile, Booking, PriceRollup
+from tests.support import make_test_app
+
+app = make_test_app()
+
+SITTERS_CSV = """email,password,name,phone,city,neighborhood,street,street_number,block,entrance,hourly_rate,experience,lat,lng
+a@test.com,secret,Ana,0888,София,Лозенец,Черни връх,10,,,15,3,42.67,23.32
+b@test.com,secret,Bobi,0888,София,Младост,,,12,А,22,6,42.64,23.37
+bad@test.com,secret,Bad,0888,София,Младост,Черни връх,,,,10,1,42.6,23.3
+a@test.com,secret,Dup,0888,София,Лозенец,Черни връх,10,,,15,3,42.67,23.32
+c@test.com,,NoPass,0888,Пловдив,Център,Главна,1,,,10,1,42.1,24.7
+d@test.com,secret,Deferred,0888,Пловдив,Център,Главна,1,,,10,1,,
+"""
+
+
+class TestDataCli(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.ctx = app.app_context()
+        self.ctx.push()
+        db.create_all()
+        self.runner = app.test_cli_runner()
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self.tmpdir.cleanup()
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def write(self, name: str, content: str) -> str:
+        path = os.path.join(self.tmpdir.name, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        return path
+
+    def test_import_reports_and_skips_invalid_rows(self) -> None:
+        """Tests that valid rows are imported while invalid and duplicate rows are reported."""
+        path = self.write('sitters.csv', SITTERS_CSV)
+        result = self.runner.invoke(args=['data', 'import', 'sitters', path, '--batch-size', '2',
+                                          '--defer-geocode'])
+
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn("Imported 3 sitters, skipped 3 invalid rows.", result.output)
+        self.assertIn("line 4:", result.output)
+        self.assertIn("line 5: email a@test.com already exists", result.output)
+        self.assertIn("line 6: password or password_hash is mandatory", result.output)
+
+        self.assertEqual(User.query.count(), 3)
+        deferred = User.query.filter_by(email='d@test.com').one()
+        self.assertEqual(deferred.geocode_status, 'pending')
+        self.assertIsNone(deferred.lat)
+        bobi = User.query.filter_by(email='b@test.com').one()
+        self.assertEqual(bobi.address, "Младост, блок 12, А, София")
+        self.assertTrue(bobi.check_password('secret'))
+
+    def test_import_rebuilds_rollups_once(self) -> None:
+        """Tests that the price rollups match the imported sitters after a bulk import."""
+        path = self.write('sitters.csv', SITTERS_CSV)
+        self.runner.invoke(args=['data', 'import', 'sitters', path, '--defer-geocode'])
+
+        total = sum(r.count for r in PriceRollup.query.all() if r.city_key == '*')
+        self.assertEqual(total, SitterProfile.query.count())
+
+    def test_import_skips_unreadable_jsonl_lines(self) -> None:
+        """Tests that invalid JSON and non-object lines mid-file are reported and the rollups still rebuilt."""
+        rows = [json.dumps({'email': f'{name}@test.com', 'password': 'secret', 'name': name, 'phone': '0888',
+                            'city': 'София', 'neighborhood': 'Лозенец', 'street': 'Черни връх',
+                            'street_number': '10', 'hourly_rate': 15, 'lat': 42.67, 'lng': 23.32})
+                for name in ('a', 'b', 'c')]
+        path = self.write('sitters.jsonl', '\n'.join([rows[0], rows[1], '{"email": ', '[1, 2]', rows[2]]) + '\n')
+        result = self.runner.invoke(args=['data', 'import', 'sitters', path, '--batch-size', '2'])
+
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn("Imported 3 sitters, skipped 2 invalid rows.", result.output)
+        self.assertIn("line 3: invalid JSON", result.output)
+        self.assertIn("line 4: expected a JSON object", result.output)
+        total = sum(r.count for r in PriceRollup.query.all() if r.city_key == '*')
+        self.assertEqual(total, 3)
+
+    def test_failed_import_still_rebuilds_rollups(self) -> None:
+        """Tests that batches committed before an unexpected error are counted in the rollups."""
+        path = self.write('sitters.csv', SITTERS_CSV)
+        build_user = cli.build_user
+        calls = []
+
+        def fail_in_second_batch(*args):
+            calls.append(args)
+            if len(calls) == 3:
+                raise RuntimeError("database went away")
+            return build_user(*args)
+
+        with mock.patch('cli.build_user', fail_in_second_batch):
+            result = self.runner.invoke(args=['data', 'import', 'sitters', path, '--batch-size', '2',
+                                              '--defer-geocode'])
+        self.assertIsInstance(result.exception, RuntimeError)
+        total = sum(r.count for r in PriceRollup.query.all() if r.city_key == '*')
+        self.assertEqual((total, SitterProfile.query.count()), (2, 2))
+
+    def test_import_derives_rating_sum_from_average(self) -> None:
+        """Tests that files without rating_sum get it from rating and reviews_count, and inconsistent totals fail."""
+        base = {'password': 'secret', 'phone': '0888', 'city': 'София', 'neighborhood': 'Лозенец',
+                'street': 'Черни връх', 'street_number': '10', 'hourly_rate': 15, 'lat': 42.67, 'lng': 23.32}
+        rows = [dict(base, email='a@test.com', name='a', rating=4.0, reviews_count=3),
+                dict(base, email='b@test.com', name='b', reviews_count=2, rating_sum=11)]
+        path = self.write('sitters.jsonl', '\n'.join(json.dumps(row) for row in rows) + '\n')
+        result = self.runner.invoke(args=['data', 'import', 'sitters', path])
+
+        self.assertIn("Imported 1 sitters, skipped 1 invalid rows.", result.output)
+        self.assertIn("line 2: rating_sum must lie between 0 and 5 per review", result.output)
+        profile = User.query.filter_by(email='a@test.com').one().sitter_profile
+        self.assertEqual((profile.rating, profile.reviews_count, profile.rating_sum), (4.0, 3, 12.0))
+
+    def test_export_round_trips_through_import(self) -> None:
+        """Tests that exported sitters, parents and bookings import back unchanged."""
+        sitter = User(email='s@test.com', user_type='sitter', city='София', neighborhood='Център',
+                      block='5', address='Център, блок 5, София', lat=42.7, lng=23.3)
+        sitter.set_password('pw')
+        parent = User(email='p@test.com', user_type='parent', city='София', street='Витоша',
+                      street_number='1', address='Витоша 1, София', lat=42.6, lng=23.2)
+        parent.set_password('pw')
+        db.session.add_all([
+            SitterProfile(user=sitter, name='S', phone_number='1', hourly_rate=12.5, experience_years=4, bio='Hi',
+                          rating=4.5, reviews_count=10, rating_sum=45.0),
+            ParentProfile(user=parent, name='P', phone_number='2', children_count=2),
+        ])
+        db.session.flush()
+        db.session.add(Booking(parent_id=parent.id, sitter_id=sitter.id, status='Confirmed',
+                               start_time=datetime(2030, 1, 1, 10), end_time=datetime(2030, 1, 1, 12)))
+        db.session.commit()
+
+        files = {}
+        for kind, ext in (('sitters', 'csv'), ('parents', 'jsonl'), ('bookings', 'csv')):
+            files[kind] = os.path.join(self.tmpdir.name, f'{kind}.{ext}')
+            result = self.runner.invoke(args=['data', 'export', kind, files[kind]])
+            self.assertIn(f"Exported 1 {kind}.", result.output)
+
+        with open(files['parents'], encoding='utf-8') as f:
+            self.assertEqual(json.loads(f.readline())['children_count'], 2)
+
+        password_hash = sitter.password_hash
+        db.session.remove()
+        db.drop_all()
+        db.create_all()
+
+        for kind in ('sitters', 'parents', 'bookings'):
+            result = self.runner.invoke(args=['data', 'import', kind, files[kind]])
+            self.assertIn(f"Imported 1 {kind}, skipped 0 invalid rows.", result.output)
+
+        sitter = User.query.filter_by(email='s@test.com').one()
+        self.assertEqual(sitter.password_hash, password_hash)
+        self.assertEqual((sitter.lat, sitter.lng), (42.7, 23.3))
+        self.assertEqual(sitter.sitter_profile.hourly_rate, 12.5)
+        self.assertEqual(sitter.sitter_profile.experience_years, 4)
+        self.assertEqual((sitter.sitter_profile.rating, sitter.sitter_profile.reviews_count,
+                          sitter.sitter_profile.rating_sum), (4.5, 10, 45.0))
+        booking = Booking.query.one()
+        self.assertEqual(booking.status, 'Confirmed')
+        self.assertEqual(booking.start_time, datetime(2030, 1, 1, 10))
+
+    def test_import_rejects_overlapping_bookings(self) -> None:
+        """Tests that active bookings overlapping the database or earlier rows are skipped, inactive ones kept,
+        and rows with an unknown status are reported."""
+        for email, kind in (('s@test.com', 'sitter'), ('p@test.com', 'parent')):
+            user = User(email=email, user_type=kind, city='София', address='София')
+            user.set_password('pw')
+            db.session.add(user)
+        db.session.flush()
+        sitter_id = User.query.filter_by(email='s@test.com').one().id
+        db.session.add(Booking(parent_id=sitter_id + 1, sitter_id=sitter_id, status='Confirmed',
+                               start_time=datetime(2030, 1, 1, 10), end_time=datetime(2030, 1, 1, 12)))
+        db.session.commit()
+
+        path = self.write('bookings.csv', """parent_email,sitter_email,start_time,end_time,status
+p@test.com,s@test.com,2030-01-01T11:00,2030-01-01T13:00,Pending
+p@test.com,s@test.com,2030-01-01T11:00,2030-01-01T13:00,Cancelled
+p@test.com,s@test.com,2030-01-02T10:00,2030-01-02T12:00,Pending
+p@test.com,s@test.com,2030-01-02T11:00,2030-01-02T12:00,Confirmed
+p@test.com,s@test.com,2030-01-03T10:00,2030-01-03T12:00,Declined
+""")
+        result = self.runner.invoke(args=['data', 'import', 'bookings', path])
+        self.assertIn("Imported 2 bookings, skipped 3 invalid rows.", result.output)
+        self.assertIn("line 6: unknown status Declined", result.output)
+        self.assertIn("line 2: The sitter is already booked for that time.", result.output)
+        self.assertIn("line 5: The sitter is already booked for that time.", result.output)
+
+    def test_maintenance_commands_echo(self) -> None:
+        """Tests that the rollup and rating commands report through click."""
+        self.assertIn("Rebuilt price rollups from 0 sitters.",
+                      self.runner.invoke(args=['rebuild-search-stats']).output)
+        self.assertIn("Backfilled 0 sitters", self.runner.invoke(args=['recompute-ratings']).output)
+
+
+if __name__ == '__main__':
+    unittest.main()
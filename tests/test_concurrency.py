@@ -0,0 +1,102 @@
+import datetime
+import threading
+import unittest
+from app import db
+from database import engine_options, listing_session, read_session
+from models import User, SitterProfile, ParentProfile, Booking
+from tests.support import make_test_app
+
+app = make_test_app()
+
+WRITERS = 8
+BOOKINGS_PER_WRITER = 5
+
+
+class TestDatabaseConfiguration(unittest.TestCase):
+
+    def test_engine_options_per_backend(self) -> None:
+        """Tests that SQLite gets a busy timeout and server databases a pre-pinged pool."""
+        sqlite = engine_options('sqlite:///hub.db', pool_size=3, busy_timeout=2.5)
+        self.assertEqual(sqlite['connect_args']['timeout'], 2.5)
+        self.assertEqual(sqlite['pool_size'], 3)
+        self.assertEqual(engine_options('sqlite://'), {})
+
+        postgres = engine_options('postgresql://hub@localhost/hub', read_only=True)
+        self.assertTrue(postgres['pool_pre_ping'])
+        self.assertIn('default_transaction_read_only', postgres['connect_args']['options'])
+
+    def test_sqlite_pragmas_and_read_only_session(self) -> None:
+        """Tests that connections run in WAL mode and the listing session refuses writes."""
+        with app.app_context():
+            self.assertEqual(db.session.execute(db.text("PRAGMA journal_mode")).scalar(), 'wal')
+            self.assertEqual(db.session.execute(db.text("PRAGMA busy_timeout")).scalar(), 5000)
+            self.assertIs(listing_session(), read_session)
+            with self.assertRaises(Exception):
+                read_session.execute(db.text("CREATE TABLE must_fail (id INTEGER)"))
+
+
+class TestConcurrentWrites(unittest.TestCase):
+
+    def setUp(self) -> None:
+        with app.app_context():
+            db.create_all()
+            sitter = User(email='sitter@test.com', user_type='sitter', city='София', address='София',
+                          lat=42.69, lng=23.32)
+            db.session.add(SitterProfile(user=sitter, name='Sitter', phone_number='0888',
+                                         hourly_rate=12, experience_years=3, bio='Hi'))
+            for i in range(WRITERS):
+                parent = User(email=f'parent{i}@test.com', user_type='parent', city='София',
+                              address='София', lat=42.69, lng=23.32)
+                parent.set_password('secret')
+                db.session.add(ParentProfile(user=parent, name=f'Parent {i}', phone_number='0888'))
+            db.session.commit()
+            self.sitter_id = sitter.id
+
+    def tearDown(self) -> None:
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_concurrent_bookings_do_not_lock_or_double_book(self) -> None:
+        """Tests that parallel booking requests all complete and only one wins a contested slot."""
+        start = datetime.datetime.now().replace(second=0, microsecond=0) + datetime.timedelta(days=1)
+        contested = (start, start + datetime.timedelta(hours=2))
+        barrier = threading.Barrier(WRITERS)
+        errors = []
+
+        def fmt(value: datetime.datetime) -> str:
+            return value.strftime('%Y-%m-%dT%H:%M')
+
+        def writer(i: int) -> None:
+            try:
+                client = app.test_client()
+                client.post('/login', data={'email': f'parent{i}@test.com', 'password': 'secret'})
+                barrier.wait()
+                slots = [contested] + [
+                    (start + datetime.timedelta(days=1 + i * BOOKINGS_PER_WRITER + n, hours=1),
+                     start + datetime.timedelta(days=1 + i * BOOKINGS_PER_WRITER + n, hours=2))
+                    for n in range(BOOKINGS_PER_WRITER)
+                ]
+                for slot_start, slot_end in slots:
+                    response = client.post(f'/book/{self.sitter_id}', data={
+                        'start_time': fmt(slot_start), 'end_time': fmt(slot_end)})
+                    if response.status_code not in (200, 302):
+                        errors.append(response.status_code)
+                    client.get('/')
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=writer, args=(i,)) for i in range(WRITERS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        with app.app_context():
+            self.assertEqual(Booking.query.count(), WRITERS * BOOKINGS_PER_WRITER + 1)
+            self.assertEqual(Booking.query.filter_by(start_time=contested[0]).count(), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
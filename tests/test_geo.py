@@ -0,0 +1,56 @@
+import random
+import unittest
+import geo
+from geo import MISSING_DISTANCE, batch_distances, nearest_indices
+from logic import calculate_distance
+
+
+class TestDistanceEngine(unittest.TestCase):
+
+    def setUp(self) -> None:
+        rng = random.Random(42)
+        self.lats = [rng.uniform(41.2, 44.2) for _ in range(2000)]
+        self.lngs = [rng.uniform(22.4, 28.6) for _ in range(2000)]
+        self.lats[10] = None
+        self.lngs[20] = None
+
+    def test_batch_matches_scalar_distance(self) -> None:
+        """Tests that the batch engine agrees with calculate_distance for every pair."""
+        batch = batch_distances(42.6977, 23.3217, self.lats, self.lngs)
+        scalar = [calculate_distance(42.6977, 23.3217, la, ln) for la, ln in zip(self.lats, self.lngs)]
+        self.assertEqual(batch, scalar)
+
+    @unittest.skipIf(geo.np is None, "numpy is not installed")
+    def test_numpy_and_python_paths_are_identical(self) -> None:
+        """Tests that the vectorized and pure-Python paths return the same distances and ranking."""
+        fast = batch_distances(42.6977, 23.3217, self.lats, self.lngs)
+        slow = batch_distances(42.6977, 23.3217, self.lats, self.lngs, use_numpy=False)
+        self.assertEqual(fast, slow)
+        self.assertEqual(nearest_indices(fast, 50), nearest_indices(slow, 50, use_numpy=False))
+
+    def test_missing_coordinates_use_sentinel(self) -> None:
+        """Tests that a missing coordinate on either side yields the sentinel distance."""
+        distances = batch_distances(42.6977, 23.3217, self.lats, self.lngs)
+        self.assertEqual(distances[10], MISSING_DISTANCE)
+        self.assertEqual(distances[20], MISSING_DISTANCE)
+        self.assertEqual(batch_distances(None, 23.3, [42.0], [23.0]), [MISSING_DISTANCE])
+
+    def test_zero_coordinates_are_valid(self) -> None:
+        """Tests that a latitude or longitude of 0.0 is not treated as missing."""
+        self.assertEqual(calculate_distance(0.0, 0.0, 0.0, 0.0), 0.0)
+        self.assertAlmostEqual(calculate_distance(0.0, 0.0, 0.0, 1.0), 111.19, places=2)
+        self.assertEqual(batch_distances(0.0, 0.0, [0.0], [1.0]), [111.19])
+
+    def test_nearest_indices_matches_full_sort_with_ties(self) -> None:
+        """Tests that top-k selection equals a stable full sort, including ties at the cut."""
+        distances = [5.0, 1.0, 3.0, 1.0, 3.0, 3.0, 0.5, 9.0]
+        full = sorted(range(len(distances)), key=distances.__getitem__)
+        for k in range(len(distances) + 2):
+            self.assertEqual(nearest_indices(distances, k), full[:k])
+            self.assertEqual(nearest_indices(distances, k, use_numpy=False), full[:k])
+        self.assertEqual(nearest_indices(distances), full)
+        self.assertEqual(nearest_indices([], 3), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+import time
+import unittest
+import geocoding
+from app import db
+from geocode_worker import GeocodeWorkerPool
+from models import User, SitterProfile
+from queries import build_sitter_query, nearest_sitters
+from tests.support import make_test_app
+
+app = make_test_app()
+
+
+class StubGeocoder:
+    """Local geocoder that answers instantly and can fail a number of times first."""
+
+    def __init__(self, coords=(42.6977, 23.3217), failures: int = 0, delay: float = 0.0) -> None:
+        self.coords = coords
+        self.failures = failures
+        self.delay = delay
+        self.calls = 0
+
+    def geocode(self, query: str):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.failures:
+            self.failures -= 1
+            raise TimeoutError("geocoder unavailable")
+        return self.coords
+
+
+class TestGeocodeWorker(unittest.TestCase):
+
+    def setUp(self) -> None:
+        app.config['GEOCODE_ASYNC'] = True
+        self.client = app.test_client()
+        self.geocoder = StubGeocoder()
+        self.service = app.extensions['geocoding']
+        app.extensions['geocoding'] = geocoding.build_service(geocoder=self.geocoder)
+        app.extensions['geocode_worker'].backoff = 0
+
+        with app.app_context():
+            db.create_all()
+
+    def tearDown(self) -> None:
+        app.extensions['geocoding'] = self.service
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def register_sitter(self, email: str = 'sitter@test.com'):
+        data = {
+            'email': email, 'password': 'secret', 'name': 'Maria', 'phone': '0888',
+            'city': 'София', 'street': 'Витоша', 'street_number': '10',
+            'hourly_rate': '15', 'experience': '3', 'bio': 'Hello',
+        }
+        return self.client.post('/register/sitter', data=data)
+
+    def test_registration_saves_pending_user_and_resolves_in_background(self) -> None:
+        """Tests that registration returns before geocoding and the worker fills in coordinates."""
+        response = self.register_sitter()
+        self.assertEqual(response.status_code, 302)
+
+        app.extensions['geocode_worker'].join()
+        with app.app_context():
+            user = User.query.filter_by(email='sitter@test.com').one()
+            self.assertEqual(user.geocode_status, 'resolved')
+            self.assertEqual((user.lat, user.lng), (42.6977, 23.3217))
+            self.assertIsNotNone(user.grid_lat)
+
+    def test_pending_users_are_not_ranked(self) -> None:
+        """Tests that users awaiting geocoding are left out of distance ranking."""
+        with app.app_context():
+            user = User(email='p@test.com', user_type='sitter', city='София', address='София',
+                        lat=42.6977, lng=23.3217, geocode_status='pending')
+            db.session.add(SitterProfile(user=user, name='P', phone_number='1', hourly_rate=10))
+            db.session.commit()
+            self.assertEqual(nearest_sitters(build_sitter_query(), 42.6977, 23.3217, k=5), [])
+
+    def test_pending_user_is_queued_once(self) -> None:
+        """Tests that submitting a user the startup scan already queued does not geocode it twice."""
+        self.geocoder.delay = 0.05
+        pool = GeocodeWorkerPool(app, workers=2, backoff=0)
+        with app.app_context():
+            user = User(email='q@test.com', user_type='parent', city='София', address='Витоша 10, София',
+                        geocode_status='pending')
+            db.session.add(user)
+            db.session.commit()
+            user_id = user.id
+
+        pool.submit(user_id)
+        pool.join()
+        self.assertEqual(self.geocoder.calls, 1)
+
+    def test_retries_with_backoff_then_resolves(self) -> None:
+        """Tests that transient geocoder errors are retried."""
+        self.geocoder.failures = 2
+        pool = GeocodeWorkerPool(app, workers=1, max_retries=3, backoff=0)
+        with app.app_context():
+            user = User(email='r@test.com', user_type='parent', city='София', address='Витоша 10, София',
+                        geocode_status='pending')
+            db.session.add(user)
+            db.session.commit()
+            user_id = user.id
+
+        pool.process(user_id)
+        with app.app_context():
+            self.assertEqual(db.session.get(User, user_id).geocode_status, 'resolved')
+        self.assertEqual(self.geocoder.calls, 3)
+
+    def test_unknown_address_is_marked_failed(self) -> None:
+        """Tests that an address the geocoder does not know is marked as failed."""
+        self.geocoder.coords = None
+        pool = GeocodeWorkerPool(app, workers=1, backoff=0)
+        with app.app_context():
+            user = User(email='f@test.com', user_type='parent', city='Nowhere', address='Nowhere',
+                        geocode_status='pending')
+            db.session.add(user)
+            db.session.commit()
+            user_id = user.id
+
+        pool.process(user_id)
+        with app.app_context():
+            self.assertEqual(db.session.get(User, user_id).geocode_status, 'failed')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import time
+import unittest
+from geocoding import GeocodeCache, GeocodingService, normalize_address
+
+
+class StubGeocoder:
+    """Local geocoder that answers from a fixed table and records every query."""
+
+    def __init__(self, known: dict[str, tuple[float, float]]) -> None:
+        self.known = known
+        self.queries = []
+
+    def geocode(self, query: str):
+        self.queries.append(query)
+        return self.known.get(query)
+
+
+class TestGeocodingCache(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.geocoder = StubGeocoder({
+            "ул. Витоша 10, София": (42.69, 23.32),
+            "Черни връх 5, София": (42.67, 23.31),
+        })
+        self.cache = GeocodeCache(':memory:')
+        self.service = GeocodingService(geocoder=self.geocoder, cache=self.cache)
+
+    def test_normalize_address_variants(self) -> None:
+        """Tests that case, spacing, script and block spellings map to the same key."""
+        self.assertEqual(normalize_address("Младост 1,  блок 12, София"),
+                         normalize_address("mladost 1, BLOCK 12, Sofia"))
+        self.assertEqual(normalize_address("бл. 5, Sofia, Bulgaria"), "bl 5, sofia")
+        self.assertEqual(normalize_address("ж.к. Лозенец, София"), "kv lozenets, sofia")
+
+    def test_repeated_lookup_hits_cache(self) -> None:
+        """Tests that a second lookup of an equivalent address does not reach the geocoder."""
+        self.assertEqual(self.service.resolve("ул. Витоша 10, София"), (42.69, 23.32))
+        self.assertEqual(self.service.resolve("УЛ. ВИТОША 10,   софия"), (42.69, 23.32))
+        self.assertEqual(len(self.geocoder.queries), 1)
+        self.assertEqual(self.cache.stats()['hits'], 1)
+
+    def test_fallback_query_is_shared(self) -> None:
+        """Tests that addresses sharing a fallback query reuse the cached fallback result."""
+        self.service.resolve("Черни връх 5, Лозенец, София")
+        self.service.resolve("Черни връх 5, Изток, София")
+        self.assertEqual(self.geocoder.queries.count("Черни връх 5, София"), 1)
+
+    def test_negative_caching(self) -> None:
+        """Tests that failed lookups are cached and expire after the negative TTL."""
+        self.assertEqual(self.service.resolve("Nowhere 1"), (None, None))
+        self.assertEqual(self.service.resolve("Nowhere 1"), (None, None))
+        self.assertEqual(len(self.geocoder.queries), 1)
+        self.assertEqual(self.cache.stats()['negative_hits'], 1)
+
+        self.cache.negative_ttl = 0
+        time.sleep(0.01)
+        self.service.resolve("Nowhere 1")
+        self.assertEqual(len(self.geocoder.queries), 2)
+
+    def test_offline_mode_uses_cache_and_gazetteer(self) -> None:
+        """Tests that offline mode never calls the geocoder and falls back to city centers."""
+        self.service.resolve("ул. Витоша 10, София")
+        offline = GeocodingService(geocoder=self.geocoder, cache=self.cache, offline=True)
+        self.cache.ttl = 0
+
+        self.assertEqual(offline.resolve("ул. Витоша 10, София"), (42.69, 23.32))
+        self.assertEqual(offline.resolve("Unknown street 3, Plovdiv"), (42.1354, 24.7453))
+        self.assertEqual(offline.resolve("Unknown street 3, Atlantis"), (None, None))
+        self.assertEqual(len(self.geocoder.queries), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
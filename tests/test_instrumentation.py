@@ -0,0 +1,132 @@
+import os
+import tempfile
+import unittest
+from app import db
+from instrumentation import Metrics, metrics, timed
+from models import User, SitterProfile
+from tests.support import make_test_app
+
+app = make_test_app()
+
+
+class TestMetrics(unittest.TestCase):
+
+    def test_render_prometheus_text(self) -> None:
+        """Tests that counters and histograms render in the Prometheus text format."""
+        registry = Metrics(buckets=(0.1, 1.0))
+        registry.describe('jobs_total', "Jobs run.")
+        registry.inc('jobs_total', status='ok')
+        registry.inc('jobs_total', 2, status='ok')
+        registry.observe('job_seconds', 0.5, job='a"b')
+
+        text = registry.render()
+        self.assertIn('# HELP jobs_total Jobs run.\n# TYPE jobs_total counter\n', text)
+        self.assertIn('jobs_total{status="ok"} 3\n', text)
+        self.assertIn('# TYPE job_seconds histogram\n', text)
+        self.assertIn('job_seconds_bucket{job="a\\"b",le="0.1"} 0\n', text)
+        self.assertIn('job_seconds_bucket{job="a\\"b",le="1.0"} 1\n', text)
+        self.assertIn('job_seconds_bucket{job="a\\"b",le="+Inf"} 1\n', text)
+        self.assertIn('job_seconds_sum{job="a\\"b"} 0.5\n', text)
+        self.assertEqual(registry.value('job_seconds', job='a"b'), 1)
+
+    def test_timed_is_inert_while_disabled(self) -> None:
+        """Tests that timed functions record nothing unless the current app has metrics enabled."""
+        @timed('double')
+        def double(x: int) -> int:
+            return x * 2
+
+        metrics.reset()
+        self.assertEqual(double(1), 2)
+        with app.app_context():
+            self.assertEqual(double(2), 4)
+        self.assertEqual(metrics.value('function_duration_seconds', function='double'), 0)
+
+        app.config['METRICS_ENABLED'] = True
+        try:
+            with app.app_context():
+                self.assertEqual(double(3), 6)
+        finally:
+            app.config['METRICS_ENABLED'] = False
+        self.assertEqual(metrics.value('function_duration_seconds', function='double'), 1)
+
+
+class TestRequestInstrumentation(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.client = app.test_client()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.profile_dir = app.config['PROFILE_DIR']
+        metrics.reset()
+        with app.app_context():
+            db.create_all()
+            user = User(email='sitter@test.com', user_type='sitter', city='София', address='София',
+                        lat=42.69, lng=23.32)
+            db.session.add(SitterProfile(user=user, name='Sitter', phone_number='0888',
+                                         hourly_rate=12, experience_years=3, bio='Hi'))
+            db.session.commit()
+
+    def tearDown(self) -> None:
+        app.config['METRICS_ENABLED'] = False
+        app.config['PROFILE_SAMPLE_RATE'] = 0.0
+        app.config['PROFILE_SLOW_MS'] = 500
+        app.config['PROFILE_DIR'] = self.profile_dir
+        metrics.reset()
+        self.tmpdir.cleanup()
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_metrics_endpoint_hidden_while_disabled(self) -> None:
+        """Tests that /metrics is not exposed and nothing is collected while metrics are off."""
+        self.client.get('/')
+        self.assertEqual(self.client.get('/metrics').status_code, 404)
+        self.assertEqual(metrics.value('http_requests_total', endpoint='main.index', method='GET', status=200), 0)
+
+    def test_diagnostics_need_allowed_address_or_token(self) -> None:
+        """Tests that /metrics and /internal/cache-stats answer allowed addresses or the bearer token only."""
+        self.assertEqual(self.client.get('/internal/cache-stats').status_code, 404)
+        app.config.update(METRICS_ENABLED=True, METRICS_TOKEN='s3cret')
+        try:
+            remote = {'REMOTE_ADDR': '198.51.100.7'}
+            for url in ('/metrics', '/internal/cache-stats'):
+                self.assertEqual(self.client.get(url).status_code, 200)
+                self.assertEqual(self.client.get(url, environ_base=remote).status_code, 404)
+                self.assertEqual(self.client.get(url, environ_base=remote,
+                                                 headers={'Authorization': 'Bearer wrong'}).status_code, 404)
+                self.assertEqual(self.client.get(url, environ_base=remote,
+                                                 headers={'Authorization': 'Bearer s3cret'}).status_code, 200)
+        finally:
+            app.config['METRICS_TOKEN'] = None
+
+    def test_request_sql_template_and_function_timings(self) -> None:
+        """Tests that a request records its duration, SQL, template and hot-path timings."""
+        app.config['METRICS_ENABLED'] = True
+        self.assertEqual(self.client.get('/').status_code, 200)
+
+        self.assertEqual(metrics.value('http_requests_total', endpoint='main.index', method='GET', status=200), 1)
+        self.assertEqual(metrics.value('http_request_duration_seconds', endpoint='main.index'), 1)
+        self.assertGreater(metrics.value('db_queries_total', endpoint='main.index'), 0)
+        self.assertGreater(metrics.value('db_query_duration_seconds'), 0)
+        self.assertEqual(metrics.value('template_render_seconds', template='index.html'), 1)
+        self.assertEqual(metrics.value('function_duration_seconds', function='search_stats'), 1)
+
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('http_request_duration_seconds_count{endpoint="main.index"} 1', response.get_data(as_text=True))
+
+    def test_slow_requests_are_profiled(self) -> None:
+        """Tests that a sampled request slower than the threshold writes a cProfile dump."""
+        app.config['METRICS_ENABLED'] = True
+        app.config['PROFILE_SAMPLE_RATE'] = 1.0
+        app.config['PROFILE_SLOW_MS'] = 0
+        app.config['PROFILE_DIR'] = self.tmpdir.name
+
+        self.client.get('/')
+        dumps = os.listdir(self.tmpdir.name)
+        self.assertEqual(len(dumps), 1)
+        self.assertTrue(dumps[0].startswith('main.index-') and dumps[0].endswith('.prof'))
+        self.assertEqual(metrics.value('profiles_written_total', endpoint='main.index'), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import unittest
+from sqlalchemy import inspect
+from app import create_app, db
+from migrations import MIGRATIONS, current_version, upgrade
+from models import User, SitterProfile, PriceRollup
+from tests.support import make_test_app
+
+# The tables as the first release created them, before the migrations existed.
+BASELINE_SCHEMA = (
+    """CREATE TABLE user (id INTEGER PRIMARY KEY, email VARCHAR(120) NOT NULL UNIQUE, password_hash VARCHAR(128),
+    user_type VARCHAR(20), city VARCHAR(50) NOT NULL, neighborhood VARCHAR(50), street VARCHAR(100),
+    street_number VARCHAR(10), block VARCHAR(10), entrance VARCHAR(10), address VARCHAR(255) NOT NULL,
+    lat FLOAT, lng FLOAT)""",
+    """CREATE TABLE sitter_profile (id INTEGER PRIMARY KEY, user_id INTEGER REFERENCES user (id),
+    name VARCHAR(100) NOT NULL, phone_number VARCHAR(20) NOT NULL, hourly_rate FLOAT NOT NULL,
+    experience_years INTEGER, bio TEXT, rating FLOAT, reviews_count INTEGER)""",
+    """CREATE TABLE parent_profile (id INTEGER PRIMARY KEY, user_id INTEGER REFERENCES user (id),
+    name VARCHAR(100) NOT NULL, phone_number VARCHAR(20) NOT NULL, children_count INTEGER, bio TEXT)""",
+    """CREATE TABLE booking (id INTEGER PRIMARY KEY, parent_id INTEGER NOT NULL REFERENCES user (id),
+    sitter_id INTEGER NOT NULL REFERENCES user (id), start_time DATETIME NOT NULL, end_time DATETIME NOT NULL,
+    status VARCHAR(20), date_created DATETIME)""",
+    """INSERT INTO user (id, email, user_type, city, address, lat, lng)
+    VALUES (1, 's@test.com', 'sitter', ' София ', 'София', 42.69, 23.32)""",
+    """INSERT INTO sitter_profile (id, user_id, name, phone_number, hourly_rate, experience_years, rating,
+    reviews_count) VALUES (1, 1, 'S', '1', 10, 2, 4.5, 2)""",
+)
+
+app = make_test_app()
+
+
+class TestMigrations(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.ctx = app.app_context()
+        self.ctx.push()
+        db.drop_all()
+
+    def tearDown(self) -> None:
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def test_create_app_does_not_touch_the_schema(self) -> None:
+        """Tests that building an application creates no tables."""
+        create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': app.config['SQLALCHEMY_DATABASE_URI']})
+        self.assertFalse(inspect(db.engine).has_table('user'))
+        self.assertEqual(current_version(), 0)
+
+    def test_upgrade_applies_pending_migrations_once(self) -> None:
+        """Tests that upgrade brings an empty database to the latest version and is idempotent."""
+        latest = MIGRATIONS[-1][0]
+        self.assertEqual(upgrade(target=1), [1])
+        self.assertTrue(inspect(db.engine).has_table('sitter_profile'))
+
+        user = User(email='s@test.com', user_type='sitter', city='София', address='София')
+        db.session.add(SitterProfile(user=user, name='S', phone_number='1', hourly_rate=10))
+        db.session.commit()
+        db.session.execute(db.delete(PriceRollup))
+        db.session.commit()
+
+        self.assertEqual(upgrade(), [number for number, _, _ in MIGRATIONS if number > 1])
+        self.assertEqual(current_version(), latest)
+        self.assertGreater(PriceRollup.query.count(), 0)
+        self.assertEqual(upgrade(), [])
+
+    def test_upgrade_baseline_database(self) -> None:
+        """Tests that a database created before the migrations gains and backfills the newer columns."""
+        for statement in BASELINE_SCHEMA:
+            db.session.execute(db.text(statement))
+        db.session.commit()
+
+        self.assertEqual(upgrade(), [number for number, _, _ in MIGRATIONS])
+        user = db.session.get(User, 1)
+        self.assertEqual((user.city_normalized, user.grid_lat, user.grid_lng, user.geocode_status),
+                         ('софия', 853, 466, 'resolved'))
+        self.assertEqual(db.session.get(SitterProfile, 1).rating_sum, 9.0)
+        indexes = {index['name'] for index in inspect(db.engine).get_indexes('user')}
+        self.assertTrue({'ix_user_city_type', 'ix_user_grid', 'ix_user_geocode_status'} <= indexes)
+        self.assertEqual(PriceRollup.query.filter_by(city_key='софия').one().count, 1)
+
+    def test_upgrade_command(self) -> None:
+        """Tests the `flask db upgrade` command."""
+        result = app.test_cli_runner().invoke(args=['db', 'upgrade'])
+        self.assertIn(f"Current version: {MIGRATIONS[-1][0]}", result.output)
+
+
+if __name__ == '__main__':
+    unittest.main()
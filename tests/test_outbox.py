@@ -0,0 +1,242 @@
+import datetime
+import json
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest import mock
+from app import db
+from models import User, SitterProfile, ParentProfile, Booking, OutboxEvent
+from outbox import LogSink, OutboxDispatcher, SMTPSink, WebhookSink, build_sinks, publish
+from scheduler import sweep_bookings
+from tests.support import make_test_app
+
+app = make_test_app()
+
+
+class RecordingSink:
+
+    def __init__(self, fail: bool = False, name: str = 'recording') -> None:
+        self.fail = fail
+        self.name = name
+        self.sent = []
+
+    def send(self, notification: dict) -> None:
+        if self.fail:
+            raise ConnectionError("sink is down")
+        self.sent.append(notification)
+
+
+class TestOutbox(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.ctx = app.app_context()
+        self.ctx.push()
+        db.create_all()
+        self.tomorrow = (datetime.datetime.now() + datetime.timedelta(days=1)).replace(
+            hour=10, minute=0, second=0, microsecond=0)
+        for user_type, profile in (('parent', ParentProfile), ('sitter', SitterProfile)):
+            user = User(email=f'{user_type}@test.com', user_type=user_type, city='София', address='София')
+            user.set_password('secret')
+            extra = {'hourly_rate': 10} if profile is SitterProfile else {}
+            db.session.add(profile(user=user, name=user_type.title(), phone_number='1', **extra))
+        db.session.commit()
+        self.parent_id = User.query.filter_by(user_type='parent').one().id
+        self.sitter_id = User.query.filter_by(user_type='sitter').one().id
+        self.client = app.test_client()
+
+    def tearDown(self) -> None:
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def login(self, user_type: str) -> None:
+        self.client.post('/login', data={'email': f'{user_type}@test.com', 'password': 'secret'})
+
+    def events(self) -> list[tuple[str, int]]:
+        db.session.remove()
+        return [(e.event, e.recipient_id) for e in OutboxEvent.query.order_by(OutboxEvent.id)]
+
+    def add_booking(self, status: str = 'Pending', days: int = 1) -> Booking:
+        start = self.tomorrow + datetime.timedelta(days=days - 1)
+        booking = Booking(parent_id=self.parent_id, sitter_id=self.sitter_id, status=status,
+                          start_time=start, end_time=start + datetime.timedelta(hours=2))
+        db.session.add(booking)
+        db.session.commit()
+        return booking
+
+    def test_routes_write_events_with_the_booking_change(self) -> None:
+        """Tests that booking, answering and cancelling each queue an event for the other party."""
+        self.login('parent')
+        form = {'start_time': self.tomorrow.strftime('%Y-%m-%dT%H:%M'),
+                'end_time': (self.tomorrow + datetime.timedelta(hours=2)).strftime('%Y-%m-%dT%H:%M')}
+        self.client.post(f'/book/{self.sitter_id}', data=form)
+        self.client.post(f'/book/{self.sitter_id}', data=form)  # overlaps: rolled back, no event
+        self.assertEqual(self.events(), [('booking_requested', self.sitter_id)])
+
+        booking_id = Booking.query.one().id
+        self.login('sitter')
+        self.client.get(f'/booking/action/{booking_id}/confirm')
+        self.login('parent')
+        self.client.get(f'/booking/cancel/{booking_id}')
+        self.assertEqual(self.events(), [('booking_requested', self.sitter_id),
+                                         ('booking_confirmed', self.parent_id),
+                                         ('booking_cancelled', self.sitter_id)])
+
+        publish('booking_cancelled', db.session.get(Booking, booking_id), self.sitter_id)
+        db.session.commit()
+        self.assertEqual(len(self.events()), 3)
+
+    def test_sweep_notifies_parents(self) -> None:
+        """Tests that expired requests and bookings awaiting a rating notify the parent."""
+        self.add_booking('Pending', days=-3)
+        self.add_booking('Confirmed', days=-2)
+        sweep_bookings()
+        self.assertEqual(sorted(self.events()), [('booking_awaiting_rating', self.parent_id),
+                                                 ('booking_expired', self.parent_id)])
+
+    def test_dispatch_retries_then_gives_up(self) -> None:
+        """Tests delivery to every sink, backoff after a failure and dead events after the last attempt."""
+        publish('booking_confirmed', self.add_booking(), self.parent_id)
+        db.session.commit()
+        failing = RecordingSink(fail=True)
+        dispatcher = OutboxDispatcher(app, [failing], max_attempts=2, backoff=0.0)
+
+        self.assertEqual(dispatcher.dispatch_once(), (0, 1))
+        self.assertEqual(OutboxEvent.query.one().attempts, 1)
+        self.assertEqual(dispatcher.dispatch_once(), (0, 1))
+        db.session.expire_all()
+        self.assertEqual(OutboxEvent.query.one().status, 'dead')
+        self.assertEqual(dispatcher.dispatch_once(), (0, 0))
+
+        publish('booking_declined', self.add_booking(days=2), self.parent_id)
+        db.session.commit()
+        sink = RecordingSink()
+        self.assertEqual(OutboxDispatcher(app, [LogSink(), sink]).dispatch_once(), (1, 0))
+        self.assertEqual(sink.sent[0]['recipient_email'], 'parent@test.com')
+        booking_id = sink.sent[0]['booking_id']
+        self.assertEqual(sink.sent[0]['dedupe_key'], f"booking_declined:{booking_id}:{self.parent_id}")
+        db.session.expire_all()
+        self.assertEqual(OutboxEvent.query.filter_by(status='sent').count(), 1)
+
+    def test_retry_skips_sinks_that_accepted(self) -> None:
+        """Tests that a retry after one sink failed resends only to that sink."""
+        publish('booking_confirmed', self.add_booking(), self.parent_id)
+        db.session.commit()
+        healthy, flaky = RecordingSink(name='healthy'), RecordingSink(fail=True, name='flaky')
+        dispatcher = OutboxDispatcher(app, [healthy, flaky], backoff=0.0)
+
+        self.assertEqual(dispatcher.dispatch_once(), (0, 1))
+        db.session.expire_all()
+        self.assertEqual(OutboxEvent.query.one().delivered_to, 'healthy')
+        flaky.fail = False
+        self.assertEqual(dispatcher.dispatch_once(), (1, 0))
+        self.assertEqual((len(healthy.sent), len(flaky.sent)), (1, 1))
+
+    def test_claimed_events_are_leased(self) -> None:
+        """Tests that an event claimed by one dispatcher is not handed to another until the lease ends."""
+        publish('booking_confirmed', self.add_booking(), self.parent_id)
+        db.session.commit()
+        first = OutboxDispatcher(app, [])
+        self.assertEqual(len(first._claim(datetime.datetime.now())[1]), 1)
+        self.assertEqual(first._claim(datetime.datetime.now())[1], [])
+        self.assertEqual(len(first._claim(datetime.datetime.now() + datetime.timedelta(minutes=2))[1]), 1)
+
+    def test_lease_covers_slow_sinks(self) -> None:
+        """Tests that the lease grows with the batch's sink timeouts, that events are not sent past it
+        and that a dispatcher whose lease ran out does not overwrite the next claim."""
+        for days in (1, 2):
+            publish('booking_confirmed', self.add_booking(days=days), self.parent_id)
+        db.session.commit()
+        sink = RecordingSink()
+        self.assertEqual(OutboxDispatcher(app, [sink], lease=0.0).dispatch_once(), (0, 0))
+        self.assertEqual(sink.sent, [])
+
+        now = datetime.datetime.now()
+        slow = OutboxDispatcher(app, [SMTPSink('localhost', 1025, 'noreply@test'),
+                                      WebhookSink('http://localhost/hook')], lease=60.0)
+        leased_until, claimed = slow._claim(now)
+        self.assertEqual((leased_until, len(claimed)), (now + datetime.timedelta(seconds=90), 2))
+
+        _, reclaimed = OutboxDispatcher(app, [])._claim(leased_until)
+        self.assertEqual(len(reclaimed), 2)
+        slow._finish([claimed[0][0]['id']], [claimed[1]], datetime.datetime.now(), leased_until)
+        db.session.expire_all()
+        self.assertEqual({(e.status, e.attempts) for e in OutboxEvent.query}, {('pending', 0)})
+
+    def test_background_dispatcher_wakes_on_commit(self) -> None:
+        """Tests that the dispatcher thread delivers an event committed while it is idle."""
+        sink = RecordingSink()
+        dispatcher = OutboxDispatcher(app, [sink], idle=30)
+        dispatcher.start()
+        try:
+            time.sleep(0.1)
+            publish('booking_confirmed', self.add_booking(), self.parent_id)
+            db.session.commit()
+            deadline = time.monotonic() + 5
+            while not sink.sent and time.monotonic() < deadline:
+                time.sleep(0.02)
+        finally:
+            dispatcher.stop()
+        self.assertEqual([n['event'] for n in sink.sent], ['booking_confirmed'])
+
+    def test_event_stream(self) -> None:
+        """Tests the SSE endpoint: resuming from Last-Event-ID, starting at the newest event, and the stream cap."""
+        publish('booking_confirmed', self.add_booking(), self.parent_id)
+        publish('booking_requested', self.add_booking(days=2), self.sitter_id)
+        db.session.commit()
+        self.login('parent')
+        app.config['OUTBOX_SSE_MAX_SECONDS'] = 0
+        try:
+            response = self.client.get('/events', headers={'Last-Event-ID': '0'})
+            body = response.get_data(as_text=True)
+            self.assertEqual(response.mimetype, 'text/event-stream')
+            self.assertIn('was confirmed', body)
+            self.assertNotIn('New booking request', body)
+            self.assertNotIn('data:', self.client.get('/events').get_data(as_text=True))
+
+            streams = app.extensions['event_streams']
+            held = 0
+            while streams.acquire(blocking=False):
+                held += 1
+            try:
+                self.assertEqual(self.client.get('/events').status_code, 503)
+            finally:
+                for _ in range(held):
+                    streams.release()
+        finally:
+            app.config['OUTBOX_SSE_MAX_SECONDS'] = 300
+
+    def test_sinks(self) -> None:
+        """Tests the webhook request, the SMTP message and building sinks from the configuration."""
+        received = []
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self) -> None:
+                body = self.rfile.read(int(self.headers['Content-Length']))
+                received.append((self.headers['Idempotency-Key'], json.loads(body)))
+                self.send_response(204)
+                self.end_headers()
+
+            def log_message(self, *args) -> None:
+                pass
+
+        server = HTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=server.handle_request, daemon=True).start()
+        notification = {'dedupe_key': 'booking_confirmed:1:2', 'message': 'Hi', 'recipient_email': 'p@test.com'}
+        WebhookSink(f'http://127.0.0.1:{server.server_port}/hook').send(notification)
+        server.server_close()
+        self.assertEqual(received, [('booking_confirmed:1:2', notification)])
+
+        with mock.patch('smtplib.SMTP') as smtp:
+            SMTPSink('localhost', 1025, 'noreply@test.com').send(notification)
+        message = smtp.return_value.__enter__.return_value.send_message.call_args[0][0]
+        self.assertEqual(message['To'], 'p@test.com')
+        self.assertEqual(message['Message-ID'], '<booking_confirmed.1.2@babysitter-hub>')
+
+        sinks = build_sinks({**app.config, 'OUTBOX_SINKS': 'log, smtp, webhook', 'OUTBOX_WEBHOOK_URL': None})
+        self.assertEqual([type(s).__name__ for s in sinks], ['LogSink', 'SMTPSink'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import datetime
+import unittest
+from app import db
+from models import User, SitterProfile, Booking
+from pagination import decode_cursor, encode_cursor
+from queries import build_sitter_query, bookings_page, nearest_page, sitter_page
+from tests.support import make_test_app
+
+app = make_test_app()
+
+
+class TestKeysetPagination(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.ctx = app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+        self.start = datetime.datetime(2030, 1, 1, 9, 0)
+        for i in range(23):
+            user = User(email=f's{i}@test.com', user_type='sitter', city='София', address='София',
+                        lat=42.69 + (i % 7) / 100, lng=23.32)
+            db.session.add(SitterProfile(user=user, name=f'S{i}', phone_number='1', hourly_rate=10, bio='Hi',
+                                         experience_years=i % 4, rating=float(i % 3)))
+            db.session.add(Booking(parent_id=1, sitter=user, start_time=self.start + datetime.timedelta(hours=i % 5),
+                                   end_time=self.start + datetime.timedelta(hours=6)))
+        db.session.commit()
+
+    def tearDown(self) -> None:
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def walk(self, fetch) -> list:
+        items, cursor = [], None
+        while True:
+            page = fetch(cursor)
+            self.assertLessEqual(len(page.items), 5)
+            items.extend(page.items)
+            if not page.has_next:
+                return items
+            cursor = page.next_cursor
+
+    def test_cursor_round_trip(self) -> None:
+        """Tests that cursors survive encoding, including datetimes, and bad cursors are ignored."""
+        values = (4.5, datetime.datetime(2030, 1, 1, 9, 30), 7)
+        self.assertEqual(decode_cursor(encode_cursor(values), 3), values)
+        self.assertIsNone(decode_cursor('not-a-cursor!', 3))
+        self.assertIsNone(decode_cursor(encode_cursor((1, 2)), 3))
+
+    def test_malformed_cursor_values_restart(self) -> None:
+        """Tests that cursors with values of the wrong shape decode to None instead of reaching a query."""
+        for values in ([{'dt': 'garbage'}, 1], [[1], 1], [{'x': 1}, 1], [None, 1], [True, 1], [2 ** 70, 1],
+                       [float('nan'), 1]):
+            self.assertIsNone(decode_cursor(encode_cursor(values), 2), values)
+        dated = encode_cursor((datetime.datetime(2030, 1, 1), 1))
+        self.assertIsNone(decode_cursor(dated, 2, numeric=True))
+        self.assertEqual(len(bookings_page(Booking.query, encode_cursor(({'dt': 'garbage'}, 1)), 5).items), 5)
+
+        client = app.test_client()
+        bad = encode_cursor(({'x': 1}, 1))
+        for url in ('/?q=Hi', '/?sort=rating', '/?sort=best', '/?available_from=2030-01-02T09:00&sort=rating',
+                    '/api/v1/sitters?sort=experience'):
+            self.assertEqual(client.get(f'{url}&cursor={bad}').status_code, 200, url)
+        self.assertEqual(client.get(f'/api/v1/sitters?cursor={dated}&sort=rating').get_json()['items'][0]['name'],
+                         client.get('/api/v1/sitters?sort=rating').get_json()['items'][0]['name'])
+
+    def test_rating_and_experience_pages_match_full_sort(self) -> None:
+        """Tests that walking all pages equals a full sort with ties broken by id."""
+        everything = SitterProfile.query.all()
+        for sort, key in (('rating', lambda s: (-s.rating, s.id)),
+                          ('experience', lambda s: (-s.experience_years, s.id))):
+            walked = self.walk(lambda c: sitter_page(build_sitter_query(), sort, c, 5))
+            self.assertEqual([s.id for s in walked], [s.id for s in sorted(everything, key=key)])
+
+    def test_distance_pages_match_full_sort(self) -> None:
+        """Tests that distance pages continue after the cursor without gaps or repeats."""
+        walked = self.walk(lambda c: nearest_page(build_sitter_query(), 42.69, 23.32, c, 5))
+        keys = [(s.distance, s.id) for s in walked]
+        self.assertEqual(len(walked), 23)
+        self.assertEqual(keys, sorted(keys))
+
+    def test_booking_pages_ordered_by_start_time(self) -> None:
+        """Tests that bookings are paged by start time with id as tie-breaker."""
+        walked = self.walk(lambda c: bookings_page(Booking.query, c, 5))
+        keys = [(b.start_time, b.id) for b in walked]
+        self.assertEqual(len(keys), 23)
+        self.assertEqual(keys, sorted(keys))
+
+    def test_index_links_to_next_page(self) -> None:
+        """Tests that the index page renders a bounded page with a next-page link."""
+        response = app.test_client().get('/?sort=experience')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'Found: 23 sitters', response.data)
+        self.assertIn(b'Next page', response.data)
+        self.assertEqual(response.data.count(b'Book Now'), 12)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import unittest
+from app import db
+from models import User, SitterProfile
+from logic import search_sitters
+from queries import build_sitter_query, nearest_sitters
+from tests.support import make_test_app
+
+app = make_test_app()
+
+
+class TestSitterQueries(unittest.TestCase):
+    def setUp(self) -> None:
+        self.ctx = app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+        rows = [
+            ("maria@test.com", "София", 15.50, 5, 42.6977, 23.3217),
+            ("ivana@test.com", "Пловдив", 12.00, 2, 42.1354, 24.7453),
+            ("elena@test.com", "Варна", 20.00, 7, 43.2141, 27.9147),
+            ("anna@test.com", "СОФИЯ", 10.00, 1, 42.6500, 23.3800),
+        ]
+        for email, city, rate, exp, lat, lng in rows:
+            user = User(email=email, user_type='sitter', city=city, address=city, lat=lat, lng=lng)
+            db.session.add(SitterProfile(user=user, name=email, phone_number="0888",
+                                         hourly_rate=rate, experience_years=exp))
+        db.session.commit()
+
+    def tearDown(self) -> None:
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def assertMatchesReference(self, **filters) -> None:
+        expected = search_sitters(SitterProfile.query.all(), **filters)
+        actual = build_sitter_query(**filters).all()
+        self.assertEqual(sorted(s.id for s in actual), sorted(s.id for s in expected))
+
+    def test_city_is_normalized_on_assignment(self) -> None:
+        """Tests that the lowercase city column follows the city attribute."""
+        user = User(city="  Пловдив ")
+        self.assertEqual(user.city_normalized, "пловдив")
+
+    def test_filter_by_city_case_insensitive(self) -> None:
+        """Tests the SQL city filter against the reference search_sitters implementation."""
+        self.assertMatchesReference(city="софия")
+        self.assertEqual(build_sitter_query(city="софия").count(), 2)
+
+    def test_filter_by_price_and_experience(self) -> None:
+        """Tests the SQL price and experience filters against the reference implementation."""
+        self.assertMatchesReference(max_price=13.0)
+        self.assertMatchesReference(min_experience=5)
+        self.assertMatchesReference(city="София", max_price=16.0, min_experience=2)
+
+    def test_no_filters_returns_all(self) -> None:
+        """Tests that an empty filter set returns every sitter."""
+        self.assertMatchesReference()
+        self.assertEqual(build_sitter_query().count(), 4)
+
+    def test_grid_cell_follows_coordinates(self) -> None:
+        """Tests that the spatial grid columns are kept in sync with lat/lng."""
+        user = User(lat=42.6977, lng=23.3217)
+        self.assertEqual((user.grid_lat, user.grid_lng), (853, 466))
+        user.lat = None
+        self.assertIsNone(user.grid_lat)
+
+    def test_nearest_sitters_k(self) -> None:
+        """Tests that the k nearest sitters are returned closest first."""
+        nearest = nearest_sitters(build_sitter_query(), 42.6977, 23.3217, k=2)
+        self.assertEqual([s.name for s in nearest], ["maria@test.com", "anna@test.com"])
+        self.assertEqual(nearest[0].distance, 0.0)
+
+    def test_nearest_sitters_radius(self) -> None:
+        """Tests that sitters outside the requested radius are left out."""
+        nearby = nearest_sitters(build_sitter_query(), 42.6977, 23.3217, radius_km=200)
+        self.assertEqual([s.name for s in nearby], ["maria@test.com", "anna@test.com", "ivana@test.com"])
+
+    def test_nearest_sitters_expands_until_k_found(self) -> None:
+        """Tests that the search radius grows until enough sitters are found."""
+        nearest = nearest_sitters(build_sitter_query(), 42.6977, 23.3217, k=10)
+        self.assertEqual(len(nearest), 4)
+        self.assertEqual(nearest[-1].name, "elena@test.com")
+
+    def test_nearest_sitters_without_coordinates(self) -> None:
+        """Tests that a missing origin yields no results instead of an error."""
+        self.assertEqual(nearest_sitters(build_sitter_query(), None, None, k=3), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
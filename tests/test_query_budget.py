@@ -0,0 +1,80 @@
+import datetime
+import unittest
+from app import db
+from instrumentation import QueryBudgetExceeded
+from models import User, SitterProfile, ParentProfile, Booking
+from tests.support import make_test_app
+
+app = make_test_app()
+
+
+class TestQueryBudget(unittest.TestCase):
+
+    def setUp(self) -> None:
+        app.config['QUERY_COUNT_HEADER'] = True
+        self.client = app.test_client()
+
+        with app.app_context():
+            db.create_all()
+            parent = User(email='parent@test.com', user_type='parent', city='София', address='София',
+                          lat=42.69, lng=23.32)
+            parent.set_password('secret')
+            db.session.add(ParentProfile(user=parent, name='Parent', phone_number='0888'))
+            db.session.commit()
+            self.parent_id = parent.id
+
+    def tearDown(self) -> None:
+        app.config['QUERY_COUNT_HEADER'] = False
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def add_sitters_with_bookings(self, count: int) -> None:
+        start = datetime.datetime.now() + datetime.timedelta(days=1)
+        with app.app_context():
+            for i in range(count):
+                user = User(email=f'sitter{i}-{count}@test.com', user_type='sitter', city='София',
+                            address='София', lat=42.69 + i / 1000, lng=23.32)
+                db.session.add(SitterProfile(user=user, name=f'Sitter {i}', phone_number='0888',
+                                             hourly_rate=10 + i % 10, experience_years=i % 5, bio='Hi'))
+                db.session.add(Booking(parent_id=self.parent_id, sitter=user,
+                                       start_time=start, end_time=start + datetime.timedelta(hours=2)))
+            db.session.commit()
+
+    def query_count(self, url: str) -> int:
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return int(response.headers['X-Query-Count'])
+
+    def test_query_count_does_not_grow_with_rows(self) -> None:
+        """Tests that listing views issue a constant number of queries regardless of row count."""
+        self.client.post('/login', data={'email': 'parent@test.com', 'password': 'secret'})
+
+        self.add_sitters_with_bookings(3)
+        small = [self.query_count(url) for url in ('/?sort=rating', '/?sort=experience', '/my-bookings')]
+        self.assertLessEqual(self.query_count('/'), 4)
+
+        self.add_sitters_with_bookings(40)
+        large = [self.query_count(url) for url in ('/?sort=rating', '/?sort=experience', '/my-bookings')]
+        self.assertLessEqual(self.query_count('/'), 4)
+
+        self.assertEqual(small, large)
+
+    def test_public_profile_within_budget(self) -> None:
+        """Tests that the public profile page loads the user and profile without extra queries."""
+        self.client.post('/login', data={'email': 'parent@test.com', 'password': 'secret'})
+        self.assertLessEqual(self.query_count(f'/user/{self.parent_id}'), 3)
+
+    def test_budget_violation_fails_in_testing(self) -> None:
+        """Tests that exceeding the default query budget raises while testing."""
+        self.client.post('/login', data={'email': 'parent@test.com', 'password': 'secret'})
+        app.config['QUERY_BUDGET'] = 1
+        try:
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get('/profile')
+        finally:
+            app.config['QUERY_BUDGET'] = None
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import random
+import unittest
+from types import SimpleNamespace
+from ranking import rank, top_k_by_distance, top_k_by_experience, top_k_by_rating
+
+
+class TestTopKRanking(unittest.TestCase):
+
+    def setUp(self) -> None:
+        rng = random.Random(7)
+        self.sitters = [
+            SimpleNamespace(id=i, rating=rng.choice([3.5, 4.0, 4.5, 5.0]),
+                            experience_years=rng.randint(0, 6),
+                            distance=rng.choice([0.5, 1.25, 2.0, 3.75]))
+            for i in range(300)
+        ]
+
+    def test_single_key_orderings_match_full_sort(self) -> None:
+        """Tests that heap selection equals a full stable sort for every single-key ordering."""
+        for k in (0, 1, 6, 50, 300, 1000):
+            self.assertEqual(top_k_by_rating(self.sitters, k),
+                             sorted(self.sitters, key=lambda s: s.rating, reverse=True)[:k])
+            self.assertEqual(top_k_by_experience(self.sitters, k),
+                             sorted(self.sitters, key=lambda s: s.experience_years, reverse=True)[:k])
+            self.assertEqual(top_k_by_distance(self.sitters, k),
+                             sorted(self.sitters, key=lambda s: s.distance)[:k])
+
+    def test_multi_key_ordering_matches_full_sort(self) -> None:
+        """Tests the combined rating-then-distance ordering against a full sort."""
+        expected = sorted(self.sitters, key=lambda s: (-s.rating, s.distance))
+        self.assertEqual(rank(self.sitters, 'rating_distance', 10), expected[:10])
+        self.assertEqual(rank(self.sitters, [('rating', True), ('distance', False)]), expected)
+
+    def test_missing_distance_sorts_last(self) -> None:
+        """Tests that sitters without a distance are ranked after those with one."""
+        far = SimpleNamespace(id=-1, rating=5.0, experience_years=1)
+        ranked = top_k_by_distance([far] + self.sitters[:5])
+        self.assertIs(ranked[-1], far)
+
+
+if __name__ == '__main__':
+    unittest.main()
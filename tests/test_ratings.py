@@ -0,0 +1,93 @@
+import datetime
+import unittest
+from app import db
+from models import User, SitterProfile, ParentProfile, Booking, Review
+from ratings import backfill_rating_sums, record_rating, recompute_ratings
+from tests.support import make_test_app
+
+app = make_test_app()
+
+
+class TestRatingAggregation(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.client = app.test_client()
+        self.ctx = app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+        sitter = User(email='sitter@test.com', user_type='sitter', city='София', address='София')
+        parent = User(email='parent@test.com', user_type='parent', city='София', address='София')
+        parent.set_password('secret')
+        db.session.add(SitterProfile(user=sitter, name='Maria', phone_number='1', hourly_rate=10))
+        db.session.add(ParentProfile(user=parent, name='Ivan', phone_number='2'))
+        db.session.commit()
+        self.sitter_id, self.parent_id = sitter.id, parent.id
+
+    def tearDown(self) -> None:
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def profile(self) -> SitterProfile:
+        db.session.expire_all()
+        return SitterProfile.query.filter_by(user_id=self.sitter_id).one()
+
+    def past_booking(self) -> int:
+        end = datetime.datetime.now() - datetime.timedelta(hours=1)
+        booking = Booking(parent_id=self.parent_id, sitter_id=self.sitter_id, status='Confirmed',
+                          start_time=end - datetime.timedelta(hours=2), end_time=end)
+        db.session.add(booking)
+        db.session.commit()
+        return booking.id
+
+    def test_record_rating_keeps_exact_average(self) -> None:
+        """Tests that the average is derived from the exact sum and count, without rounding drift."""
+        for value in (5, 4, 4):
+            record_rating(self.sitter_id, value)
+        db.session.commit()
+
+        profile = self.profile()
+        self.assertEqual(profile.reviews_count, 3)
+        self.assertEqual(profile.rating_sum, 13.0)
+        self.assertAlmostEqual(profile.rating, 13 / 3)
+
+    def test_rate_sitter_route_records_review_once(self) -> None:
+        """Tests that rating a booking stores a Review and a second rating is rejected."""
+        booking_id = self.past_booking()
+        self.client.post('/login', data={'email': 'parent@test.com', 'password': 'secret'})
+
+        self.client.post(f'/rate-sitter/{booking_id}', data={'rating': '5'})
+        self.client.post(f'/rate-sitter/{booking_id}', data={'rating': '1'})
+
+        self.assertEqual(Review.query.count(), 1)
+        self.assertEqual(self.profile().rating, 5.0)
+        self.assertEqual(db.session.get(Booking, booking_id).status, 'Completed')
+
+    def test_invalid_rating_is_rejected(self) -> None:
+        """Tests that out-of-range ratings do not change the aggregate."""
+        booking_id = self.past_booking()
+        self.client.post('/login', data={'email': 'parent@test.com', 'password': 'secret'})
+        self.client.post(f'/rate-sitter/{booking_id}', data={'rating': '9'})
+        self.assertEqual(self.profile().reviews_count, 0)
+
+    def test_backfill_and_recompute(self) -> None:
+        """Tests that legacy averages are backfilled and aggregates are rebuilt from reviews."""
+        profile = self.profile()
+        profile.rating, profile.reviews_count, profile.rating_sum = 4.5, 2, None
+        db.session.commit()
+        self.assertEqual(backfill_rating_sums(), 1)
+        self.assertEqual(self.profile().rating_sum, 9.0)
+
+        for rating in (3.0, 5.0):
+            booking_id = self.past_booking()
+            db.session.add(Review(booking_id=booking_id, sitter_id=self.sitter_id,
+                                  parent_id=self.parent_id, rating=rating))
+        db.session.commit()
+        self.assertEqual(recompute_ratings(), 1)
+        profile = self.profile()
+        self.assertEqual((profile.rating_sum, profile.reviews_count, profile.rating), (8.0, 2, 4.0))
+
+
+if __name__ == '__main__':
+    unittest.main()
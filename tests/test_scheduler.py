@@ -0,0 +1,123 @@
+import datetime
+import time
+import unittest
+from sqlalchemy import event
+from app import db
+from booking_stats import booking_counts, rebuild_booking_counters
+from models import User, SitterProfile, ParentProfile, Booking, BookingCounter
+from scheduler import BookingScheduler, sweep_bookings
+from tests.support import make_test_app
+
+app = make_test_app()
+
+
+class TestBookingScheduler(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.ctx = app.app_context()
+        self.ctx.push()
+        db.create_all()
+        self.now = datetime.datetime.now().replace(second=0, microsecond=0)
+        parent = User(email='parent@test.com', user_type='parent', city='София', address='София')
+        parent.set_password('secret')
+        sitter = User(email='sitter@test.com', user_type='sitter', city='София', address='София')
+        sitter.set_password('secret')
+        db.session.add(ParentProfile(user=parent, name='Parent', phone_number='1'))
+        db.session.add(SitterProfile(user=sitter, name='Sitter', phone_number='1', hourly_rate=10))
+        db.session.commit()
+        self.parent_id, self.sitter_id = parent.id, sitter.id
+
+    def tearDown(self) -> None:
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def add_booking(self, start_hours: float, hours: float, status: str) -> int:
+        start = self.now + datetime.timedelta(hours=start_hours)
+        booking = Booking(parent_id=self.parent_id, sitter_id=self.sitter_id, status=status,
+                          start_time=start, end_time=start + datetime.timedelta(hours=hours))
+        db.session.add(booking)
+        db.session.commit()
+        return booking.id
+
+    def statuses(self) -> list[str]:
+        db.session.expire_all()
+        return [b.status for b in Booking.query.order_by(Booking.id)]
+
+    def test_sweep_moves_only_due_bookings(self) -> None:
+        """Tests expiring unanswered requests and marking ended bookings, in batches and only once."""
+        for _ in range(3):
+            self.add_booking(-5, 2, 'Pending')
+        self.add_booking(-1, 2, 'Pending')      # started, never answered
+        self.add_booking(2, 2, 'Pending')       # still in the future
+        self.add_booking(-5, 2, 'Confirmed')    # ended
+        self.add_booking(-1, 2, 'Confirmed')    # in progress
+        self.add_booking(-5, 2, 'Cancelled')
+
+        self.assertEqual(sweep_bookings(self.now, batch_size=2), {'Expired': 4, 'AwaitingRating': 1})
+        self.assertEqual(self.statuses(), ['Expired'] * 4 + ['Pending', 'AwaitingRating', 'Confirmed', 'Cancelled'])
+        self.assertEqual(sweep_bookings(self.now), {'Expired': 0, 'AwaitingRating': 0})
+
+        swept = {column: getattr(booking_counts(self.sitter_id), column)
+                 for column in ('pending', 'confirmed', 'awaiting_rating', 'expired', 'cancelled')}
+        self.assertEqual(swept, {'pending': 1, 'confirmed': 1, 'awaiting_rating': 1, 'expired': 4, 'cancelled': 1})
+        rebuild_booking_counters()
+        db.session.commit()
+        rebuilt = db.session.get(BookingCounter, self.sitter_id)
+        self.assertEqual({column: getattr(rebuilt, column) for column in swept}, swept)
+
+    def test_sweep_counts_only_moved_bookings(self) -> None:
+        """Tests that a booking answered between the select and the update is neither moved nor counted."""
+        answered = self.add_booking(-5, 2, 'Pending')
+        self.add_booking(-4, 2, 'Pending')
+
+        def answer_first(state) -> None:
+            if state.is_update:
+                state.session.connection().exec_driver_sql(
+                    f"UPDATE booking SET status = 'Cancelled' WHERE id = {answered}")
+
+        event.listen(db.session, 'do_orm_execute', answer_first)
+        try:
+            self.assertEqual(sweep_bookings(self.now)['Expired'], 1)
+        finally:
+            event.remove(db.session, 'do_orm_execute', answer_first)
+        self.assertEqual(self.statuses(), ['Cancelled', 'Expired'])
+
+    def test_dashboard_reads_statuses(self) -> None:
+        """Tests that swept bookings offer a rating, and expired requests can no longer be confirmed."""
+        rate_id = self.add_booking(-5, 2, 'Confirmed')
+        expired_id = self.add_booking(-5, 2, 'Pending')
+        sweep_bookings(self.now)
+        client = app.test_client()
+
+        client.post('/login', data={'email': 'parent@test.com', 'password': 'secret'})
+        html = client.get('/my-bookings').get_data(as_text=True)
+        self.assertIn(f'/rate-sitter/{rate_id}', html)
+        client.post(f'/rate-sitter/{rate_id}', data={'rating': '4'})
+        self.assertIn('Expired', client.get('/my-bookings?view=history').get_data(as_text=True))
+
+        client.post('/login', data={'email': 'sitter@test.com', 'password': 'secret'})
+        client.get(f'/booking/action/{expired_id}/confirm')
+        self.assertEqual(self.statuses(), ['Completed', 'Expired'])
+        self.assertEqual(booking_counts(self.parent_id).awaiting_rating, 0)
+
+    def test_background_thread_and_command(self) -> None:
+        """Tests that the scheduler thread sweeps on start and that the CLI command runs a sweep."""
+        self.add_booking(-5, 2, 'Confirmed')
+        scheduler = BookingScheduler(app, interval=60)
+        scheduler.start()
+        try:
+            deadline = time.monotonic() + 5
+            while self.statuses() != ['AwaitingRating'] and time.monotonic() < deadline:
+                time.sleep(0.05)
+        finally:
+            scheduler.stop()
+        self.assertEqual(self.statuses(), ['AwaitingRating'])
+
+        self.add_booking(-5, 2, 'Pending')
+        result = app.test_cli_runner().invoke(args=['data', 'sweep-bookings'])
+        self.assertIn('Expired 1 pending requests', result.output)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+import unittest
+from app import db
+from catalog import catalog_page
+from models import User, SitterProfile, ParentProfile
+from queries import build_sitter_query
+from scoring import Scorer, parse_weights, scored_page, top_k
+from tests.support import make_test_app
+
+app = make_test_app()
+
+ORIGIN = (42.69, 23.32)
+
+
+class TestScorer(unittest.TestCase):
+
+    def test_components_are_normalized(self) -> None:
+        """Tests each component at its reference point: half-life, prior, budget and half-years."""
+        scorer = Scorer(distance_half_life_km=5, rating_prior=4, rating_prior_count=5,
+                        price_reference=15, experience_half_years=3)
+        parts = scorer.components(distance=5.0, rating=0.0, reviews=0, rate=15.0, years=3)
+        self.assertAlmostEqual(parts['distance'], 0.5)
+        self.assertAlmostEqual(parts['rating'], 0.8)
+        self.assertAlmostEqual(parts['price'], 0.5)
+        self.assertAlmostEqual(parts['experience'], 0.5)
+        self.assertEqual(scorer.components(999.0, 5.0, 5, 10.0, 0)['distance'], 0)
+        self.assertAlmostEqual(scorer.components(None, 5.0, 5, 20.0, 0, max_price=20)['rating'], 0.9)
+        self.assertNotIn('distance', scorer.components(None, 5.0, 5, 20.0, 0))
+
+    def test_weights(self) -> None:
+        """Tests weight parsing and that the score is the weighted mean of the components present."""
+        self.assertEqual(parse_weights('distance=1, price=0,bogus=3')['distance'], 1.0)
+        self.assertEqual(parse_weights(None), Scorer().weights)
+
+        scorer = Scorer(weights={'distance': 0, 'rating': 0, 'price': 1, 'experience': 3})
+        self.assertAlmostEqual(scorer.score(None, 5.0, 10, 15.0, 3), 0.5)
+        self.assertEqual(Scorer(weights={}).score(None, 5.0, 10, 15.0, 3), 0)
+
+    def test_numpy_and_python_paths_agree(self) -> None:
+        """Tests that vectorized scoring and top-k selection equal the pure-Python versions."""
+        scorer = Scorer()
+        columns = ([0.5 * i for i in range(50)], [float(i % 6) for i in range(50)], [i % 7 for i in range(50)],
+                   [10.0 + i % 9 for i in range(50)], [i % 5 for i in range(50)])
+        fast = scorer.score_columns(*columns)
+        slow = scorer.score_columns(*columns, use_numpy=False)
+        for a, b in zip(fast, slow):
+            self.assertAlmostEqual(a, b)
+
+        ids = [100 - i for i in range(50)]
+        tied = [round(score, 1) for score in slow]
+        for after in (None, (tied[10], ids[10])):
+            self.assertEqual(top_k(tied, ids, 7, after), top_k(tied, ids, 7, after, use_numpy=False))
+
+
+class TestBestMatch(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.ctx = app.app_context()
+        self.ctx.push()
+        db.create_all()
+        for i in range(25):
+            user = User(email=f's{i}@test.com', user_type='sitter', city='София' if i % 4 else 'Пловдив',
+                        address='София', lat=42.69 + (i % 6) / 40, lng=23.32 + (i % 4) / 30,
+                        geocode_status='pending' if i == 3 else 'resolved')
+            db.session.add(SitterProfile(user=user, name=f'S{i}', phone_number='1', hourly_rate=8 + i % 10,
+                                         experience_years=i % 6, rating=float(i % 5), reviews_count=i % 8))
+        parent = User(email='parent@test.com', user_type='parent', city='София', address='София',
+                      lat=ORIGIN[0], lng=ORIGIN[1])
+        parent.set_password('secret')
+        db.session.add(ParentProfile(user=parent, name='Parent', phone_number='1'))
+        db.session.commit()
+        self.catalog = app.extensions['sitter_catalog']
+        self.catalog.refresh(db.session)
+
+    def tearDown(self) -> None:
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def walk(self, fetch) -> list:
+        items, cursor = [], None
+        while True:
+            page = fetch(cursor)
+            items.extend((s.id, round(s.score, 9)) for s in page.items)
+            if not page.has_next:
+                return items
+            cursor = page.next_cursor
+
+    def test_catalog_matches_loaded_sitters(self) -> None:
+        """Tests that best-match pages from the catalog equal scoring the loaded sitters, with and without origin."""
+        scorer = Scorer()
+        for origin, filters in ((None, {}), (ORIGIN, {}), (ORIGIN, {'city': 'София', 'max_price': 14})):
+            expected = self.walk(lambda c: scored_page(build_sitter_query(**filters).all(), scorer, c, 4,
+                                                       origin, filters.get('max_price')))
+            walked = self.walk(lambda c: catalog_page(self.catalog, db.session, 'best', c, 4, origin, scorer,
+                                                      **filters))
+            self.assertEqual(walked, expected)
+            self.assertEqual(len(walked), len(build_sitter_query(**filters).all()))
+            self.assertEqual([p for p, _ in self.catalog.best(scorer, 10, None, origin, **filters)],
+                             [p for p, _ in self.catalog.best(scorer, 10, None, origin, use_numpy=False, **filters)])
+
+    def test_best_sort_route(self) -> None:
+        """Tests that sort=best renders for parents and follows the configured weights."""
+        client = app.test_client()
+        client.post('/login', data={'email': 'parent@test.com', 'password': 'secret'})
+        self.assertEqual(client.get('/?sort=best').status_code, 200)
+
+        app.config['SCORING_WEIGHTS'] = {'distance': 0, 'rating': 0, 'price': 1, 'experience': 0}
+        try:
+            html = client.get('/?sort=best&city=Пловдив').get_data(as_text=True)
+        finally:
+            app.config['SCORING_WEIGHTS'] = parse_weights(None)
+        self.assertLess(html.index('S12'), html.index('S4'))
+
+
+if __name__ == '__main__':
+    unittest.main()
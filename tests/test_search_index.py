@@ -0,0 +1,110 @@
+import unittest
+from app import db
+from geocoding import transliterate
+from migrations import upgrade
+from models import User, SitterProfile
+from queries import build_sitter_query, sitter_price_stats
+from search_index import FTS_TABLE, match_expression, search_terms, text_search_page
+from tests.support import make_test_app
+
+app = make_test_app()
+
+SITTERS = [
+    ('Мария Иванова', 'Опитна с бебета и малки деца', 'Лозенец', 'Пловдив', 12),
+    ('Anna Petrova', 'English-speaking sitter, loves toddlers', 'Младост', 'София', 15),
+    ('Elena Todorova', 'Nurse, first aid certified', 'Lozenets', 'София', 20),
+    ('Георги Петров', 'Помага с домашните', 'Център', 'София', 10),
+]
+
+
+class TestSearchIndex(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.ctx = app.app_context()
+        self.ctx.push()
+        db.create_all()
+        for i, (name, bio, neighborhood, city, rate) in enumerate(SITTERS):
+            user = User(email=f's{i}@test.com', user_type='sitter', city=city, address=city,
+                        neighborhood=neighborhood)
+            db.session.add(SitterProfile(user=user, name=name, bio=bio, phone_number='1', hourly_rate=rate))
+        db.session.commit()
+
+    def tearDown(self) -> None:
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def search(self, text: str, **filters) -> list[str]:
+        page = text_search_page(build_sitter_query(**filters), search_terms(text), None, 10)
+        return [sitter.name for sitter in page.items]
+
+    def test_terms_and_expression(self) -> None:
+        """Tests term splitting, the term limit and that every term is also matched transliterated."""
+        self.assertEqual(search_terms(' Baby-sitter, "Лозенец" '), ['baby', 'sitter', 'лозенец'])
+        self.assertEqual(search_terms(None), [])
+        self.assertEqual(len(search_terms('a ' * 20)), 8)
+        self.assertEqual(transliterate('Лозенец'), 'lozenets')
+        self.assertIn('latin : "lozenet"*', match_expression(['лозенец']))
+
+    def test_matches_across_alphabets(self) -> None:
+        """Tests that Cyrillic and Latin spellings of the same word find each other."""
+        self.assertEqual(sorted(self.search('Lozenets')), ['Elena Todorova', 'Мария Иванова'])
+        self.assertEqual(sorted(self.search('лозенец')), ['Elena Todorova', 'Мария Иванова'])
+        self.assertEqual(self.search('toddler'), ['Anna Petrova'])
+        self.assertEqual(self.search('бебе'), ['Мария Иванова'])
+        self.assertEqual(self.search('nothing-like-this'), [])
+
+    def test_ranking_and_filters(self) -> None:
+        """Tests that name matches outrank bio matches and that the other filters still apply."""
+        self.assertEqual(self.search('petrov'), ['Anna Petrova', 'Георги Петров'])
+        self.assertEqual(self.search('Lozenets', city='София'), ['Elena Todorova'])
+        self.assertEqual(self.search('Lozenets', max_price=15), ['Мария Иванова'])
+        self.assertEqual(sitter_price_stats('', None, 0, text=search_terms('lozenets'))[0], 2)
+
+        names, cursor = [], None
+        while True:
+            page = text_search_page(build_sitter_query(), search_terms('a e'), cursor, 1)
+            names.extend(sitter.name for sitter in page.items)
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+        self.assertEqual(names, self.search('a e'))
+
+    def test_triggers_keep_the_index_in_sync(self) -> None:
+        """Tests that profile inserts, edits and deletes and neighborhood changes reach the index."""
+        maria = SitterProfile.query.filter_by(name='Мария Иванова').one()
+        maria.bio = 'Music teacher'
+        maria.user.neighborhood = 'Витоша'
+        georgi = SitterProfile.query.filter_by(name='Георги Петров').one()
+        db.session.delete(georgi)
+        user = User(email='new@test.com', user_type='sitter', city='София', address='София', neighborhood='Лозенец')
+        db.session.add(SitterProfile(user=user, name='New', phone_number='1', hourly_rate=9))
+        db.session.commit()
+
+        self.assertEqual(self.search('music vitosha'), ['Мария Иванова'])
+        self.assertEqual(sorted(self.search('lozenets')), ['Elena Todorova', 'New'])
+        self.assertEqual(self.search('петров'), ['Anna Petrova'])
+        count = db.session.execute(db.text(f"SELECT count(*) FROM {FTS_TABLE}")).scalar()
+        self.assertEqual(count, SitterProfile.query.count())
+
+    def test_route(self) -> None:
+        """Tests the q parameter on the listing, alone and with an explicit sort."""
+        client = app.test_client()
+        html = client.get('/?q=Lozenets').get_data(as_text=True)
+        self.assertIn('Elena Todorova', html)
+        self.assertNotIn('Anna Petrova', html)
+        html = client.get('/?q=Lozenets&sort=experience&city=Пловдив').get_data(as_text=True)
+        self.assertIn('Мария Иванова', html)
+        self.assertNotIn('Elena Todorova', html)
+
+    def test_migration_builds_the_index(self) -> None:
+        """Tests that upgrading a database created before the index fills it from the existing sitters."""
+        db.session.execute(db.text(f"DROP TABLE {FTS_TABLE}"))
+        db.session.execute(db.text("DELETE FROM schema_version"))
+        db.session.commit()
+        upgrade()
+        self.assertEqual(self.search('Lozenets', city='София'), ['Elena Todorova'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+from app import db
+from models import User, SitterProfile, PriceRollup
+from queries import sitter_price_stats
+from search_stats import price_bucket, rebuild_rollups, search_stats
+from tests.support import make_test_app
+
+app = make_test_app()
+
+
+class TestSearchStats(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.ctx = app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+        rows = [("София", 15.0, 1), ("София", 9.5, 3), ("София", 22.0, 6), ("софия", 30.0, 12),
+                ("Пловдив", 12.0, 2), ("Варна", 8.0, 0)]
+        for i, (city, rate, exp) in enumerate(rows):
+            user = User(email=f's{i}@test.com', user_type='sitter', city=city, address=city)
+            db.session.add(SitterProfile(user=user, name=f'S{i}', phone_number='1',
+                                         hourly_rate=rate, experience_years=exp))
+        db.session.commit()
+
+    def tearDown(self) -> None:
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def snapshot(self) -> dict:
+        return {(r.city_key, r.experience_bucket, r.price_bucket): (r.count, r.rate_sum, r.min_rate)
+                for r in PriceRollup.query.all() if r.count}
+
+    def assertMatchesSql(self, city=None, min_experience=0, max_price=None) -> None:
+        stats = search_stats(city, min_experience, max_price)
+        count, average, minimum = sitter_price_stats(city, max_price, min_experience)
+        self.assertEqual(stats.count, count)
+        self.assertAlmostEqual(stats.average, average)
+        self.assertEqual(stats.min_rate, minimum)
+
+    def test_price_buckets_include_upper_edge(self) -> None:
+        """Tests that a rate equal to a bucket edge falls into the lower bucket."""
+        self.assertEqual(price_bucket(0), 0)
+        self.assertEqual(price_bucket(15.0), 2)
+        self.assertEqual(price_bucket(15.01), 3)
+        self.assertEqual(price_bucket(500), 8)
+
+    def test_stats_match_sql_aggregate(self) -> None:
+        """Tests that rollup answers equal the SQL aggregate for aligned filters."""
+        self.assertMatchesSql()
+        self.assertMatchesSql(city="софия")
+        self.assertMatchesSql(city="София", min_experience=5)
+        self.assertMatchesSql(city="София", max_price=15)
+        self.assertIsNone(search_stats("София", min_experience=3))
+        self.assertIsNone(search_stats("София", max_price=17))
+
+    def test_incremental_updates_match_rebuild(self) -> None:
+        """Tests that inserts, updates, city changes and deletes keep the rollups exact."""
+        cheapest = SitterProfile.query.filter_by(hourly_rate=9.5).one()
+        cheapest.hourly_rate = 40.0
+        SitterProfile.query.filter_by(hourly_rate=22.0).one().experience_years = 1
+        SitterProfile.query.filter_by(hourly_rate=12.0).one().user.city = "Варна"
+        db.session.delete(SitterProfile.query.filter_by(hourly_rate=8.0).one())
+        db.session.commit()
+
+        incremental = self.snapshot()
+        rebuild_rollups()
+        db.session.commit()
+        self.assertEqual(incremental, self.snapshot())
+        self.assertEqual(search_stats("София").min_rate, 15.0)
+
+    def test_affordable_percentiles_and_facets(self) -> None:
+        """Tests the O(1) affordability check, percentile estimate and price facets."""
+        sofia = search_stats("София")
+        self.assertTrue(sofia.has_affordable(15.0))
+        self.assertFalse(search_stats("София", min_experience=5).has_affordable(15.0))
+        self.assertEqual(sofia.facets(), [(10, 1), (15, 2), (25, 3), (30, 4)])
+        self.assertTrue(10 <= sofia.percentile(50) <= 15)
+
+        response = app.test_client().get('/?city=София')
+        self.assertIn(b'up to $15 (2)', response.data)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+import unittest
+from werkzeug.security import generate_password_hash
+from app import create_app, db
+from models import User, ParentProfile
+from security import TokenBucketLimiter
+from tests.support import make_test_app
+
+app = make_test_app(LOGIN_RATE_LIMIT_ENABLED=True, LOGIN_IP_BURST=3, LOGIN_EMAIL_BURST=2)
+
+
+class FakeClock:
+
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestTokenBucketLimiter(unittest.TestCase):
+
+    def test_burst_then_refill(self) -> None:
+        """Tests that a key may spend its burst, is then told how long to wait, and refills over time."""
+        clock = FakeClock()
+        limiter = TokenBucketLimiter(capacity=2, refill_per_second=0.5, clock=clock)
+        self.assertEqual(limiter.hit('a'), 0)
+        self.assertEqual(limiter.hit('a'), 0)
+        self.assertAlmostEqual(limiter.hit('a'), 2.0)
+        self.assertEqual(limiter.hit('b'), 0)
+
+        clock.now = 2.0
+        self.assertEqual(limiter.hit('a'), 0)
+        self.assertGreater(limiter.hit('a'), 0)
+
+    def test_least_recently_used_keys_are_dropped(self) -> None:
+        """Tests that the limiter keeps at most max_keys buckets."""
+        limiter = TokenBucketLimiter(capacity=1, refill_per_second=0.01, max_keys=2, clock=FakeClock())
+        limiter.hit('a')
+        limiter.hit('b')
+        limiter.hit('c')
+        self.assertEqual(limiter.hit('a'), 0)
+
+
+class TestLogin(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.client = app.test_client()
+        for limiter in app.extensions['login_limiters'].values():
+            limiter.reset()
+        with app.app_context():
+            db.create_all()
+            user = User(email='parent@test.com', user_type='parent', city='София', address='София')
+            user.password_hash = generate_password_hash('secret', method='pbkdf2:sha256:2000')
+            db.session.add(ParentProfile(user=user, name='Parent', phone_number='0888'))
+            db.session.commit()
+
+    def tearDown(self) -> None:
+        app.extensions['password_verifier'].max_pending = app.config['PASSWORD_VERIFY_MAX_PENDING']
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def login(self, email: str = 'parent@test.com', password: str = 'secret'):
+        return self.client.post('/login', data={'email': email, 'password': password})
+
+    def test_login_rehashes_outdated_password_hash(self) -> None:
+        """Tests that a successful login stores the password again with the configured hash method."""
+        self.assertEqual(self.login().status_code, 302)
+        with app.app_context():
+            user = User.query.filter_by(email='parent@test.com').one()
+            self.assertTrue(user.password_hash.startswith(app.config['PASSWORD_HASH_METHOD'] + '$'))
+            self.assertTrue(user.check_password('secret'))
+
+    def test_failed_login_keeps_hash(self) -> None:
+        """Tests that a wrong password neither logs in nor rehashes."""
+        self.assertEqual(self.login(password='wrong').status_code, 200)
+        with app.app_context():
+            user = User.query.filter_by(email='parent@test.com').one()
+            self.assertTrue(user.password_hash.startswith('pbkdf2:sha256:2000$'))
+
+    def test_email_and_ip_rate_limits(self) -> None:
+        """Tests that repeated attempts get 429 with Retry-After, per email first and then per IP."""
+        self.assertEqual(self.login(password='wrong').status_code, 200)
+        self.assertEqual(self.login(password='wrong').status_code, 200)
+        response = self.login()
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response.headers['Retry-After']), 0)
+
+        self.assertEqual(self.login(email='other@test.com').status_code, 429)
+
+    def test_successful_logins_keep_email_allowance(self) -> None:
+        """Tests that only wrong passwords spend the per-email allowance."""
+        for _ in range(3):
+            self.assertEqual(self.login().status_code, 302)
+            self.client.get('/logout')
+
+    def test_proxy_fix_limits_forwarded_clients(self) -> None:
+        """Tests that with PROXY_FIX_HOPS the per-IP limit applies to the forwarded client address."""
+        proxied = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': app.config['SQLALCHEMY_DATABASE_URI'],
+                              'LOGIN_RATE_LIMIT_ENABLED': True, 'LOGIN_IP_BURST': 1, 'PROXY_FIX_HOPS': 1})
+        client = proxied.test_client()
+
+        def attempt(client_ip: str) -> int:
+            return client.post('/login', data={'email': 'nobody@test.com', 'password': 'x'},
+                               headers={'X-Forwarded-For': client_ip}).status_code
+
+        self.assertEqual([attempt('203.0.113.1'), attempt('203.0.113.1'), attempt('203.0.113.2')], [200, 429, 200])
+
+    def test_busy_verifier_sheds_load(self) -> None:
+        """Tests that logins are turned away with 503 when the verification queue is full."""
+        app.extensions['password_verifier'].max_pending = 0
+        response = self.login()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers['Retry-After'], '1')
+
+
+if __name__ == '__main__':
+    unittest.main()
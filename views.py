@@ -0,0 +1,517 @@
+from datetime import datetime
+
+from flask import (Blueprint, Response, abort, current_app, flash, jsonify, redirect, render_template,
+                   request, session, url_for)
+from flask_login import current_user, login_required, login_user, logout_user
+from markupsafe import Markup
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
+
+import bookings
+from booking_stats import HISTORY_STATUSES, OPEN_STATUSES, booking_counts
+from database import listing_session
+from instrumentation import diagnostics_allowed, metrics, query_budget
+from listing import finite_float, listing_order, listing_page
+from logic import (clamp_children_count,
+                   clamp_experience,
+                   clamp_hourly_rate,
+                   compose_address,
+                   get_coords_from_address,
+                   validate_address_fields,
+                   validate_rating)
+from models import db, User, SitterProfile, ParentProfile, Booking, Review
+from outbox import event_stream, latest_event_id
+from queries import (BOOKING_HISTORY_ORDERING,
+                     BOOKING_ORDERING,
+                     bookings_page,
+                     sitter_price_stats)
+from ratings import record_rating
+from search_index import search_terms
+import search_stats
+from security import VerifierBusy, login_retry_after, needs_rehash, record_failed_login
+from sitter_cache import page_key, sitter_caches
+
+SITTERS_PER_PAGE = 12
+FEATURED_SITTERS_PER_PAGE = 6
+BOOKINGS_PER_PAGE = 20
+AFFORDABLE_BUDGET = 15.0
+
+main = Blueprint('main', __name__)
+
+
+def cache_enabled() -> bool:
+    """Page and fragment caching is on by default, except while testing."""
+    return current_app.config.get('CACHE_ENABLED', not current_app.testing)
+
+@main.app_template_global()
+def sitter_card(sitter: SitterProfile) -> Markup:
+    """Render a sitter card, reusing the cached fragment unless it shows a viewer-specific distance."""
+    if not cache_enabled() or getattr(sitter, 'distance', None) is not None:
+        return Markup(render_template('_sitter_card.html', sitter=sitter))
+
+    fragments = sitter_caches().fragments
+    html = fragments.get(sitter.user_id)
+    if html is None:
+        html = render_template('_sitter_card.html', sitter=sitter)
+        fragments.set(sitter.user_id, html)
+    return Markup(html)
+
+def parse_window(start_str: str | None, end_str: str | None) -> tuple[datetime, datetime] | None:
+    """Parse an availability window from two datetime-local strings, ignoring incomplete or invalid input."""
+    try:
+        start_dt = datetime.strptime(start_str, '%Y-%m-%dT%H:%M')
+        end_dt = datetime.strptime(end_str, '%Y-%m-%dT%H:%M')
+    except (TypeError, ValueError):
+        return None
+    return (start_dt, end_dt) if start_dt < end_dt else None
+
+@main.route('/')
+@query_budget(15)
+def index() -> str:
+    """Main page displaying sitters with filtering and sorting options."""
+    cacheable = cache_enabled() and not current_user.is_authenticated and not session.get('_flashes')
+    if cacheable:
+        cache_key = page_key(request.args)
+        cached_page = sitter_caches().pages.get(cache_key)
+        if cached_page is not None:
+            return cached_page
+
+    city_query = request.args.get('city', '').strip()
+    max_price = request.args.get('max_price', type=finite_float)
+    min_exp = request.args.get('min_experience', type=int, default=0)
+    sort_option = request.args.get('sort')
+    available = parse_window(request.args.get('available_from'), request.args.get('available_to'))
+    terms = search_terms(request.args.get('q'))
+
+    reader = listing_session()
+    cursor = request.args.get('cursor')
+
+    origin = None
+    if (current_user.is_authenticated and current_user.user_type == 'parent'
+            and current_user.lat is not None):
+        current_app.logger.debug("Parent coords -> %s, %s", current_user.lat, current_user.lng)
+        origin = (current_user.lat, current_user.lng)
+
+    order = listing_order(sort_option, origin, terms)
+    per_page = FEATURED_SITTERS_PER_PAGE if order == 'rating' and sort_option != 'rating' else SITTERS_PER_PAGE
+    page = listing_page(reader, order, cursor, per_page, city_query, max_price, min_exp, available,
+                        terms, origin)
+    if order == 'distance' and page.items:
+        current_app.logger.debug("First sitter coords -> %s, %s", page.items[0].user.lat, page.items[0].user.lng)
+
+    rollup = search_stats.search_stats(city_query, min_exp, max_price)
+    if rollup is not None and not available and not terms:
+        total, avg_p, min_rate = rollup.count, rollup.average, rollup.min_rate
+    else:
+        total, avg_p, min_rate = sitter_price_stats(city_query, max_price, min_exp, available,
+                                                    session=reader, text=terms)
+    if terms:
+        facet_stats = None  # the rollups count sitters without the text match
+    else:
+        facet_stats = search_stats.search_stats(city_query, min_exp) if max_price else rollup
+    
+    affordable = min_rate is not None and min_rate <= AFFORDABLE_BUDGET
+
+    filter_args = {k: v for k, v in request.args.items() if k != 'cursor'}
+    next_url = url_for('main.index', **filter_args, cursor=page.next_cursor) if page.has_next else None
+    first_url = url_for('main.index', **filter_args) if cursor else None
+
+    html = render_template('index.html', 
+                           sitters=page.items, 
+                           total_count=total,
+                           avg_price=avg_p, 
+                           has_affordable=affordable,
+                           price_facets=facet_stats.facets() if facet_stats else [],
+                           next_url=next_url,
+                           first_url=first_url)
+    if cacheable:
+        sitter_caches().pages.set(cache_key, html)
+    return html
+
+@main.route('/internal/cache-stats')
+def cache_stats() -> str:
+    """Report hit ratio and memory use of the page and sitter-card caches to metrics scrapers."""
+    if not diagnostics_allowed():
+        abort(404)
+    caches = sitter_caches()
+    return jsonify(pages=caches.pages.stats(), fragments=caches.fragments.stats())
+
+@main.route('/metrics')
+def metrics_endpoint() -> Response:
+    """Expose request, SQL, template and hot-path timings in the Prometheus text format to metrics scrapers."""
+    if not diagnostics_allowed():
+        abort(404)
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@main.route('/login', methods=['GET', 'POST'])
+def login() -> str:
+    """Handle user login by verifying credentials and starting a session."""
+    if request.method == 'POST':
+        email = request.form.get('email')
+        password = request.form.get('password')
+        retry_after = login_retry_after(request.remote_addr, email)
+        if retry_after:
+            flash('Too many login attempts. Please try again later.', 'danger')
+            return render_template('login.html'), 429, {'Retry-After': str(int(retry_after) + 1)}
+
+        user = User.query.filter_by(email=email).first()
+        try:
+            valid = bool(user) and user.check_password(password)
+        except VerifierBusy:
+            flash('The server is busy. Please try again in a moment.', 'danger')
+            return render_template('login.html'), 503, {'Retry-After': '1'}
+
+        if valid:
+            if needs_rehash(user.password_hash):
+                user.set_password(password)
+                db.session.commit()
+            login_user(user)
+            flash('Logged in successfully!', 'success')
+            return redirect(url_for('main.index'))
+
+        record_failed_login(email)
+        flash('Invalid email or password.', 'danger')
+    return render_template('login.html')
+
+@main.route('/logout')
+@login_required
+def logout() -> str:
+    """Log out the current user and end their session."""
+    logout_user()
+    flash('You have been logged out.', 'info')
+    return redirect(url_for('main.index'))
+
+@main.route('/register/sitter', methods=['GET', 'POST'])
+def register_sitter() -> str:
+    """Handle sitter registration by collecting user details and creating a new sitter profile."""
+    if request.method == 'POST':
+        email = request.form.get('email')
+        
+        
+        if User.query.filter_by(email=email).first():
+            flash('Email already registered.', 'warning')
+            return redirect(url_for('main.register_sitter'))
+
+        city = request.form.get('city')
+        neighborhood = request.form.get('neighborhood', '').strip()
+        street = request.form.get('street', '').strip()
+        street_number = request.form.get('street_number', '').strip()
+        block = request.form.get('block', '').strip()
+        entrance = request.form.get('entrance', '').strip()
+        
+        errors = validate_address_fields(city, neighborhood, street, street_number, block)
+
+        if errors:
+            for error in errors:
+                flash(error, 'danger')
+            return render_template('register_sitter.html')
+
+        full_address = compose_address(city, neighborhood, street, street_number, block, entrance,
+                                       block_label="блок")
+        
+        if current_app.config['GEOCODE_ASYNC']:
+            lat, lng, geocode_status = None, None, 'pending'
+        else:
+            lat, lng = get_coords_from_address(full_address)
+            geocode_status = 'resolved'
+
+            if lat is None:
+                flash('Could not verify address. Please check your city and street.', 'danger')
+                return render_template('register_sitter.html')
+
+        new_user = User(
+            email=email, 
+            user_type='sitter', 
+            lat=lat, 
+            lng=lng,
+            geocode_status=geocode_status,
+            address = full_address,
+            city=city,
+            neighborhood=neighborhood,
+            street=street,
+            street_number=street_number,
+            block=block,
+            entrance=entrance
+        )
+        new_user.set_password(request.form.get('password'))
+        
+        new_profile = SitterProfile(
+            user=new_user,
+            name=request.form.get('name'),
+            phone_number=request.form.get('phone'),
+            hourly_rate=clamp_hourly_rate(request.form.get('hourly_rate')),
+            experience_years=clamp_experience(request.form.get('experience')),
+            bio=request.form.get('bio')
+        )
+
+        try:
+            db.session.add(new_user)
+            db.session.add(new_profile)
+            db.session.commit()
+            if geocode_status == 'pending':
+                current_app.extensions['geocode_worker'].submit(new_user.id)
+            flash('Sitter account created! Please log in.', 'success')
+            return redirect(url_for('main.login'))
+        except Exception as e:
+            db.session.rollback()
+            flash(f'An error occurred: {str(e)}', 'danger')
+
+    return render_template('register_sitter.html')
+
+@main.route('/register/parent', methods=['GET', 'POST'])
+def register_parent() -> str:
+    """Handle parent registration by collecting user details and creating a new parent profile."""
+    if request.method == 'POST':
+        email = request.form.get('email')
+        
+        if User.query.filter_by(email=email).first():
+            flash('Email already registered.', 'warning')
+            return redirect(url_for('main.register_parent'))
+
+        city = request.form.get('city')
+        neighborhood = request.form.get('neighborhood', '').strip()
+        street = request.form.get('street', '').strip()
+        street_number = request.form.get('street_number', '').strip()
+        block = request.form.get('block', '').strip()
+        entrance = request.form.get('entrance', '').strip()
+        
+        errors = validate_address_fields(city, neighborhood, street, street_number, block)
+
+        if errors:
+            for error in errors:
+                flash(error, 'danger')
+            return render_template('register_parent.html')
+
+        full_address = compose_address(city, neighborhood, street, street_number, block, entrance,
+                                       block_label="block")
+        
+        if current_app.config['GEOCODE_ASYNC']:
+            lat, lng, geocode_status = None, None, 'pending'
+        else:
+            lat, lng = get_coords_from_address(full_address)
+            geocode_status = 'resolved'
+
+            if lat is None:
+                flash('Could not verify address. Please check your city and street.', 'danger')
+                return render_template('register_parent.html')
+
+        new_user = User(
+            email=email, 
+            user_type='parent', 
+            lat=lat, 
+            lng=lng,
+            geocode_status=geocode_status,
+            address = full_address,
+            city=city,
+            neighborhood=neighborhood,
+            street=street,
+            street_number=street_number,
+            block=block,
+            entrance=entrance
+        )
+        new_user.set_password(request.form.get('password'))
+        
+        new_profile = ParentProfile(
+            user=new_user,
+            name=request.form.get('name'),
+            phone_number=request.form.get('phone'),
+            children_count=clamp_children_count(request.form.get('children_count')),
+            bio=request.form.get('bio')
+        )
+
+        try:
+            db.session.add(new_user)
+            db.session.add(new_profile)
+            db.session.commit()
+            if geocode_status == 'pending':
+                current_app.extensions['geocode_worker'].submit(new_user.id)
+            flash('Parent account created! Please log in to find a sitter.', 'success')
+            return redirect(url_for('main.login'))
+        except Exception as e:
+            db.session.rollback()
+            flash(f'An error occurred: {str(e)}', 'danger')
+
+    return render_template('register_parent.html')
+
+@main.route('/book/<int:sitter_user_id>', methods=['GET', 'POST'])
+@login_required
+def book_sitter(sitter_user_id: int) -> str:
+    """Allow a parent to book a sitter for a specified time period."""
+    if current_user.user_type != 'parent':
+        flash('Only parents can book sitters.', 'warning')
+        return redirect(url_for('main.index'))
+
+    if request.method == 'POST':
+        start_str = request.form.get('start_time')
+        end_str = request.form.get('end_time')
+        
+        try:
+            start_dt = datetime.strptime(start_str, '%Y-%m-%dT%H:%M')
+            end_dt = datetime.strptime(end_str, '%Y-%m-%dT%H:%M')
+        except (TypeError, ValueError):
+            flash("Invalid date format.", "danger")
+            return render_template('book_form.html', sitter_id=sitter_user_id)
+
+        try:
+            bookings.request_booking(current_user.id, sitter_user_id, start_dt, end_dt)
+        except bookings.BookingError as e:
+            flash(e.message, e.category)
+            return render_template('book_form.html', sitter_id=sitter_user_id)
+        flash('Booking request sent!', 'success')
+        return redirect(url_for('main.my_bookings'))
+
+    return render_template('book_form.html', sitter_id=sitter_user_id)
+
+@main.route('/my-bookings')
+@login_required
+@query_budget(4)
+def my_bookings() -> str:
+    """Display the current user's upcoming bookings, or their history when asked for it."""
+    if current_user.user_type == 'parent':
+        query = (Booking.query
+                 .options(joinedload(Booking.sitter).joinedload(User.sitter_profile))
+                 .filter_by(parent_id=current_user.id))
+    else:
+        query = (Booking.query
+                 .options(joinedload(Booking.parent).joinedload(User.parent_profile))
+                 .filter_by(sitter_id=current_user.id))
+
+    # Both views are range scans on the (user, status, start_time) indexes; the archive
+    # is only read when the history tab is opened.
+    view = 'history' if request.args.get('view') == 'history' else 'upcoming'
+    if view == 'history':
+        query, ordering = query.filter(Booking.status.in_(HISTORY_STATUSES)), BOOKING_HISTORY_ORDERING
+    else:
+        query, ordering = query.filter(Booking.status.in_(OPEN_STATUSES)), BOOKING_ORDERING
+
+    page = bookings_page(query, request.args.get('cursor'), BOOKINGS_PER_PAGE, ordering)
+    next_url = url_for('main.my_bookings', view=view, cursor=page.next_cursor) if page.has_next else None
+    
+    return render_template('bookings.html', bookings=page.items, next_url=next_url, now=datetime.now(),
+                           view=view, counts=booking_counts(current_user.id))
+
+@main.route('/events')
+@login_required
+def events() -> Response:
+    """Stream the current user's booking notifications as Server-Sent Events."""
+    streams = current_app.extensions['event_streams']
+    if not streams.acquire(blocking=False):
+        return Response("Too many open event streams.", 503, {'Retry-After': '5'})
+
+    last_id = request.headers.get('Last-Event-ID', type=int)
+    if last_id is None:
+        last_id = latest_event_id(current_user.id)
+    config = current_app.config
+    response = Response(event_stream(current_app._get_current_object(), current_user.id, last_id,
+                                     config['OUTBOX_SSE_MAX_SECONDS'], config['OUTBOX_SSE_KEEPALIVE'],
+                                     config['OUTBOX_SSE_POLL']),
+                        mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    response.call_on_close(streams.release)
+    return response
+
+@main.route('/profile')
+@login_required
+def profile() -> str:
+    """Display the profile of the currently logged-in user."""
+    if current_user.user_type == 'sitter':
+        profile_data = current_user.sitter_profile
+    else:
+        profile_data = current_user.parent_profile
+    
+    return render_template('profile.html', profile=profile_data)
+
+@main.route('/booking/action/<int:booking_id>/<string:action>')
+@login_required
+def booking_action(booking_id: int, action: str) -> str:
+    """Allow sitters to confirm or decline booking requests."""
+    booking = Booking.query.get_or_404(booking_id)
+    try:
+        bookings.answer_booking(booking, current_user.id, action)
+    except bookings.BookingError as e:
+        flash(e.message, e.category)
+    else:
+        if action == 'confirm':
+            flash("Booking confirmed!", "success")
+        else:
+            flash("Booking declined.", "info")
+    return redirect(url_for('main.my_bookings'))
+
+@main.route('/user/<int:user_id>')
+@login_required
+@query_budget(4)
+def view_public_profile(user_id: int) -> str:
+    """View the public profile of another user (sitter or parent)."""
+    target_user = listing_session().scalars(
+        db.select(User)
+        .options(joinedload(User.sitter_profile), joinedload(User.parent_profile))
+        .filter_by(id=user_id)
+    ).first()
+    if target_user is None:
+        abort(404)
+    if target_user.user_type == 'sitter':
+        return render_template('public_profile.html', profile=target_user.sitter_profile, user=target_user)
+    else:
+        return render_template('public_profile.html', profile=target_user.parent_profile, user=target_user)
+
+@main.route('/booking/cancel/<int:booking_id>')
+@login_required
+def cancel_booking(booking_id: int) -> str:
+    """Allow parents to cancel their bookings if they haven't started yet."""
+    booking = Booking.query.get_or_404(booking_id)
+    try:
+        bookings.cancel_booking(booking, current_user.id)
+    except bookings.BookingError as e:
+        flash(e.message, e.category)
+    else:
+        flash("Booking cancelled successfully.", "info")
+    return redirect(url_for('main.my_bookings'))
+
+@main.route('/rate-sitter/<int:booking_id>', methods=['POST'])
+@login_required
+def rate_sitter(booking_id: int) -> str:
+    """Allow parents to rate sitters after a completed booking."""
+    booking = Booking.query.get_or_404(booking_id)
+    new_rating = request.form.get('rating')
+
+    if new_rating is None or not validate_rating(new_rating):
+        flash("Please choose a valid rating.", "danger")
+        return redirect(url_for('main.my_bookings'))
+    new_rating = float(new_rating)
+    
+    # The scheduler marks ended bookings AwaitingRating; one it has not reached yet can be rated too.
+    if (current_user.id == booking.parent_id and booking.status in ('Confirmed', 'AwaitingRating')
+            and booking.end_time < datetime.now()):
+        if booking.review is not None:
+            flash("You have already rated this booking.", "info")
+            return redirect(url_for('main.my_bookings'))
+
+        if bookings.move_booking(booking, ('Confirmed', 'AwaitingRating'), 'Completed') is None:
+            db.session.rollback()
+            flash("This booking can no longer be rated.", "warning")
+            return redirect(url_for('main.my_bookings'))
+        db.session.add(Review(booking_id=booking.id, sitter_id=booking.sitter_id,
+                              parent_id=booking.parent_id, rating=new_rating))
+        record_rating(booking.sitter_id, new_rating)
+
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            flash("You have already rated this booking.", "info")
+            return redirect(url_for('main.my_bookings'))
+
+        sitter = booking.sitter.sitter_profile
+        flash(f"Thank you! You rated {sitter.name} with {new_rating} stars.", "success")
+        
+    return redirect(url_for('main.my_bookings'))
+
+@main.app_errorhandler(404)
+def page_not_found(e) -> str:
+    """Render a custom 404 error page when a page is not found."""
+    return render_template('404.html'), 404
+
+@main.app_errorhandler(500)
+def internal_server_error(e) -> str:
+    """Handle internal server errors with a generic message."""
+    return "Error occurred. Please try again later.", 500